@@ -1,18 +1,18 @@
 from tensorflow.keras.models import load_model # type: ignore
-from tensorflow.keras.preprocessing.text import Tokenizer # type: ignore
-from tensorflow.keras.preprocessing.sequence import pad_sequences # type: ignore
 import numpy as np
+from tiny_inference import CompiledPredictor
+from tiny_tokenizer import ArrayTokenizer
 
 
 def predict_next_word(model,input_text):
     """Predicts the next word given a partial sequence"""
-    token_list = tokenizer.texts_to_sequences([input_text])[0]
-    token_list = pad_sequences([token_list], maxlen=seq_length, padding='pre')
+    predictor = CompiledPredictor.for_model(model)  # traced once, reused every call
+    tokenizer.encode_batch([input_text], seq_length, out=predictor.inputs)
     
-    prediction = model.predict(token_list, verbose=0)
+    prediction = predictor()
     predicted_id = np.argmax(prediction)
     
-    predicted_word = idx_to_word.get(predicted_id, "[UNK]")
+    predicted_word = tokenizer.token(predicted_id) if predicted_id else "[UNK]"
     return predicted_word
 
 
@@ -32,13 +32,11 @@ if __name__ == "__main__":
         "fine thank you"
     ]
 
-    tokenizer = Tokenizer(oov_token="[OOV]", lower=True)
-    tokenizer.fit_on_texts(corpus)
+    tokenizer = ArrayTokenizer.fit(corpus, oov_token="[OOV]", lower=True)
 
     # Parameters
     seq_length = 4
-    vocab_size = len(tokenizer.word_index) + 1
-    idx_to_word = {v: k for k, v in tokenizer.word_index.items()}
+    vocab_size = len(tokenizer)
 
     print("*********** OUTPUT ****************")    
     while True:
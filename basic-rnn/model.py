@@ -1,7 +1,7 @@
 from tensorflow.keras import layers, models # type: ignore
-from tensorflow.keras.preprocessing.text import Tokenizer # type: ignore
 from tensorflow.keras.preprocessing.sequence import pad_sequences # type: ignore
 import numpy as np
+from tiny_tokenizer import ArrayTokenizer
 
 
 def get_rnn_model(vocab_size, seq_length):
@@ -31,8 +31,8 @@ if __name__ == "__main__":
         "fine thank you"
     ]
 
-    tokenizer = Tokenizer(oov_token="[OOV]", lower=True)
-    tokenizer.fit_on_texts(corpus)
+    # Same ids as the Keras Tokenizer(oov_token="[OOV]", lower=True)
+    tokenizer = ArrayTokenizer.fit(corpus, oov_token="[OOV]", lower=True)
 
     sequences = []
     seq_length = 4
@@ -48,7 +48,7 @@ if __name__ == "__main__":
     X = np.array([x for x, y in sequences])
     y = np.array([y for x, y in sequences])
 
-    vocab_size = len(tokenizer.word_index) + 1
+    vocab_size = len(tokenizer)
 
     model = get_rnn_model(vocab_size,seq_length)    
 
@@ -0,0 +1,263 @@
+"""
+Causal self-attention for the tiny GPT models.
+
+SimpleSelfAttention is the block both model scripts use (multi-head
+attention + residual + LayerNorm). Two things differ from building the
+mask inline:
+
+  - the causal mask is built once per sequence length (`causal_mask`) and
+    reused by every call and every layer, instead of a fresh
+    band_part(ones((seq, seq))) per call
+  - `chunk_size=N` switches to a chunked, online-softmax ("flash-style")
+    path: queries are processed N at a time against key blocks of N (only
+    blocks on or below the diagonal), keeping a running max, running sum and
+    weighted-value accumulator per query. The blocks run one after another in
+    tf.while_loops, so the (seq, seq) score matrix is never materialized. The
+    backward pass keeps only the per-query logsumexp and recomputes each score
+    block (once per pass: key blocks outer for d_key / d_value, query blocks
+    outer for d_query), so every gradient block is written once and memory
+    grows linearly with seq_length for inference and training
+
+Both paths use the same MultiHeadAttention weights (so KVCacheDecoder and
+saved weights work either way) and give the same outputs up to float
+rounding.
+
+    x = SimpleSelfAttention(embed_dim, num_heads, chunk_size=128)(x)
+
+    python attention.py --seq-lengths 512 2048 8192   # peak memory + time, dense vs chunked
+"""
+
+import argparse
+import functools
+import math
+import time
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras import layers  # type: ignore
+
+# Added to masked scores, as MultiHeadAttention's masked softmax does
+MASK_VALUE = -1e9
+
+
+@functools.lru_cache(maxsize=None)
+def causal_mask(seq_length):
+    """(seq_length, seq_length) lower-triangular bool mask, created once per length"""
+    with tf.init_scope():  # an eager constant, so graphs traced later can capture it
+        return tf.constant(np.tril(np.ones((seq_length, seq_length), dtype=bool)))
+
+
+def _block(x, index, size):
+    """Rows [index * size, (index + 1) * size) of a (B, L, H, D) tensor"""
+    return x[:, index * size:(index + 1) * size]
+
+
+def _diagonal_mask(size):
+    """Additive mask for a diagonal (query block == key block) score block"""
+    return (1.0 - np.tril(np.ones((size, size), dtype=np.float32))) * MASK_VALUE
+
+
+def _flash_forward(query, key, value, size):
+    """
+    Online-softmax forward over (B, L, H, D) projections, L a multiple of
+    `size`. Query block i walks key blocks 0..i keeping a running max, sum
+    and value accumulator. Returns the output and the per-query logsumexp.
+    """
+    num_blocks = query.shape[1] // size
+    batch, heads = tf.shape(query)[0], query.shape[2]
+    diagonal = _diagonal_mask(size)
+
+    def query_block(i, outputs, logsumexps):
+        q = _block(query, i, size)
+
+        def key_block(j, running_max, running_sum, accumulator):
+            scores = tf.einsum("bkhd,bqhd->bhqk", _block(key, j, size), q)
+            scores += tf.cast(tf.equal(i, j), scores.dtype) * diagonal
+            new_max = tf.maximum(running_max, tf.reduce_max(scores, axis=-1))
+            weights = tf.exp(scores - new_max[..., None])
+            rescale = tf.exp(running_max - new_max)
+            return (j + 1, new_max,
+                    running_sum * rescale + tf.reduce_sum(weights, axis=-1),
+                    accumulator * rescale[..., None] + tf.einsum("bhqk,bkhd->bhqd", weights, _block(value, j, size)))
+
+        start = (tf.fill([batch, heads, size], -np.inf), tf.zeros([batch, heads, size]),
+                 tf.zeros([batch, heads, size, query.shape[3]]))
+        _, running_max, running_sum, accumulator = tf.while_loop(
+            lambda j, *_: j <= i, key_block, (0, *start), parallel_iterations=1)
+        return (i + 1, outputs.write(i, accumulator / running_sum[..., None]),
+                logsumexps.write(i, running_max + tf.math.log(running_sum)))
+
+    _, outputs, logsumexps = tf.while_loop(
+        lambda i, *_: i < num_blocks, query_block,
+        (0, tf.TensorArray(query.dtype, num_blocks), tf.TensorArray(query.dtype, num_blocks)),
+        parallel_iterations=1)
+    output = tf.reshape(tf.transpose(outputs.stack(), [1, 0, 3, 2, 4]), tf.shape(query))   # (B, L, H, D)
+    logsumexp = tf.reshape(tf.transpose(logsumexps.stack(), [1, 2, 0, 3]), [batch, heads, -1])  # (B, H, L)
+    return output, logsumexp
+
+
+def _flash_backward(query, key, value, output, logsumexp, d_output, size):
+    """
+    Gradients of _flash_forward, recomputing each score block instead of
+    storing it. Two passes, so every gradient block is written exactly once:
+    key blocks outer for d_key / d_value, query blocks outer for d_query.
+    """
+    num_blocks = query.shape[1] // size
+    diagonal = _diagonal_mask(size)
+    delta = tf.transpose(tf.reduce_sum(d_output * output, axis=-1), [0, 2, 1])   # (B, H, L)
+
+    def score_grads(i, j):
+        """Softmax probs and score gradients of the (query block i, key block j) score block"""
+        q, k = _block(query, i, size), _block(key, j, size)
+        lse, dlt = logsumexp[:, :, i * size:(i + 1) * size], delta[:, :, i * size:(i + 1) * size]
+        scores = tf.einsum("bkhd,bqhd->bhqk", k, q)
+        scores += tf.cast(tf.equal(i, j), scores.dtype) * diagonal
+        probs = tf.exp(scores - lse[..., None])
+        d_scores = probs * (tf.einsum("bqhd,bkhd->bhqk", _block(d_output, i, size), _block(value, j, size))
+                            - dlt[..., None])
+        return probs, d_scores
+
+    def key_block(j, d_keys, d_values):
+        def query_block(i, d_k, d_v):
+            probs, d_scores = score_grads(i, j)
+            return (i + 1, d_k + tf.einsum("bhqk,bqhd->bkhd", d_scores, _block(query, i, size)),
+                    d_v + tf.einsum("bhqk,bqhd->bkhd", probs, _block(d_output, i, size)))
+
+        _, d_k, d_v = tf.while_loop(  # only query blocks on or below the diagonal see key block j
+            lambda i, *_: i < num_blocks, query_block,
+            (j, tf.zeros_like(_block(key, j, size)), tf.zeros_like(_block(value, j, size))), parallel_iterations=1)
+        return j + 1, d_keys.write(j, d_k), d_values.write(j, d_v)
+
+    def query_block(i, d_queries):
+        def key_block(j, d_q):
+            _, d_scores = score_grads(i, j)
+            return j + 1, d_q + tf.einsum("bhqk,bkhd->bqhd", d_scores, _block(key, j, size))
+
+        _, d_q = tf.while_loop(
+            lambda j, *_: j <= i, key_block, (0, tf.zeros_like(_block(query, i, size))), parallel_iterations=1)
+        return i + 1, d_queries.write(i, d_q)
+
+    _, d_keys, d_values = tf.while_loop(
+        lambda j, *_: j < num_blocks, key_block,
+        (0, tf.TensorArray(key.dtype, num_blocks), tf.TensorArray(value.dtype, num_blocks)),
+        parallel_iterations=1)
+    _, d_queries = tf.while_loop(
+        lambda i, *_: i < num_blocks, query_block, (0, tf.TensorArray(query.dtype, num_blocks)),
+        parallel_iterations=1)
+
+    def unblocks(x):  # (num_blocks, B, size, H, D) → (B, L, H, D)
+        return tf.reshape(tf.transpose(x, [1, 0, 2, 3, 4]), tf.shape(query))
+
+    return unblocks(d_queries.stack()), unblocks(d_keys.stack()), unblocks(d_values.stack())
+
+
+def chunked_causal_attention(query, key, value, chunk_size):
+    """
+    softmax(q k^T + causal mask) v over (B, L, H, D) projections, one
+    (chunk_size, chunk_size) score block at a time. The sequence is padded to
+    a multiple of chunk_size; padded keys come after every real query, so the
+    causal mask already hides them.
+    """
+    length = query.shape[1]
+    padding = [[0, 0], [0, -length % chunk_size], [0, 0], [0, 0]]
+
+    @tf.custom_gradient
+    def attend(q, k, v):
+        output, logsumexp = _flash_forward(q, k, v, chunk_size)
+
+        def grad(d_output):
+            return _flash_backward(q, k, v, output, logsumexp, d_output, chunk_size)
+
+        return output, grad
+
+    output = attend(tf.pad(query, padding), tf.pad(key, padding), tf.pad(value, padding))
+    return output[:, :length]
+
+
+class SimpleSelfAttention(layers.Layer):
+    """Class to perform self attention (chunk_size=None: dense scores, else chunked online softmax)"""
+    def __init__(self, embed_dim, num_heads, chunk_size=None):
+        super().__init__()
+        self.attn = layers.MultiHeadAttention(num_heads=num_heads, key_dim=embed_dim)
+        self.ln = layers.LayerNormalization()
+        self.add = layers.Add()
+        self.chunk_size = chunk_size
+
+    def call(self, x):
+        """Method to call self attention"""
+        if self.chunk_size is None:
+            attn_output = self.attn(x, x, attention_mask=causal_mask(x.shape[1]))
+        else:
+            attn_output = self._chunked(x)
+        return self.ln(self.add([x, attn_output]))
+
+    def _chunked(self, x):
+        """Same projections as self.attn, attention computed by chunked_causal_attention"""
+        # pylint: disable=protected-access
+        attn = self.attn
+        if hasattr(attn, "_build_from_signature"):  # tf.keras 2 builds the projections on first call
+            if not attn._built_from_signature:
+                attn._build_from_signature(x, x)
+        elif not attn.built:
+            attn.build(x.shape, x.shape)
+        query = attn._query_dense(x) * (1.0 / math.sqrt(float(attn._key_dim)))
+        context = chunked_causal_attention(query, attn._key_dense(x), attn._value_dense(x), self.chunk_size)
+        return attn._output_dense(context)
+
+
+def peak_memory_mb():
+    with open("/proc/self/status", encoding="utf-8") as f:
+        return int(next(l.split()[1] for l in f if l.startswith("VmHWM"))) / 1024.0
+
+
+if __name__ == "__main__":
+
+    import json
+    import subprocess
+    import sys
+
+    parser = argparse.ArgumentParser(description="Peak memory and time of one training step, dense vs chunked")
+    parser.add_argument("--seq-lengths", type=int, nargs="+", default=[512, 2048, 8192])
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument("--child", nargs=2, type=int, metavar=("SEQ_LENGTH", "CHUNK"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        seq_length, chunk = args.child
+        layer = SimpleSelfAttention(32, 2, chunk_size=chunk or None)
+        x = tf.random.normal((1, seq_length, 32))
+
+        @tf.function
+        def train_step(inputs):
+            with tf.GradientTape() as tape:
+                loss = tf.reduce_sum(layer(inputs))
+            return tape.gradient(loss, layer.trainable_variables)
+
+        train_step(x)
+        start = time.perf_counter()
+        train_step(x)
+        print(json.dumps({"seconds": time.perf_counter() - start, "peak_mb": peak_memory_mb()}))
+        sys.exit()
+
+    # Same weights, same inputs: the two paths must agree
+    dense, chunked = SimpleSelfAttention(32, 2), SimpleSelfAttention(32, 2, chunk_size=16)
+    sample = tf.random.normal((2, 100, 32))
+    dense(sample)
+    chunked(sample)
+    chunked.set_weights(dense.get_weights())
+    print(f"max |dense - chunked| at seq_length=100: "
+          f"{float(tf.reduce_max(tf.abs(dense(sample) - chunked(sample)))):.2e}\n")
+
+    print(f"{'seq_length':>10} | {'dense step':>10} | {'dense peak':>10} | {'chunked step':>12} | {'chunked peak':>12}")
+    print("-" * 66)
+    for length in args.seq_lengths:
+        row = []
+        for chunk in (0, args.chunk_size):
+            result = subprocess.run([sys.executable, __file__, "--child", str(length), str(chunk)],
+                                    capture_output=True, text=True, check=False)
+            if result.returncode != 0:
+                row.append("failed (out of memory?)")
+                continue
+            measured = json.loads(result.stdout.strip().splitlines()[-1])
+            row.append(f"{measured['seconds']:8.2f}s | {measured['peak_mb']:7,.0f} MiB")
+        print(f"{length:>10} | " + " | ".join(row))
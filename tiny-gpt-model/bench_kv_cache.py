@@ -0,0 +1,61 @@
+"""
+Tokens/sec of the old `model.predict` generation loop vs KV-cache decoding.
+
+Uses randomly initialised `get_gpt_model` models (speed does not depend on
+training) at several window sizes, and checks that both produce the same
+greedy tokens.
+
+    python bench_kv_cache.py
+    python bench_kv_cache.py --seq-lengths 8 64 256 --tokens 100
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from kv_cache import KVCacheDecoder
+from model_char_embedding import get_gpt_model
+
+
+def predict_loop(model, prompt_ids, num_generate):
+    """The original generate_text loop: full padded window through model.predict per token"""
+    seq_length = model.input_shape[1]
+    result = list(prompt_ids)
+    for _ in range(num_generate):
+        window = result[-seq_length:]
+        window = [0] * (seq_length - len(window)) + window
+        preds = model.predict(np.array([window]), verbose=0)[0, -1]
+        result.append(int(np.argmax(preds)))
+    return result
+
+
+def tokens_per_second(fn, num_generate):
+    start = time.perf_counter()
+    result = fn()
+    return result, num_generate / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seq-lengths", type=int, nargs="+", default=[8, 32, 128])
+    parser.add_argument("--tokens", type=int, default=50)
+    parser.add_argument("--vocab-size", type=int, default=27)
+    args = parser.parse_args()
+
+    prompt = list(np.random.randint(0, args.vocab_size, size=5))
+    print(f"{'seq_length':>10} | {'model.predict':>13} | {'KV cache':>10} | {'speedup':>7} | same tokens")
+    print("-" * 64)
+    for seq_length in args.seq_lengths:
+        model = get_gpt_model(args.vocab_size, seq_length)
+        decoder = KVCacheDecoder(model)
+        predict_loop(model, prompt, 1)  # warm up predict()
+
+        slow, slow_rate = tokens_per_second(lambda: predict_loop(model, prompt, args.tokens), args.tokens)
+        fast, fast_rate = tokens_per_second(lambda: decoder.generate(prompt, args.tokens), args.tokens)
+        print(f"{seq_length:>10} | {slow_rate:9.1f} t/s | {fast_rate:6.0f} t/s | {fast_rate / slow_rate:6.0f}x | "
+              f"{slow == fast}")
+
+
+if __name__ == "__main__":
+    main()
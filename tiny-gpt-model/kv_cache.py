@@ -0,0 +1,180 @@
+"""
+KV-cache incremental decoding for the `get_gpt_model` architecture.
+
+`generate_text` used to rerun the whole padded window through
+`model.predict` for every new token. KVCacheDecoder keeps the keys and
+values of the tokens already in the window and, per generated token, only
+projects the new token and runs one query against the cached keys.
+
+Positional embeddings: the model is always fed the last `seq_length` tokens
+(left-padded), so every token moves one position left per step and its key
+changes. The attention projections are linear, so each key splits into
+    key = (token embedding @ W_k) + (positional embedding @ W_k + b_k)
+The token part is cached per token; the position part is a fixed table per
+window slot. The cache is a ring buffer and the position table is pre-rolled
+for every ring offset, so advancing the window costs one table add instead
+of re-projecting the window. The result matches the full-window forward pass.
+
+Runs in NumPy on weights copied out of the Keras model:
+
+    decoder = KVCacheDecoder(model)
+    ids = decoder.generate(prompt_ids, num_generate=20)
+
+`KVCacheDecoder.for_model(model)` returns a cached decoder, so helpers that
+receive the model on every call copy the weights and build the position
+tables only once (again whenever the weights change: training, set_weights,
+load_weights).
+
+Only single-block models can be decoded this way. With a second block, the
+keys and values of every token depend on the first block's output at that
+token's (shifting) position, so they change on every step; callers check
+`KVCacheDecoder.supports(model)` and use the full-window path otherwise.
+"""
+
+import hashlib
+import weakref
+
+import numpy as np
+from tensorflow import keras  # type: ignore
+
+# One decoder per (model, pad_id); decoders hold copied weights, not the model,
+# so entries go away with their model
+_DECODERS = weakref.WeakKeyDictionary()
+
+
+def _weights_fingerprint(model):
+    """Digest of every weight value, so a cached decoder is rebuilt whenever the weights change"""
+    digest = hashlib.blake2b(digest_size=16)
+    for weight in model.get_weights():
+        digest.update(np.ascontiguousarray(weight))
+    return digest.digest()
+
+
+def _attention_layers(model):
+    return [l for l in model.layers if type(l).__name__ == "SimpleSelfAttention"]
+
+
+def layer_norm(x, gamma, beta, epsilon):
+    mean = x.mean(axis=-1, keepdims=True)
+    variance = x.var(axis=-1, keepdims=True)
+    return (x - mean) / np.sqrt(variance + epsilon) * gamma + beta
+
+
+class KVCacheDecoder:
+    """Greedy incremental decoder for a trained `get_gpt_model` model"""
+
+    def __init__(self, model, pad_id=0):
+        self.seq_length = model.input_shape[1]
+        self.pad_id = pad_id
+
+        attentions = _attention_layers(model)
+        if len(attentions) != 1:
+            raise ValueError(f"KVCacheDecoder supports one transformer block, the model has {len(attentions)}")
+        attention = attentions[0]
+        position = model.layers.index(attention)
+        embedding = next(l for l in model.layers if isinstance(l, keras.layers.Embedding))
+        norm, ff_1, ff_2, head = model.layers[position + 1:position + 5]
+
+        self.token_embedding = embedding.get_weights()[0]
+
+        # The positional embedding is folded into the graph as a constant, so read it back:
+        # the attention input for an all-pad window is token_embedding[pad] + position_embedding
+        probe = keras.Model(model.input, attention.input)
+        window = np.full((1, self.seq_length), pad_id, dtype="float32")
+        self.position_embedding = np.asarray(probe(window))[0] - self.token_embedding[pad_id]
+
+        (self.w_q, self.b_q, self.w_k, self.b_k,
+         self.w_v, self.b_v, self.w_o, self.b_o) = attention.attn.get_weights()
+        self.scale = 1.0 / np.sqrt(self.w_k.shape[-1])
+        self.ln_1 = (*attention.ln.get_weights(), attention.ln.epsilon)
+        self.ln_2 = (*norm.get_weights(), norm.epsilon)
+        self.ff_1, self.ff_2, self.head = ff_1.get_weights(), ff_2.get_weights(), head.get_weights()
+
+        # Position part of keys/values, rolled for every ring offset: rolled[start][slot]
+        # is the position (slot - start) % seq_length takes when the oldest token sits in `start`
+        pos_k = np.einsum("ld,dhk->lhk", self.position_embedding, self.w_k) + self.b_k
+        pos_v = np.einsum("ld,dhk->lhk", self.position_embedding, self.w_v) + self.b_v
+        self.pos_k = np.stack([np.roll(pos_k, s, axis=0) for s in range(self.seq_length)])
+        self.pos_v = np.stack([np.roll(pos_v, s, axis=0) for s in range(self.seq_length)])
+
+    @staticmethod
+    def supports(model):
+        """True if `model` has the single transformer block this decoder can cache"""
+        return len(_attention_layers(model)) == 1
+
+    @classmethod
+    def for_model(cls, model, pad_id=0):
+        """Cached decoder for `model` (built on first use and whenever the weights changed)"""
+        cached = _DECODERS.setdefault(model, {})
+        fingerprint = _weights_fingerprint(model)
+        if pad_id not in cached or cached[pad_id][0] != fingerprint:
+            cached[pad_id] = (fingerprint, cls(model, pad_id))
+        return cached[pad_id][1]
+
+    # ------------------------------------------------------------------
+    # Cache
+    # ------------------------------------------------------------------
+    def start(self, prompts):
+        """
+        Prefill: prompts is a list of token-id lists. Returns the cache and
+        the (batch, vocab) logits for the token after each prompt.
+        """
+        window = np.full((len(prompts), self.seq_length), self.pad_id, dtype=np.int64)
+        for row, ids in enumerate(prompts):
+            ids = list(ids)[-self.seq_length:]
+            if ids:
+                window[row, -len(ids):] = ids
+
+        embedded = self.token_embedding[window]                        # (B, L, d)
+        cache = {
+            "k": np.einsum("bld,dhk->blhk", embedded, self.w_k),       # token part only
+            "v": np.einsum("bld,dhk->blhk", embedded, self.w_v),
+            "start": 0,                                                # ring slot of the oldest token
+        }
+        return cache, self._attend_last(cache, window[:, -1])
+
+    def step(self, cache, token_ids):
+        """Appends one token per row (overwriting the oldest) and returns next-token logits"""
+        embedded = self.token_embedding[token_ids]                     # (B, d)
+        slot = cache["start"]
+        cache["k"][:, slot] = np.einsum("bd,dhk->bhk", embedded, self.w_k)
+        cache["v"][:, slot] = np.einsum("bd,dhk->bhk", embedded, self.w_v)
+        cache["start"] = (slot + 1) % self.seq_length
+        return self._attend_last(cache, token_ids)
+
+    def _attend_last(self, cache, token_ids):
+        """Forward pass for the newest position only, against the cached window"""
+        x = self.token_embedding[token_ids] + self.position_embedding[-1]   # (B, d)
+        start = cache["start"]
+        keys = cache["k"] + self.pos_k[start]                              # (B, L, H, k)
+        values = cache["v"] + self.pos_v[start]
+
+        query = np.einsum("bd,dhk->bhk", x, self.w_q) + self.b_q
+        scores = np.einsum("bhk,blhk->bhl", query, keys) * self.scale
+        scores = np.exp(scores - scores.max(axis=-1, keepdims=True))
+        weights = scores / scores.sum(axis=-1, keepdims=True)
+        context = np.einsum("bhl,blhk->bhk", weights, values)
+        attended = np.einsum("bhk,hkd->bd", context, self.w_o) + self.b_o
+
+        # The newest position sees the whole window, so no causal mask is needed here
+        x = layer_norm(x + attended, *self.ln_1)
+        x = layer_norm(x, *self.ln_2)
+        x = np.maximum(x @ self.ff_1[0] + self.ff_1[1], 0.0)
+        x = x @ self.ff_2[0] + self.ff_2[1]
+        return x @ self.head[0] + self.head[1]
+
+    # ------------------------------------------------------------------
+    # Generation
+    # ------------------------------------------------------------------
+    def generate(self, prompt_ids, num_generate=20, stop_id=None):
+        """Greedy decoding of one prompt; returns prompt + generated ids"""
+        result = list(prompt_ids)
+        cache, logits = self.start([result])
+        for i in range(num_generate):
+            next_id = int(np.argmax(logits[0]))
+            if next_id == stop_id:
+                break
+            result.append(next_id)
+            if i + 1 < num_generate:
+                logits = self.step(cache, np.array([next_id]))
+        return result
@@ -1,33 +1,33 @@
+import os
+import sys
+import tempfile
+
 import numpy as np
 import tensorflow as tf
 from tensorflow import keras # type: ignore
 from tensorflow.keras import layers # type: ignore
+from tiny_inference import CompiledPredictor
+from tiny_tokenizer import ArrayTokenizer
+
+from attention import SimpleSelfAttention
+from kv_cache import KVCacheDecoder
+from token_corpus import TokenCorpus, iter_chunks, window_dataset, write_token_file
 
 
 def encode(text):
     """Method to encode to text"""
-    return [stoi[c] for c in text]
+    return tokenizer.encode(text)
 
 def decode(indices):
     """Method to do the decoding of the text"""
-    return ''.join([itos[i] for i in indices])
-
-class SimpleSelfAttention(layers.Layer):
-    """Class to perform self attention"""
-    def __init__(self, embed_dim, num_heads):
-        super().__init__()
-        self.attn = layers.MultiHeadAttention(num_heads=num_heads, key_dim=embed_dim)
-        self.ln = layers.LayerNormalization()
-        self.add = layers.Add()
-
-    def call(self, x):
-        """Method to call self attention"""
-        attn_mask = tf.linalg.band_part(tf.ones((x.shape[1], x.shape[1])), -1, 0)
-        attn_output = self.attn(x, x, attention_mask=attn_mask)
-        return self.ln(self.add([x, attn_output]))
+    return tokenizer.decode(indices)
 
-def get_gpt_model(vocab_size, seq_length, embed_dim=32, num_heads=2, ff_dim=64):
-    """Method to define model architecture"""
+def get_gpt_model(vocab_size, seq_length, embed_dim=32, num_heads=2, ff_dim=64, num_blocks=1,
+                  attention_chunk_size=None):
+    """
+    Method to define model architecture (num_blocks stacked transformer blocks).
+    attention_chunk_size switches attention to the chunked path for long seq_length.
+    """
 
     # Keras input with sequence length 8
     inputs = keras.Input(shape=(seq_length,))
@@ -37,11 +37,12 @@ def get_gpt_model(vocab_size, seq_length, embed_dim=32, num_heads=2, ff_dim=64):
     pos_embed = layers.Embedding(input_dim=seq_length, output_dim=embed_dim)(tf.range(start=0, limit=seq_length))
     x = x + pos_embed
 
-    # Transformer block
-    x = SimpleSelfAttention(embed_dim, num_heads)(x)
-    x = layers.LayerNormalization()(x)
-    x = layers.Dense(ff_dim, activation="relu")(x)
-    x = layers.Dense(embed_dim)(x)
+    # Transformer blocks
+    for _ in range(num_blocks):
+        x = SimpleSelfAttention(embed_dim, num_heads, chunk_size=attention_chunk_size)(x)
+        x = layers.LayerNormalization()(x)
+        x = layers.Dense(ff_dim, activation="relu")(x)
+        x = layers.Dense(embed_dim)(x)
 
     # Output logits
     logits = layers.Dense(vocab_size)(x)
@@ -60,12 +61,18 @@ def prepare_input(text, seq_length=8):
         token_ids = token_ids[-seq_length:]
     return np.array([token_ids])
 
-def generate_text(model, input_text,num_generate=20):
+def generate_text(model, input_text,num_generate=20, use_cache=True):
     """Method to generate the text based on model prediction"""
+    if use_cache and KVCacheDecoder.supports(model):
+        # Incremental decoding: only the new character is processed per step
+        return decode(KVCacheDecoder.for_model(model).generate(encode(input_text), num_generate))
+
     model_input = encode(input_text)
+    seq_length = model.input_shape[1]
+    predictor = CompiledPredictor.for_model(model, last_position=True)
     for _ in range(num_generate):
-        x = prepare_input(input_text, seq_length)  # pad to seq length
-        preds = model.predict(x, verbose=0)[0, -1]
+        x = prepare_input(decode(model_input), seq_length)  # pad to seq length
+        preds = predictor(x)[0]
         next_id = np.argmax(preds)
         model_input.append(next_id) # type: ignore        
     return decode(model_input)
@@ -75,34 +82,33 @@ if __name__ == "__main__":
     print("************************************************")    
     print("************** Tiny GPT Model ******************")
 
-    # Tiny text corpus    
+    # `python model_char_embedding.py corpus.txt ...` trains on text files of any
+    # size; without arguments the tiny corpus below is used.
+    corpus_files = sys.argv[1:]
     corpus = "hello world how are you today what is up hello world again fine thank you"
+    chunks = (lambda: iter_chunks(corpus_files)) if corpus_files else (lambda: [corpus])
 
     # Character-level tokenizer
-    chars = sorted(list(set(corpus)))
-    vocab_size = len(chars)
-    stoi = {ch: i for i, ch in enumerate(chars)}
-    itos = {i: ch for ch, i in stoi.items()}
+    chars = sorted(set().union(*map(set, chunks())))
+    tokenizer = ArrayTokenizer(chars, char_level=True, lower=False, filters="")
+    vocab_size = len(tokenizer)
 
-    ## Fetch data corpus
-    data = encode(corpus)    
+    ## Tokenize the corpus once into a memory-mapped token file (removed on exit)
+    token_dir = tempfile.TemporaryDirectory()
+    token_file = os.path.join(token_dir.name, "corpus.tok")
+    write_token_file(chunks(), tokenizer, token_file)
+    token_corpus = TokenCorpus(token_file)
 
-    ## Create input-output sequences
+    ## Input-output windows: strided views of the map, gathered per batch
     seq_length = 8
-    inputs = []
-    targets = []
-
-    for i in range(len(data) - seq_length):
-        inputs.append(data[i:i+seq_length])
-        targets.append(data[i+1:i+seq_length+1])
-
-    inputs = np.array(inputs)
-    targets = np.array(targets)
+    dataset = window_dataset(token_corpus, seq_length, batch_size=2)
 
-    print("----inputs-----")
-    print(inputs)
-    print("----targets----")
-    print(targets)
+    inputs, targets = next(iter(dataset))
+    print(f"----{token_corpus.num_windows(seq_length)} windows of {len(token_corpus)} tokens----")
+    print("----inputs (first batch)-----")
+    print(inputs.numpy())
+    print("----targets (first batch)----")
+    print(targets.numpy())
 
     ## Fetch GPT model    
     print("----model----")
@@ -122,7 +128,7 @@ if __name__ == "__main__":
 
     ## Train the model
     print("----train model-------")
-    model.fit(inputs, targets, epochs=100, batch_size=2)
+    model.fit(dataset, epochs=100)
 
     ## Inference
     print("-----generated text-----")
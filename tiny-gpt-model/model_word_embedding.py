@@ -1,25 +1,15 @@
 import numpy as np
 import tensorflow as tf
-from tensorflow.keras.preprocessing.text import Tokenizer # type: ignore
 from tensorflow.keras.preprocessing.sequence import pad_sequences # type: ignore
 from tensorflow import keras # type: ignore
 from tensorflow.keras import layers # type: ignore
+from tiny_inference import CompiledPredictor
+from tiny_tokenizer import ArrayTokenizer
 
-class SimpleSelfAttention(layers.Layer):
-    """Class to perform self attention"""
-    def __init__(self, embed_dim, num_heads):
-        super().__init__()
-        self.attn = layers.MultiHeadAttention(num_heads=num_heads, key_dim=embed_dim)
-        self.ln = layers.LayerNormalization()
-        self.add = layers.Add()
+from attention import SimpleSelfAttention
+from kv_cache import KVCacheDecoder
 
-    def call(self, x):
-        """Method to call self attention"""
-        attn_mask = tf.linalg.band_part(tf.ones((x.shape[1], x.shape[1])), -1, 0)
-        attn_output = self.attn(x, x, attention_mask=attn_mask)
-        return self.ln(self.add([x, attn_output]))
-
-def get_gpt_model(vocab_size, seq_length, embed_dim=32, num_heads=2, ff_dim=64):
+def get_gpt_model(vocab_size, seq_length, embed_dim=32, num_heads=2, ff_dim=64, attention_chunk_size=None):
 
     # Keras input with sequence length 8
     inputs = keras.Input(shape=(seq_length,))
@@ -30,7 +20,7 @@ def get_gpt_model(vocab_size, seq_length, embed_dim=32, num_heads=2, ff_dim=64):
     x = x + pos_embed
 
     # Transformer block
-    x = SimpleSelfAttention(embed_dim, num_heads)(x)
+    x = SimpleSelfAttention(embed_dim, num_heads, chunk_size=attention_chunk_size)(x)
     x = layers.LayerNormalization()(x)
     x = layers.Dense(ff_dim, activation="relu")(x)
     x = layers.Dense(embed_dim)(x)
@@ -43,18 +33,22 @@ def get_gpt_model(vocab_size, seq_length, embed_dim=32, num_heads=2, ff_dim=64):
 
     return model
 
-def generate_text(model, input_text, tokenizer, seq_length, num_words=10):
+def generate_text(model, input_text, tokenizer, seq_length, num_words=10, use_cache=True):
     """Method to generate next text based on input text"""
     result = input_text.split()
+    if use_cache and KVCacheDecoder.supports(model):
+        # Incremental decoding; predicting the padding id ends the text, as in the loop below
+        encoded = tokenizer.encode(" ".join(result))
+        generated = KVCacheDecoder.for_model(model).generate(encoded, num_words, stop_id=0)[len(encoded):]
+        return " ".join(result + [tokenizer.token(i) for i in generated])
+
+    predictor = CompiledPredictor.for_model(model, last_position=True)
     for _ in range(num_words):
-        encoded = tokenizer.texts_to_sequences([" ".join(result)])[0]
-        padded = pad_sequences([encoded], maxlen=seq_length, padding='pre')
-        preds = model.predict(padded, verbose=0)[0, -1]
-        predicted_id = np.argmax(preds)
-        for word, index in tokenizer.word_index.items():
-            if index == predicted_id:
-                result.append(word)
-                break
+        tokenizer.encode_batch([" ".join(result)], seq_length, out=predictor.inputs)
+        preds = predictor()[0]
+        predicted_id = int(np.argmax(preds))
+        if predicted_id:  # padding id has no word
+            result.append(tokenizer.token(predicted_id))
     return " ".join(result)
 
 if __name__ == "__main__":
@@ -70,19 +64,18 @@ if __name__ == "__main__":
     "fine thank you"
     ]    
 
-    # Use Keras Tokenizer (word level)
-    tokenizer = Tokenizer(oov_token="[OOV]", lower=True)
-    tokenizer.fit_on_texts(corpus)
+    # Word-level tokenizer (same ids as the Keras Tokenizer)
+    tokenizer = ArrayTokenizer.fit(corpus, oov_token="[OOV]", lower=True)
 
     word_index = tokenizer.word_index
-    vocab_size = len(word_index) + 1  # +1 for padding
+    vocab_size = len(tokenizer)  # includes padding id 0
     print("Vocab:", word_index)    
 
     ## Create input-output sequences
     # Create input and target sequences
     seqs = []
     for line in corpus:
-        tokens = tokenizer.texts_to_sequences([line])[0]
+        tokens = tokenizer.encode(line)
         for i in range(1, len(tokens)):
             input_seq = tokens[:i]
             target_seq = tokens[1:i+1]
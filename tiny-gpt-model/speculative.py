@@ -0,0 +1,186 @@
+"""
+Speculative decoding: a small draft `get_gpt_model` proposes, a large one verifies.
+
+Each round:
+  1. the draft model (KV-cache decoder) proposes k tokens one at a time,
+     keeping its distribution q_i for every proposal
+  2. the target model scores all k proposals in ONE forward pass: row i of
+     a (k + 1)-row batch is the left-padded window the target would see after
+     accepting i proposals, so row i gives exactly the target's p_i
+  3. proposal i is accepted with probability min(1, p_i / q_i); at the first
+     rejection a replacement is sampled from max(p_i - q_i, 0) (renormalized).
+     If all k are accepted, one bonus token is sampled from p_k
+
+This accept/reject rule makes every emitted token follow the target's
+distribution exactly; with temperature 0 it reduces to "accept while the
+draft's token is the target's argmax", so greedy output equals the target's
+own greedy output. Each round emits between 1 and k + 1 tokens for one
+target call. Both models must share the tokenizer (vocabulary) and
+seq_length.
+
+    decoder = SpeculativeDecoder(target_model, draft_model, k=4)
+    ids = decoder.generate(encode("hello "), num_generate=40, temperature=0.8, seed=0)
+    decoder.acceptance_rate
+
+    python speculative.py --ks 1 2 4 8   # acceptance rate and speedup per k
+"""
+
+import argparse
+import time
+
+import numpy as np
+from tiny_inference import CompiledPredictor
+
+from kv_cache import KVCacheDecoder
+
+
+def token_probs(logits, temperature):
+    """softmax(logits / temperature) over the last axis; one-hot argmax when temperature is 0"""
+    if temperature <= 0:
+        return np.eye(logits.shape[-1])[logits.argmax(axis=-1)]
+    scaled = logits / temperature
+    probs = np.exp(scaled - scaled.max(axis=-1, keepdims=True))
+    return probs / probs.sum(axis=-1, keepdims=True)
+
+
+def sample(probs, rng):
+    return int(min(np.searchsorted(np.cumsum(probs), rng.random() * probs.sum(), side="right"), len(probs) - 1))
+
+
+class SpeculativeDecoder:
+    """Draft-then-verify generation with `k` draft tokens per target forward pass"""
+
+    def __init__(self, target, draft, k=4, pad_id=0):
+        self.seq_length = target.input_shape[1]
+        if draft.input_shape[1] != self.seq_length or draft.output_shape[-1] != target.output_shape[-1]:
+            raise ValueError("draft and target models need the same seq_length and vocabulary")
+        self.k = k
+        self.pad_id = pad_id
+        self.draft = KVCacheDecoder(draft, pad_id)
+        self.verifier = CompiledPredictor(target, batch_size=k + 1, last_position=True)
+        self.proposed = 0
+        self.accepted = 0
+        self.rounds = 0
+
+    @property
+    def acceptance_rate(self):
+        return self.accepted / max(self.proposed, 1)
+
+    def _propose(self, context, temperature, rng):
+        """k draft tokens and the draft distribution each was drawn from"""
+        cache, logits = self.draft.start([context])
+        proposals, draft_probs = [], []
+        for i in range(self.k):
+            probs = token_probs(logits[0], temperature)
+            token = int(probs.argmax()) if temperature <= 0 else sample(probs, rng)
+            proposals.append(token)
+            draft_probs.append(probs)
+            if i + 1 < self.k:
+                logits = self.draft.step(cache, np.array([token]))
+        return proposals, draft_probs
+
+    def _verify(self, context, proposals, temperature):
+        """Target distributions after accepting 0..k proposals, from one (k + 1)-row forward pass"""
+        tail = context[-self.seq_length:] + proposals
+        padded = np.full(self.seq_length + len(tail), self.pad_id, dtype=np.int32)
+        padded[self.seq_length:] = tail
+        windows = np.lib.stride_tricks.sliding_window_view(padded, self.seq_length)
+        first = len(tail) - len(proposals)  # row i ends just after context + proposals[:i]
+        self.verifier.inputs[:] = windows[first:first + self.k + 1]
+        return token_probs(self.verifier(), temperature)
+
+    def generate(self, prompt_ids, num_generate=20, temperature=0.0, seed=None, stop_id=None):
+        """Samples num_generate tokens after prompt_ids from the target model; returns prompt + generated ids"""
+        rng = np.random.default_rng(seed)
+        result = list(prompt_ids)
+        generated = 0
+        while generated < num_generate:
+            proposals, draft_probs = self._propose(result, temperature, rng)
+            target_probs = self._verify(result, proposals, temperature)
+
+            new_tokens = []
+            for i, token in enumerate(proposals):
+                p, q = target_probs[i][token], draft_probs[i][token]
+                if rng.random() * q >= p:  # reject with probability 1 - min(1, p / q)
+                    residual = np.maximum(target_probs[i] - draft_probs[i], 0.0)
+                    new_tokens.append(sample(residual if residual.sum() > 0 else target_probs[i], rng))
+                    break
+                new_tokens.append(token)
+            else:
+                new_tokens.append(sample(target_probs[self.k], rng))  # every proposal accepted: bonus token
+
+            self.rounds += 1
+            self.proposed += self.k
+            self.accepted += len(new_tokens) - 1  # all but the replacement / bonus token
+
+            for token in new_tokens[:num_generate - generated]:
+                if token == stop_id:
+                    return result
+                result.append(token)
+                generated += 1
+        return result
+
+
+def target_only(predictor, prompt_ids, num_generate, temperature=0.0, seed=None, pad_id=0):
+    """Plain autoregressive sampling from the target: one compiled forward pass per token"""
+    rng = np.random.default_rng(seed)
+    seq_length = predictor.inputs.shape[1]
+    result = list(prompt_ids)
+    for _ in range(num_generate):
+        window = result[-seq_length:]
+        predictor.inputs[0] = [pad_id] * (seq_length - len(window)) + window
+        probs = token_probs(predictor()[0], temperature)
+        result.append(int(probs.argmax()) if temperature <= 0 else sample(probs, rng))
+    return result
+
+
+if __name__ == "__main__":
+
+    from tiny_tokenizer import ArrayTokenizer
+    from tensorflow import keras  # type: ignore
+
+    from model_char_embedding import get_gpt_model
+
+    parser = argparse.ArgumentParser(description="Acceptance rate and speedup of speculative decoding per k")
+    parser.add_argument("--ks", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--tokens", type=int, default=200)
+    parser.add_argument("--seq-length", type=int, default=16)
+    parser.add_argument("--epochs", type=int, default=40)
+    parser.add_argument("--temperature", type=float, default=0.8)
+    args = parser.parse_args()
+
+    text = "hello world how are you today what is up hello world again fine thank you " * 8
+    tokenizer = ArrayTokenizer(sorted(set(text)), char_level=True, lower=False, filters="")
+    data = np.array(tokenizer.encode(text))
+    windows = np.lib.stride_tricks.sliding_window_view(data, args.seq_length + 1)
+    x, y = windows[:, :-1], windows[:, 1:]
+
+    # Same tokenizer, same window; the target is ~4x wider and 3 blocks deep
+    target_model = get_gpt_model(len(tokenizer), args.seq_length, embed_dim=128, num_heads=4,
+                                 ff_dim=256, num_blocks=3)
+    draft_model = get_gpt_model(len(tokenizer), args.seq_length)
+    for m in (target_model, draft_model):
+        m.compile(optimizer="adam", loss=keras.losses.SparseCategoricalCrossentropy(from_logits=True))
+        m.fit(x, y, epochs=args.epochs, batch_size=32, verbose=0)
+
+    prompt = tokenizer.encode("hello ")
+    target_predictor = CompiledPredictor(target_model, last_position=True)
+    for temperature in (0.0, args.temperature):
+        target_only(target_predictor, prompt, 2, temperature)  # trace
+        start = time.perf_counter()
+        reference = target_only(target_predictor, prompt, args.tokens, temperature, seed=0)
+        baseline = args.tokens / (time.perf_counter() - start)
+
+        print(f"\ntemperature={temperature}: target alone {baseline:,.0f} tokens/sec")
+        print(f"{'k':>3} | {'acceptance':>10} | {'tokens/round':>12} | {'tokens/sec':>10} | {'speedup':>7} | same as target")
+        print("-" * 72)
+        for k in args.ks:
+            decoder = SpeculativeDecoder(target_model, draft_model, k=k)
+            decoder.generate(prompt, 2, temperature)  # trace
+            decoder.proposed = decoder.accepted = decoder.rounds = 0
+            start = time.perf_counter()
+            output = decoder.generate(prompt, args.tokens, temperature, seed=0)
+            rate = args.tokens / (time.perf_counter() - start)
+            same = str(output == reference) if temperature <= 0 else "(sampled)"
+            print(f"{k:>3} | {decoder.acceptance_rate:10.1%} | {args.tokens / decoder.rounds:12.2f} | "
+                  f"{rate:10,.0f} | {rate / baseline:6.2f}x | {same}")
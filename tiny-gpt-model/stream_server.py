@@ -0,0 +1,457 @@
+"""
+Token-streaming HTTP generation for the tiny GPT model.
+
+`generate_text` returns only after the whole generation has finished. This
+server sends every token as soon as it is decoded:
+
+    POST /generate  {"prompt": "hello ", "max_new_tokens": 40, "temperature": 0.8,
+                     "top_k": 0, "top_p": 1.0, "seed": 1}
+      Accept: text/event-stream  → Server-Sent Events ("data: {...}" per token)
+      otherwise                  → chunked NDJSON (one JSON object per line)
+    GET  /metrics
+
+All open streams share ONE batched decode loop (DecodeLoop): each step
+advances every live stream by one token with a single KVCacheDecoder call.
+New requests join at the next step boundary. Their prompts are prefilled
+together, and their cache rows are rotated onto the shared ring offset and
+appended to the batch, so nobody waits for the current generations to end.
+A stream leaves the batch when it reaches eos / max_new_tokens, or as soon
+as its client disconnects, which cancels it and frees its cache row.
+
+The first token of a request is sampled right after its prefill and sent
+before the rest of the batch takes its next step. The last event of each
+stream reports time-to-first-token (ttft_ms) and the decode rate after the
+first token (tokens_per_sec).
+
+    python stream_server.py [corpus.txt ...]
+    curl -N -H "Accept: text/event-stream" -d '{"prompt": "hello "}' localhost:8081/generate
+    python stream_server.py --benchmark 64 --concurrency 16   # TTFT and tokens/sec, shared loop vs one at a time
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from batch_generation import sample_next
+from kv_cache import KVCacheDecoder
+
+SAMPLE_TEXT = "hello world how are you today what is up hello world again fine thank you\n"
+
+
+# ==========================
+# Shared decode loop
+# ==========================
+class Stream:
+    """One generation request: sampling options, token queue and timings"""
+
+    def __init__(self, prompt_ids, max_new_tokens, temperature, top_k, top_p, seed):
+        self.prompt_ids = list(prompt_ids) or [0]
+        self.max_new_tokens = max_new_tokens
+        self.temperature, self.top_k, self.top_p = temperature, top_k, top_p
+        self.rng = np.random.default_rng(seed)
+        self.queue = asyncio.Queue()    # token ids, then None when the stream ends
+        self.done = False               # finished or cancelled: dropped at the next step
+        self.cancelled = False
+        self.tokens = 0
+        self.submitted = time.perf_counter()
+        self.first_token_at = None
+        self.finished_at = None
+
+    def stats(self):
+        decode_seconds = (self.finished_at or time.perf_counter()) - (self.first_token_at or self.submitted)
+        return {
+            "tokens": self.tokens,
+            "ttft_ms": None if self.first_token_at is None else 1000.0 * (self.first_token_at - self.submitted),
+            "tokens_per_sec": (self.tokens - 1) / decode_seconds if self.tokens > 1 and decode_seconds > 0 else None,
+            "cancelled": self.cancelled,
+        }
+
+
+class DecodeLoop:
+    """
+    Interleaves every open Stream on one batched KV-cache decode loop.
+    At most `max_batch_size` streams decode together; the rest wait
+    for a free row.
+    """
+
+    def __init__(self, decoder, max_batch_size=64, eos_id=None):
+        self.decoder = decoder
+        self.max_batch_size = max_batch_size
+        self.eos_id = eos_id
+        self.pending = []
+        self.wake = asyncio.Event()
+        # One worker thread runs the NumPy decode; the event loop keeps serving connections
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+        # Decode state, touched only by the worker thread
+        self.rows = []          # Stream per cache row
+        self.cache = None
+        self.last_ids = None    # tokens sampled last step, not yet fed to the cache
+
+        self.steps = 0
+        self.row_steps = 0
+        self.streams_served = 0
+        self.streams_cancelled = 0
+        self.ttft_total = 0.0
+
+    def submit(self, prompt_ids, max_new_tokens=40, temperature=0.0, top_k=0, top_p=1.0, seed=None):
+        """Queues a generation; read its tokens from `stream.queue`"""
+        stream = Stream(prompt_ids, max_new_tokens, temperature, top_k, top_p, seed)
+        self.pending.append(stream)
+        self.wake.set()
+        return stream
+
+    def cancel(self, stream):
+        """Stops a stream (client went away); its row is dropped before the next step"""
+        if not stream.done:
+            stream.done = stream.cancelled = True
+            stream.finished_at = time.perf_counter()
+            self.streams_cancelled += 1
+        self.pending = [s for s in self.pending if s is not stream]
+
+    def _advance(self, joining):
+        """
+        One decode step (worker thread): drop finished rows, feed last step's
+        tokens, prefill and append the joining prompts, then sample one token
+        for every row.
+        """
+        keep = np.array([not s.done for s in self.rows], dtype=bool)
+        self.rows = [s for s in self.rows if not s.done]
+        logits = np.zeros((0, self.decoder.head[1].shape[0]))
+        if self.rows:
+            if not keep.all():
+                self.cache["k"], self.cache["v"] = self.cache["k"][keep], self.cache["v"][keep]
+                self.last_ids = self.last_ids[keep]
+            logits = self.decoder.step(self.cache, self.last_ids)
+        else:
+            self.cache = None
+
+        if joining:
+            cache, new_logits = self.decoder.start([s.prompt_ids for s in joining])
+            if self.cache is None:
+                self.cache = cache
+            else:
+                # A fresh cache has its oldest token in slot 0; rotate it onto the shared ring offset
+                shift = self.cache["start"]
+                for key in ("k", "v"):
+                    self.cache[key] = np.concatenate([self.cache[key], np.roll(cache[key], shift, axis=1)])
+            logits = np.concatenate([logits, new_logits])
+            self.rows += joining
+
+        rows = self.rows
+        uniforms = np.array([s.rng.random() for s in rows])
+        self.last_ids = sample_next(logits, uniforms,
+                                    np.array([s.temperature for s in rows], dtype=np.float64),
+                                    np.array([s.top_k for s in rows], dtype=np.int64),
+                                    np.array([s.top_p for s in rows], dtype=np.float64))
+        return list(zip(rows, self.last_ids.tolist()))
+
+    def _deliver(self, stream, token):
+        """Pushes one sampled token to its stream (event-loop thread)"""
+        if stream.done:  # cancelled while the step was running
+            return
+        now = time.perf_counter()
+        if token != self.eos_id:
+            if stream.first_token_at is None:
+                stream.first_token_at = now
+                self.ttft_total += now - stream.submitted
+            stream.tokens += 1
+            stream.queue.put_nowait(token)
+        if token == self.eos_id or stream.tokens >= stream.max_new_tokens:
+            stream.done = True
+            stream.finished_at = now
+            stream.queue.put_nowait(None)
+            self.streams_served += 1
+
+    async def run(self):
+        """Background loop: admit waiting streams → one batched step → fan tokens out"""
+        loop = asyncio.get_running_loop()
+        while True:
+            if not any(not s.done for s in self.rows) and not self.pending:
+                self.wake.clear()
+                await self.wake.wait()
+
+            live = sum(not s.done for s in self.rows)
+            joining = [s for s in self.pending if not s.done][:self.max_batch_size - live]
+            self.pending = [s for s in self.pending if not s.done and s not in joining]
+            if not live and not joining:
+                continue
+
+            sampled = await loop.run_in_executor(self.executor, self._advance, joining)
+            for stream, token in sampled:
+                self._deliver(stream, token)
+            if sampled:
+                self.steps += 1
+                self.row_steps += len(sampled)
+            await asyncio.sleep(0)  # let handlers write (and notice disconnects) between steps
+
+    def metrics(self):
+        return {
+            "active_streams": sum(not s.done for s in self.rows),
+            "waiting_streams": len(self.pending),
+            "streams_served": self.streams_served,
+            "streams_cancelled": self.streams_cancelled,
+            "decode_steps": self.steps,
+            "avg_batch_size": self.row_steps / max(self.steps, 1),
+            "avg_ttft_ms": 1000.0 * self.ttft_total / max(self.streams_served + self.streams_cancelled, 1),
+        }
+
+
+# ==========================
+# Minimal asyncio HTTP front-end
+# ==========================
+def parse_generate_request(body):
+    """Validated `DecodeLoop.submit` options from a /generate body; raises ValueError with the reason"""
+    try:
+        request = json.loads(body or b"{}")
+    except (json.JSONDecodeError, UnicodeDecodeError) as exc:
+        raise ValueError("body must be JSON") from exc
+    if not isinstance(request, dict) or not isinstance(request.get("prompt"), str):
+        raise ValueError("body must be a JSON object with a string 'prompt'")
+
+    def number(name, default, integer=False):
+        value = request.get(name, default)
+        kind = int if integer else (int, float)
+        if isinstance(value, bool) or not isinstance(value, kind):
+            raise ValueError(f"'{name}' must be {'an integer' if integer else 'a number'}")
+        return value
+
+    options = {
+        "max_new_tokens": number("max_new_tokens", 40, integer=True),
+        "temperature": float(number("temperature", 0.0)),
+        "top_k": number("top_k", 0, integer=True),
+        "top_p": float(number("top_p", 1.0)),
+        "seed": None if request.get("seed") is None else number("seed", None, integer=True),
+    }
+    if options["max_new_tokens"] < 1:
+        raise ValueError("'max_new_tokens' must be at least 1")
+    for name in ("temperature", "top_k", "seed"):
+        if options[name] is not None and options[name] < 0:
+            raise ValueError(f"'{name}' must not be negative")
+    if not 0 < options["top_p"] <= 1:
+        raise ValueError("'top_p' must be in (0, 1]")
+    return request["prompt"], options
+
+
+class Server:
+    """POST /generate streams tokens as SSE or NDJSON, GET /metrics"""
+
+    def __init__(self, decode_loop, tokenizer):
+        self.decode_loop = decode_loop
+        self.tokenizer = tokenizer
+
+    async def handle_connection(self, reader, writer):
+        try:
+            method, path, _ = (await reader.readline()).decode().split(" ", 2)
+            headers = {}
+            while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                key, value = line.decode().split(":", 1)
+                headers[key.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+            if method == "POST" and path == "/generate":
+                await self.generate(reader, writer, headers, body)
+            elif method == "GET" and path == "/metrics":
+                await self.respond(writer, "200 OK", self.decode_loop.metrics())
+            else:
+                await self.respond(writer, "404 Not Found", {"error": f"no route for {method} {path}"})
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def respond(writer, status, payload):
+        data = json.dumps(payload).encode()
+        writer.write(f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode() + data)
+        await writer.drain()
+
+    async def generate(self, reader, writer, headers, body):
+        try:
+            prompt, options = parse_generate_request(body)
+        except ValueError as exc:
+            await self.respond(writer, "400 Bad Request", {"error": str(exc)})
+            return
+
+        sse = "text/event-stream" in headers.get("accept", "")
+        stream = self.decode_loop.submit(self.tokenizer.encode(prompt), **options)
+
+        def chunk(event, payload):
+            line = json.dumps(payload)
+            data = (f"event: {event}\ndata: {line}\n\n" if event != "token" else f"data: {line}\n\n") \
+                if sse else line + "\n"
+            return f"{len(data.encode()):x}\r\n{data}\r\n".encode()
+
+        writer.write(f"HTTP/1.1 200 OK\r\nContent-Type: "
+                     f"{'text/event-stream' if sse else 'application/x-ndjson'}\r\n"
+                     f"Cache-Control: no-cache\r\nTransfer-Encoding: chunked\r\nConnection: close\r\n\r\n".encode())
+
+        # The request has been read completely, so EOF on the socket means the client went away
+        disconnected = asyncio.ensure_future(reader.read())
+        text = []
+        try:
+            while True:
+                next_token = asyncio.ensure_future(stream.queue.get())
+                await asyncio.wait({next_token, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+                if not next_token.done():
+                    next_token.cancel()
+                    raise ConnectionResetError
+                token = next_token.result()
+                if token is None:
+                    break
+                piece = self.tokenizer.decode([token])
+                text.append(piece)
+                writer.write(chunk("token", {"index": len(text) - 1, "id": token, "token": piece}))
+                await writer.drain()
+            writer.write(chunk("done", {"done": True, "text": "".join(text), **stream.stats()}) + b"0\r\n\r\n")
+            await writer.drain()
+        except ConnectionError:
+            self.decode_loop.cancel(stream)
+        finally:
+            disconnected.cancel()
+
+
+# ==========================
+# Streaming clients: TTFT and tokens/sec
+# ==========================
+async def stream_request(host, port, payload, disconnect_after=None):
+    """NDJSON client: returns client-side TTFT, tokens/sec and the server's final stats"""
+    reader, writer = await asyncio.open_connection(host, port)
+    body = json.dumps(payload).encode()
+    start = time.perf_counter()
+    writer.write(f"POST /generate HTTP/1.1\r\nHost: {host}\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    while await reader.readline() not in (b"\r\n", b""):  # status line and headers
+        pass
+
+    first = last = None
+    tokens, final = 0, None
+    while True:
+        size = int((await reader.readline()).strip() or b"0", 16)
+        if not size:
+            break
+        event = json.loads(await reader.readexactly(size))
+        await reader.readline()
+        if event.get("done"):
+            final = event
+            continue
+        last = time.perf_counter()
+        first = first or last
+        tokens += 1
+        if tokens == disconnect_after:
+            break
+    writer.close()
+    return {
+        "ttft": None if first is None else first - start,
+        "tokens": tokens,
+        "tokens_per_sec": (tokens - 1) / (last - first) if tokens > 1 and last > first else None,
+        "final": final,
+    }
+
+
+async def benchmark(decoder, tokenizer, args):
+    """Concurrent streaming clients against a shared batched loop, then against batch size 1"""
+    prompts = ["hello ", "how are ", "what is ", "fine ", "hello world "]
+    print(f"{args.benchmark} streams x {args.max_new_tokens} tokens, {args.concurrency} concurrent clients")
+    print(f"{'max batch':>9} | {'TTFT p50':>9} | {'TTFT p95':>9} | {'tokens/sec/stream':>17} | "
+          f"{'total tokens/sec':>16} | avg batch")
+    print("-" * 85)
+    for max_batch_size in (args.max_batch_size, 1):
+        decode_loop = DecodeLoop(decoder, max_batch_size=max_batch_size)
+        loop_task = asyncio.create_task(decode_loop.run())
+        server = await asyncio.start_server(Server(decode_loop, tokenizer).handle_connection, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        pending = iter(range(args.benchmark))
+        results = []
+
+        async def client():
+            for i in pending:  # pylint: disable=cell-var-from-loop
+                results.append(await stream_request("127.0.0.1", port, {  # pylint: disable=cell-var-from-loop
+                    "prompt": prompts[i % len(prompts)], "max_new_tokens": args.max_new_tokens,
+                    "temperature": 0.8, "seed": i}))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+        ttfts = np.array([r["ttft"] for r in results]) * 1000.0
+        rates = [r["tokens_per_sec"] for r in results if r["tokens_per_sec"]]
+        print(f"{max_batch_size:>9} | {np.percentile(ttfts, 50):6.1f} ms | {np.percentile(ttfts, 95):6.1f} ms | "
+              f"{np.mean(rates):17,.0f} | {sum(r['tokens'] for r in results) / elapsed:16,.0f} | "
+              f"{decode_loop.metrics()['avg_batch_size']:.1f}")
+
+        if max_batch_size == args.max_batch_size:
+            # Greedy streams that join mid-flight must decode exactly as they would alone
+            staggered = []
+            for prompt in prompts:
+                staggered.append(asyncio.create_task(stream_request("127.0.0.1", port, {
+                    "prompt": prompt, "max_new_tokens": 30})))
+                await asyncio.sleep(0.005)
+            same = all(r["final"]["text"] == tokenizer.decode(decoder.generate(tokenizer.encode(p), 30)[len(p):])
+                       for p, r in zip(prompts, await asyncio.gather(*staggered)))
+
+            # A client that hangs up after 3 tokens: its row must leave the batch
+            await stream_request("127.0.0.1", port, {"prompt": "hello ", "max_new_tokens": 10_000}, disconnect_after=3)
+            await asyncio.sleep(0.2)
+            metrics = decode_loop.metrics()
+            cancelled = f"cancelled={metrics['streams_cancelled']}, active={metrics['active_streams']}"
+
+        server.close()
+        loop_task.cancel()
+    print(f"\nstaggered greedy streams match KVCacheDecoder.generate: {same}")
+    print(f"disconnect after 3 tokens: {cancelled}")
+
+
+async def main(args):
+    from tensorflow import keras  # type: ignore  # pylint: disable=import-outside-toplevel
+    from tiny_tokenizer import ArrayTokenizer  # pylint: disable=import-outside-toplevel
+
+    from model_char_embedding import get_gpt_model  # pylint: disable=import-outside-toplevel
+    from token_corpus import TokenCorpus, iter_chunks, window_dataset, write_token_file  # pylint: disable=import-outside-toplevel
+
+    def chunks():
+        return iter_chunks(args.corpus) if args.corpus else [SAMPLE_TEXT * 20]
+
+    tokenizer = ArrayTokenizer(sorted(set().union(*map(set, chunks()))), char_level=True, lower=False, filters="")
+    model = get_gpt_model(len(tokenizer), args.seq_length)
+    model.compile(optimizer="adam", loss=keras.losses.SparseCategoricalCrossentropy(from_logits=True))
+    # The token file is only needed for training; the directory goes away with it
+    with tempfile.TemporaryDirectory() as token_dir:
+        token_file = os.path.join(token_dir, "corpus.tok")
+        write_token_file(chunks(), tokenizer, token_file)
+        model.fit(window_dataset(TokenCorpus(token_file), args.seq_length, batch_size=32),
+                  epochs=args.epochs, verbose=0)
+    decoder = KVCacheDecoder(model)
+
+    if args.benchmark:
+        await benchmark(decoder, tokenizer, args)
+        return
+
+    decode_loop = DecodeLoop(decoder, max_batch_size=args.max_batch_size)
+    loop_task = asyncio.create_task(decode_loop.run())  # pylint: disable=unused-variable
+    server = await asyncio.start_server(Server(decode_loop, tokenizer).handle_connection, args.host, args.port)
+    print(f"Serving on http://{args.host}:{args.port} (POST /generate, GET /metrics)")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", nargs="*", help="text files to train on (default: a built-in sample corpus)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--seq-length", type=int, default=16)
+    parser.add_argument("--epochs", type=int, default=20)
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--benchmark", type=int, default=0,
+                        help="run N streaming clients against an in-process server and exit")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    asyncio.run(main(parser.parse_args()))
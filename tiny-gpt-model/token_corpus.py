@@ -0,0 +1,163 @@
+"""
+Memory-mapped token corpus and strided training windows for tiny GPT.
+
+`__main__` used to build every (input, target) window with list slices, so a
+corpus of N tokens became ~2 * N * seq_length copied ids in RAM. Here the
+corpus is tokenized once, in bounded chunks, into a flat uint16 (or uint32
+for vocabularies above 65,536) token file next to a small JSON header:
+
+    corpus.tok        raw token ids
+    corpus.tok.json   {"dtype": "uint16", "num_tokens": N, "vocab_size": V}
+
+TokenCorpus memory-maps that file, and `windows()` is a zero-copy strided
+view: window i is tokens[i * stride : i * stride + seq_length + 1], and
+input / target are its first / last seq_length ids. `window_dataset` feeds
+batches of window indices through tf.data and gathers only those rows, so
+memory is bounded by a few batches however large the corpus is:
+
+  - shuffle=False: windows in corpus order (one full pass per epoch)
+  - shuffle=True:  random window offsets, redrawn every epoch
+
+    write_token_file(iter_chunks(["corpus.txt"]), tokenizer, "corpus.tok")
+    corpus = TokenCorpus("corpus.tok")
+    model.fit(window_dataset(corpus, seq_length=8, batch_size=64), epochs=10)
+
+    python token_corpus.py corpus.txt --seq-length 64   # windows/sec, copied loop vs dataset
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import tensorflow as tf
+
+
+def token_dtype(vocab_size):
+    return np.uint16 if vocab_size <= np.iinfo(np.uint16).max + 1 else np.uint32
+
+
+def iter_chunks(paths, chunk_chars=1 << 20):
+    """Whole lines of every file, grouped into ~chunk_chars strings"""
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            lines, size = [], 0
+            for line in f:
+                lines.append(line)
+                size += len(line)
+                if size >= chunk_chars:
+                    yield "".join(lines)
+                    lines, size = [], 0
+            if lines:
+                yield "".join(lines)
+
+
+def write_token_file(chunks, tokenizer, out_path):
+    """
+    Tokenizes an iterable of text chunks (e.g. `iter_chunks(paths)`) one at a
+    time into out_path (+ out_path.json); returns the token count
+    """
+    dtype = token_dtype(len(tokenizer))
+    num_tokens = 0
+    with open(out_path, "wb") as f:
+        for chunk in chunks:
+            ids = np.asarray(tokenizer.encode(chunk), dtype=dtype)
+            ids.tofile(f)
+            num_tokens += len(ids)
+    with open(out_path + ".json", "w", encoding="utf-8") as f:
+        json.dump({"dtype": np.dtype(dtype).name, "num_tokens": num_tokens, "vocab_size": len(tokenizer)}, f)
+    return num_tokens
+
+
+class TokenCorpus:
+    """Read-only memory map over a token file written by `write_token_file`"""
+
+    def __init__(self, path):
+        with open(path + ".json", encoding="utf-8") as f:
+            header = json.load(f)
+        self.vocab_size = header["vocab_size"]
+        self.tokens = np.memmap(path, dtype=header["dtype"], mode="r", shape=(header["num_tokens"],))
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def windows(self, seq_length, stride=1):
+        """(num_windows, seq_length + 1) strided view of the map; nothing is copied"""
+        return np.lib.stride_tricks.sliding_window_view(self.tokens, seq_length + 1)[::stride]
+
+    def num_windows(self, seq_length, stride=1):
+        return max(len(self.tokens) - seq_length - 1, -1) // stride + 1
+
+
+def window_dataset(corpus, seq_length, batch_size=64, shuffle=True, stride=1, seed=None,
+                   batches_per_epoch=None):
+    """
+    (inputs, targets) int32 batches of shape (batch_size, seq_length) for
+    model.fit. Each epoch re-iterates the dataset: in order it covers every
+    window once; shuffled it draws batches_per_epoch (default: one pass worth)
+    batches of uniformly random windows, different every epoch.
+    """
+    total = corpus.num_windows(seq_length, stride)
+    if total <= 0:
+        raise ValueError(f"corpus of {len(corpus)} tokens is too short for seq_length={seq_length}")
+    windows = corpus.windows(seq_length, stride)
+
+    if shuffle:
+        batches_per_epoch = batches_per_epoch or max(total // batch_size, 1)
+        indices = tf.data.Dataset.random(seed=seed, rerandomize_each_iteration=True)
+        indices = indices.map(lambda r: r % total).take(batches_per_epoch * batch_size)
+    else:
+        indices = tf.data.Dataset.range(total)
+
+    def gather(batch_indices):
+        # Fancy indexing the strided view reads just these rows from the map
+        return windows[batch_indices].astype(np.int32)
+
+    def split(batch_indices):
+        rows = tf.numpy_function(gather, [batch_indices], tf.int32, stateful=False)
+        rows = tf.ensure_shape(rows, [None, seq_length + 1])
+        return rows[:, :-1], rows[:, 1:]
+
+    return indices.batch(batch_size).map(split, num_parallel_calls=tf.data.AUTOTUNE).prefetch(tf.data.AUTOTUNE)
+
+
+if __name__ == "__main__":
+
+    from tiny_tokenizer import ArrayTokenizer
+
+    parser = argparse.ArgumentParser(description="Tokenize a corpus once, then stream windows from the memory map")
+    parser.add_argument("corpus", nargs="+")
+    parser.add_argument("--out", default="corpus.tok")
+    parser.add_argument("--seq-length", type=int, default=64)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--batches", type=int, default=200)
+    args = parser.parse_args()
+
+    chars = sorted(set().union(*map(set, iter_chunks(args.corpus))))
+    char_tokenizer = ArrayTokenizer(chars, char_level=True, lower=False, filters="")
+    start = time.perf_counter()
+    count = write_token_file(iter_chunks(args.corpus), char_tokenizer, args.out)
+    print(f"{count:,} tokens → {args.out} ({os.path.getsize(args.out) / 2**20:.1f} MiB, "
+          f"{token_dtype(len(char_tokenizer)).__name__}) in {time.perf_counter() - start:.2f}s")
+
+    token_corpus = TokenCorpus(args.out)
+    windows_wanted = args.batches * args.batch_size
+
+    # The old __main__ approach: slice (and copy) every window into lists
+    start = time.perf_counter()
+    data = token_corpus.tokens[:windows_wanted + args.seq_length + 1].tolist()
+    inputs = np.array([data[i:i + args.seq_length] for i in range(windows_wanted)])
+    targets = np.array([data[i + 1:i + args.seq_length + 1] for i in range(windows_wanted)])
+    copied = time.perf_counter() - start
+
+    dataset = window_dataset(token_corpus, args.seq_length, args.batch_size, batches_per_epoch=args.batches)
+    start = time.perf_counter()
+    seen = sum(int(x.shape[0]) for x, _ in dataset)
+    streamed = time.perf_counter() - start
+
+    full_copy = token_corpus.num_windows(args.seq_length) * (inputs.nbytes + targets.nbytes) / windows_wanted
+    print(f"copied windows: {windows_wanted / copied:10,.0f} windows/sec, "
+          f"{full_copy / 2**20:10,.1f} MiB to hold every window of the corpus")
+    print(f"window_dataset: {seen / streamed:10,.0f} windows/sec, "
+          f"{args.batch_size * (args.seq_length + 1) * 4 / 2**10:10,.1f} KiB per batch (+ the shared map)")
@@ -0,0 +1,228 @@
+"""
+Multi-process data-parallel training of `get_gpt_model` on CPU.
+
+The launcher tokenizes the corpus once into a memory-mapped token file
+(token_corpus.py) and starts N localhost worker processes with a TF_CONFIG
+each, so `tf.distribute.MultiWorkerMirroredStrategy` all-reduces gradients
+between them over gRPC collectives. Every worker:
+
+  - caps its TensorFlow thread pools to its share of the cores
+  - maps the same token file (no copy per worker) and reads its own shard:
+    random windows drawn with a per-worker seed, per-replica batch
+    = global batch / workers
+  - trains the same number of steps per epoch, so the collectives stay in step
+
+The global batch is `--batch-size-per-worker * N`, and the learning rate
+is scaled linearly with it. The chief (worker 0) saves the weights and
+reports throughput.
+
+    python train_distributed.py corpus.txt --workers 4 --epochs 5
+    python train_distributed.py corpus.txt --scaling 1 2 4 8   # tokens/sec from 1 to N workers
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+SAMPLE_TEXT = "hello world how are you today what is up hello world again fine thank you\n"
+
+# Options the launcher forwards to every worker
+WORKER_OPTIONS = ("epochs", "steps_per_epoch", "batch_size_per_worker", "learning_rate", "seq_length",
+                  "embed_dim", "num_heads", "ff_dim", "num_blocks", "seed", "save")
+
+
+def free_ports(count):
+    sockets = [socket.socket() for _ in range(count)]
+    for s in sockets:
+        s.bind(("localhost", 0))
+    ports = [s.getsockname()[1] for s in sockets]
+    for s in sockets:
+        s.close()
+    return ports
+
+
+# ==========================
+# Worker
+# ==========================
+def run_worker(args):
+    """Runs inside one worker process (TF_CONFIG already set by the launcher)"""
+    import tensorflow as tf  # pylint: disable=import-outside-toplevel
+
+    tf.config.threading.set_intra_op_parallelism_threads(args.threads)
+    tf.config.threading.set_inter_op_parallelism_threads(args.threads)
+
+    from tensorflow import keras  # type: ignore  # pylint: disable=import-outside-toplevel
+    from model_char_embedding import get_gpt_model  # pylint: disable=import-outside-toplevel
+    from token_corpus import TokenCorpus, window_dataset  # pylint: disable=import-outside-toplevel
+
+    strategy = tf.distribute.MultiWorkerMirroredStrategy()
+    workers = strategy.num_replicas_in_sync
+    global_batch = args.batch_size_per_worker * workers
+    corpus = TokenCorpus(args.token_file)
+    steps_per_epoch = args.steps_per_epoch or max(corpus.num_windows(args.seq_length) // global_batch, 1)
+
+    def dataset_fn(input_context):
+        dataset = window_dataset(corpus, args.seq_length, input_context.get_per_replica_batch_size(global_batch),
+                                 seed=args.seed + input_context.input_pipeline_id,
+                                 batches_per_epoch=steps_per_epoch)
+        options = tf.data.Options()
+        options.experimental_distribute.auto_shard_policy = tf.data.experimental.AutoShardPolicy.OFF
+        # Each worker already draws its own windows; repeat() because fit keeps one iterator across epochs
+        return dataset.repeat().with_options(options)
+
+    with strategy.scope():
+        model = get_gpt_model(corpus.vocab_size, args.seq_length, embed_dim=args.embed_dim,
+                              num_heads=args.num_heads, ff_dim=args.ff_dim, num_blocks=args.num_blocks)
+        model.compile(optimizer=keras.optimizers.Adam(args.learning_rate * workers),
+                      loss=keras.losses.SparseCategoricalCrossentropy(from_logits=True))
+
+    epoch_times = []
+    timer = keras.callbacks.LambdaCallback(
+        on_epoch_begin=lambda epoch, logs: epoch_times.append(time.perf_counter()),
+        on_epoch_end=lambda epoch, logs: epoch_times.append(time.perf_counter()))
+    history = model.fit(strategy.distribute_datasets_from_function(dataset_fn), epochs=args.epochs,
+                        steps_per_epoch=steps_per_epoch, callbacks=[timer], verbose=0)
+
+    chief = json.loads(os.environ["TF_CONFIG"])["task"]["index"] == 0
+    # Every worker takes part in saving; only the chief's copy is kept
+    if chief:
+        model.save_weights(args.save)
+    else:
+        with tempfile.TemporaryDirectory() as scratch:
+            model.save_weights(os.path.join(scratch, "weights"))
+
+    if chief:
+        # First epoch includes tracing and collective setup, so it is left out
+        timed = [end - begin for begin, end in zip(epoch_times[2::2], epoch_times[3::2])] or [epoch_times[1] - epoch_times[0]]
+        tokens_per_sec = steps_per_epoch * global_batch * args.seq_length * len(timed) / sum(timed)
+        print(json.dumps({"workers": workers, "global_batch": global_batch, "steps_per_epoch": steps_per_epoch,
+                          "tokens_per_sec": tokens_per_sec, "final_loss": history.history["loss"][-1]}))
+
+
+# ==========================
+# Launcher
+# ==========================
+def launch(args, workers):
+    """
+    Starts `workers` local worker processes and returns the chief's report.
+    If any worker fails (or `--timeout` passes) the others are killed, since
+    they would otherwise block forever in the collectives.
+    """
+    hosts = [f"localhost:{port}" for port in free_ports(workers)]
+    threads = max((os.cpu_count() or 1) // workers, 1)
+    worker_args = [arg for name in WORKER_OPTIONS
+                   for arg in (f"--{name.replace('_', '-')}", str(getattr(args, name)))]
+    processes = []
+    for index in range(workers):
+        env = dict(os.environ, TF_CPP_MIN_LOG_LEVEL="3",
+                   TF_CONFIG=json.dumps({"cluster": {"worker": hosts}, "task": {"type": "worker", "index": index}}))
+        cmd = [sys.executable, __file__, *worker_args, "--token-file", args.token_file,
+               "--threads", str(threads), "--worker"]
+        processes.append(subprocess.Popen(cmd, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True))
+
+    # Drain every pipe in the background so no worker blocks on a full one
+    outputs = [[None, None] for _ in processes]
+
+    def drain(process, output):
+        output[:] = process.communicate()
+
+    readers = [threading.Thread(target=drain, args=(p, out), daemon=True) for p, out in zip(processes, outputs)]
+    for reader in readers:
+        reader.start()
+
+    deadline = time.monotonic() + args.timeout if args.timeout else None
+    timed_out = False
+    while True:
+        codes = [p.poll() for p in processes]
+        failed = [i for i, code in enumerate(codes) if code not in (None, 0)]
+        if failed or None not in codes:
+            break
+        if deadline and time.monotonic() > deadline:
+            timed_out = True
+            break
+        time.sleep(0.2)
+
+    for p in processes:
+        if p.poll() is None:
+            p.kill()
+    for reader in readers:
+        reader.join()
+
+    if timed_out:
+        raise RuntimeError(f"workers did not finish within {args.timeout}s")
+    if failed:
+        err = (outputs[failed[0]][1] or "").strip()
+        raise RuntimeError(f"worker {failed[0]} failed with exit code {codes[failed[0]]}: "
+                           f"{err.splitlines()[-1] if err else 'no output'}")
+    return json.loads(outputs[0][0].strip().splitlines()[-1])
+
+
+def run(args):
+    """Single run (--workers) or scaling table (--scaling) over the tokenized corpus"""
+    if not args.scaling:
+        report = launch(args, args.workers)
+        print(f"{report['workers']} workers, global batch {report['global_batch']}: "
+              f"{report['tokens_per_sec']:,.0f} tokens/sec, final loss {report['final_loss']:.3f} "
+              f"(weights: {args.save})")
+        return
+
+    print(f"{'workers':>7} | {'global batch':>12} | {'tokens/sec':>10} | {'scaling':>7} | {'efficiency':>10} | loss")
+    print("-" * 68)
+    baseline = None
+    for workers in args.scaling:
+        report = launch(args, workers)
+        baseline = baseline or report["tokens_per_sec"] / workers
+        speedup = report["tokens_per_sec"] / baseline
+        print(f"{workers:>7} | {report['global_batch']:>12} | {report['tokens_per_sec']:10,.0f} | "
+              f"{speedup:6.2f}x | {speedup / workers:10.0%} | {report['final_loss']:.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", nargs="*", help="text files (default: a built-in sample corpus)")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--scaling", type=int, nargs="+", help="report throughput for each worker count")
+    parser.add_argument("--epochs", type=int, default=3)
+    parser.add_argument("--steps-per-epoch", type=int, default=0, help="0 = one pass worth of windows")
+    parser.add_argument("--batch-size-per-worker", type=int, default=32)
+    parser.add_argument("--learning-rate", type=float, default=1e-3, help="per worker; scaled by the worker count")
+    parser.add_argument("--seq-length", type=int, default=32)
+    parser.add_argument("--embed-dim", type=int, default=64)
+    parser.add_argument("--num-heads", type=int, default=2)
+    parser.add_argument("--ff-dim", type=int, default=128)
+    parser.add_argument("--num-blocks", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", default="distributed_weights/gpt")
+    parser.add_argument("--timeout", type=float, default=0, help="seconds per run before the workers are killed (0 = none)")
+    parser.add_argument("--token-file", help=argparse.SUPPRESS)
+    parser.add_argument("--threads", type=int, default=1, help=argparse.SUPPRESS)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    # Tokenize once; every worker memory-maps the same file
+    from tiny_tokenizer import ArrayTokenizer  # pylint: disable=import-outside-toplevel
+    from token_corpus import iter_chunks, write_token_file  # pylint: disable=import-outside-toplevel
+
+    def chunks():
+        return iter_chunks(args.corpus) if args.corpus else [SAMPLE_TEXT * 500]
+
+    with tempfile.TemporaryDirectory() as token_dir:
+        tokenizer = ArrayTokenizer(sorted(set().union(*map(set, chunks()))), char_level=True, lower=False, filters="")
+        args.token_file = os.path.join(token_dir, "corpus.tok")
+        num_tokens = write_token_file(chunks(), tokenizer, args.token_file)
+        print(f"{num_tokens:,} tokens, vocab {len(tokenizer)}, {os.cpu_count()} cores")
+        run(args)
+
+
+if __name__ == "__main__":
+    main()
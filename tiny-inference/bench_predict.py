@@ -0,0 +1,64 @@
+"""
+Per-call latency of `model.predict` vs CompiledPredictor (with and without XLA).
+
+Builds a small next-token model shaped like the tiny examples (embedding →
+self-attention → dense head), then times single-example calls of each path
+and checks that they return the same outputs.
+
+    python bench_predict.py
+    python bench_predict.py --seq-lengths 8 64 --calls 500
+"""
+
+import argparse
+import time
+
+import numpy as np
+from tensorflow import keras  # type: ignore
+
+from tiny_inference import CompiledPredictor
+
+
+def build_model(vocab_size, seq_length, embed_dim=32):
+    inputs = keras.Input(shape=(seq_length,))
+    x = keras.layers.Embedding(vocab_size, embed_dim)(inputs)
+    x = x + keras.layers.MultiHeadAttention(num_heads=2, key_dim=embed_dim)(x, x)
+    x = keras.layers.Dense(64, activation="relu")(x)
+    return keras.Model(inputs, keras.layers.Dense(vocab_size)(x))
+
+
+def latency_ms(fn, calls):
+    fn()  # warm up / trace
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seq-lengths", type=int, nargs="+", default=[8, 32, 128])
+    parser.add_argument("--vocab-size", type=int, default=64)
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'seq_length':>10} | {'model.predict':>13} | {'compiled':>9} | {'compiled+jit':>12} | "
+          f"{'speedup':>7} | same output")
+    print("-" * 82)
+    for seq_length in args.seq_lengths:
+        model = build_model(args.vocab_size, seq_length)
+        x = np.random.randint(0, args.vocab_size, size=(1, seq_length)).astype("int32")
+        compiled = CompiledPredictor(model, last_position=True)
+        jitted = CompiledPredictor(model, last_position=True, jit_compile=True)
+        compiled.inputs[:] = jitted.inputs[:] = x
+
+        predict_ms = latency_ms(lambda: model.predict(x, verbose=0)[:, -1], args.calls)
+        compiled_ms = latency_ms(compiled, args.calls)
+        jit_ms = latency_ms(jitted, args.calls)
+        same = np.allclose(model.predict(x, verbose=0)[:, -1], compiled(), atol=1e-5) and \
+            np.allclose(compiled(), jitted(), atol=1e-4)
+        print(f"{seq_length:>10} | {predict_ms:10.2f} ms | {compiled_ms:6.2f} ms | {jit_ms:9.2f} ms | "
+              f"{predict_ms / min(compiled_ms, jit_ms):6.0f}x | {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+"""Compiled inference wrapper shared by basic-rnn, tiny-gpt-model and tiny-moe-based-model."""
+
+from .predictor import CompiledPredictor
+
+__all__ = ["CompiledPredictor"]
@@ -0,0 +1,78 @@
+"""
+CompiledPredictor: a fixed-signature forward pass for small Keras models.
+
+`model.predict(x, verbose=0)` builds a data adapter, a callback list and a
+predict function on every call. For a one-example forward pass of a tiny
+model that overhead is most of the latency. CompiledPredictor instead:
+
+  - traces `model(x, training=False)` once as a tf.function whose input
+    signature is fixed to (batch_size, *model input shape), so calls never
+    retrace
+  - keeps the input in a preallocated NumPy buffer (`inputs`) that callers
+    fill in place, e.g. `tokenizer.encode_batch(..., out=predictor.inputs)`
+  - optionally returns only the last sequence position (next-token models),
+    so the full (batch, seq_len, vocab) output never leaves the graph
+  - optionally jit-compiles the forward pass with XLA
+
+TensorFlow is a required dependency, but only with a lower bound: the
+package uses whichever TensorFlow (and Keras 2 or 3) the calling project
+pins.
+
+A predictor holds only a weak reference to its model (the traced graph
+keeps the weights it needs), so `for_model` entries go away with their
+model.
+
+    predictor = CompiledPredictor.for_model(model, last_position=True)
+    tokenizer.encode_batch([text], seq_len, out=predictor.inputs)
+    logits = predictor()                 # (1, vocab) NumPy array
+"""
+
+import weakref
+
+import numpy as np
+import tensorflow as tf
+
+# One predictor per (model, options), so helpers that receive the model on
+# every call still trace only once. Predictors only weakly reference their
+# model, so entries go away with it
+_PREDICTORS = weakref.WeakKeyDictionary()
+
+
+class CompiledPredictor:
+    """Traced, fixed-shape replacement for `model.predict` on small batches"""
+
+    def __init__(self, model, batch_size=1, dtype="int32", last_position=False, jit_compile=False):
+        self._model = weakref.ref(model)
+        self.inputs = np.zeros((batch_size, *model.input_shape[1:]), dtype=dtype)
+        self.last_position = last_position
+
+        model_ref = self._model
+
+        def forward(x):
+            outputs = model_ref()(x, training=False)
+            return outputs[:, -1] if last_position else outputs
+
+        self._forward = tf.function(
+            forward,
+            input_signature=[tf.TensorSpec(self.inputs.shape, tf.as_dtype(dtype))],
+            jit_compile=jit_compile,
+        )
+
+    @property
+    def model(self):
+        return self._model()
+
+    @classmethod
+    def for_model(cls, model, **options):
+        """Cached predictor for `model` with these options (built and traced on first use)"""
+        cached = _PREDICTORS.setdefault(model, {})
+        key = tuple(sorted(options.items()))
+        if key not in cached:
+            cached[key] = cls(model, **options)
+        return cached[key]
+
+    def __call__(self, inputs=None):
+        """Forward pass over `inputs` (copied into the buffer) or over the buffer as already filled"""
+        if inputs is not None:
+            np.copyto(self.inputs, inputs, casting="unsafe")
+        return self._forward(self.inputs).numpy()
@@ -0,0 +1,151 @@
+"""
+Self-describing inference bundle for the tiny MoE model.
+
+`export` writes one SavedModel directory that contains everything needed to
+predict: the traced forward pass with a fixed input signature, the
+vocabulary as a string array (index → word) plus an in-graph lookup table
+(word → index), in-graph Keras-compatible text cleaning, and the metadata
+(max_seq_len, vocab_size). Loading it needs neither model.py, Keras, the
+pickled tokenizer nor max_seq_len.txt.
+
+    python bundle.py export      # saved_model/* → saved_model/moe_bundle
+    python bundle.py benchmark   # cold-start time: current path vs bundle
+"""
+
+import os
+import re
+import subprocess
+import sys
+import time
+
+import tensorflow as tf
+from tiny_tokenizer import KERAS_FILTERS  # same characters the Keras Tokenizer strips by default
+
+BUNDLE_DIR = "saved_model/moe_bundle"
+
+
+# ==========================
+# Export
+# ==========================
+class MoEBundle(tf.Module):
+    def __init__(self, model, vocabulary, max_seq_len):
+        super().__init__()
+        self.model = model
+        self.vocabulary = tf.constant(vocabulary)  # index → word, index 0 is padding
+        self.max_seq_len = tf.constant(max_seq_len, dtype=tf.int32)
+        self.vocab_size = tf.constant(len(vocabulary), dtype=tf.int32)
+        self.table = tf.lookup.StaticHashTable(
+            tf.lookup.KeyValueTensorInitializer(
+                tf.constant(vocabulary[1:]), tf.range(1, len(vocabulary), dtype=tf.int32)),
+            default_value=-1,
+        )
+        self._seq_len = max_seq_len
+
+    @tf.function(input_signature=[tf.TensorSpec([None], tf.string)])
+    def encode(self, texts):
+        """Keras Tokenizer + pad_sequences(maxlen) equivalent: (batch,) → (batch, max_seq_len)"""
+        cleaned = tf.strings.regex_replace(tf.strings.lower(texts), f"[{re.escape(KERAS_FILTERS)}]", " ")
+        ids = self.table.lookup(tf.strings.split(cleaned))
+        ids = tf.ragged.boolean_mask(ids, ids >= 0)[:, -self._seq_len:]  # drop unknown words, keep the tail
+
+        # Left-pad: the j-th of n tokens goes to column max_seq_len - n + j
+        rows = ids.value_rowids()
+        lengths = tf.gather(ids.row_lengths(), rows)
+        cols = tf.range(tf.size(rows, out_type=tf.int64)) - tf.gather(ids.row_starts(), rows)
+        cols += self._seq_len - lengths
+        return tf.scatter_nd(tf.stack([rows, cols], axis=1), ids.flat_values,
+                             tf.stack([ids.nrows(), tf.constant(self._seq_len, tf.int64)]))
+
+    @tf.function(input_signature=[tf.TensorSpec([None, None], tf.int32)])
+    def forward(self, token_ids):
+        """Padded token ids → next-token probabilities"""
+        return self.model(token_ids, training=False)
+
+    @tf.function(input_signature=[tf.TensorSpec([None], tf.string)])
+    def predict_next(self, texts):
+        """Raw phrases → predicted next word per phrase"""
+        probs = self.forward(self.encode(texts))
+        return tf.gather(self.vocabulary, tf.argmax(probs, axis=-1, output_type=tf.int32))
+
+
+def export(model_dir="saved_model", bundle_dir=BUNDLE_DIR):
+    from serve import load_artifacts  # pylint: disable=import-outside-toplevel
+
+    model, _, max_seq_len, index_word = load_artifacts(model_dir)
+    vocabulary = [""] + [index_word[i] for i in range(1, len(index_word) + 1)]
+    bundle = MoEBundle(model, vocabulary, max_seq_len)
+    tf.saved_model.save(bundle, bundle_dir, signatures={
+        "serving_default": bundle.predict_next,
+        "forward": bundle.forward,
+    })
+    print(f"Bundle written to {bundle_dir} (vocab={len(vocabulary)}, max_seq_len={max_seq_len})")
+
+
+# ==========================
+# Loading
+# ==========================
+def load_bundle(bundle_dir=BUNDLE_DIR):
+    """Loads the bundle; only TensorFlow core is imported"""
+    return tf.saved_model.load(bundle_dir)
+
+
+def predict_next(bundle, texts):
+    words = bundle.predict_next(tf.constant(texts)).numpy()
+    return [w.decode() or "<UNK>" for w in words]
+
+
+# ==========================
+# Cold-start comparison
+# ==========================
+CURRENT_PATH = """
+import time; t0 = time.perf_counter()
+import serve; t1 = time.perf_counter()
+model, serve.tokenizer, serve.max_seq_len, serve.index_word = serve.load_artifacts(); t2 = time.perf_counter()
+serve.predict_next(model, "hello world"); t3 = time.perf_counter()
+print(t1 - t0, t2 - t1, t3 - t2)
+"""
+
+BUNDLE_PATH = """
+import time; t0 = time.perf_counter()
+from bundle import load_bundle, predict_next; t1 = time.perf_counter()
+bundle = load_bundle(); t2 = time.perf_counter()
+predict_next(bundle, ["hello world"]); t3 = time.perf_counter()
+print(t1 - t0, t2 - t1, t3 - t2)
+"""
+
+
+def cold_start(code, runs):
+    """Best-of-`runs` wall time of a fresh interpreter, plus its import/load/predict split"""
+    env = dict(os.environ, TF_CPP_MIN_LOG_LEVEL="3")
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, "-c", code], env=env,
+                                capture_output=True, text=True, check=True)
+        total = time.perf_counter() - start
+        if best is None or total < best[0]:
+            best = (total, *map(float, result.stdout.split()[-3:]))
+    return best
+
+
+def benchmark(runs=3):
+    print(f"Cold start to first prediction (best of {runs} fresh processes):")
+    print(f"{'path':<8} | {'total':>7} | {'imports':>7} | {'load':>7} | {'1st pred':>8}")
+    results = {}
+    for name, code in (("current", CURRENT_PATH), ("bundle", BUNDLE_PATH)):
+        total, imports, load, first = results[name] = cold_start(code, runs)
+        print(f"{name:<8} | {total:6.2f}s | {imports:6.2f}s | {load:6.2f}s | {first:7.2f}s")
+    current, bundled = results["current"], results["bundle"]
+    print(f"speedup: {current[0] / bundled[0]:.2f}x total, "
+          f"{sum(current[2:]) / sum(bundled[2:]):.2f}x after imports")
+
+
+if __name__ == "__main__":
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "export"
+    if command == "export":
+        export()
+    elif command == "benchmark":
+        benchmark()
+    else:
+        sys.exit(f"unknown command '{command}', expected 'export' or 'benchmark'")
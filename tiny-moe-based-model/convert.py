@@ -0,0 +1,39 @@
+import sys
+import numpy as np
+from keras.models import load_model
+from model import MoELayer, GatingNetwork, FusedMoELayer, convert_to_fused
+
+
+if __name__ == "__main__":
+
+    print("============ Converting to fused experts ===========")
+
+    source_path = sys.argv[1] if len(sys.argv) > 1 else "saved_model/tiny_moe_model.keras"
+    target_path = sys.argv[2] if len(sys.argv) > 2 else "saved_model/tiny_moe_model_fused.keras"
+
+    # ==========================
+    # Step 1: Load the existing checkpoint
+    # ==========================
+    model = load_model(source_path, custom_objects={
+    "MoELayer": MoELayer,
+    "GatingNetwork": GatingNetwork
+    })
+
+    # ==========================
+    # Step 2: Rebuild it with stacked expert weights
+    # ==========================
+    fused_model = convert_to_fused(model)
+
+    # ==========================
+    # Step 3: Check both layouts agree
+    # ==========================
+    max_seq_len = model.input_shape[1]
+    sample = np.random.randint(0, model.layers[1].input_dim, size=(16, max_seq_len))
+    diff = np.abs(model.predict(sample, verbose=0) - fused_model.predict(sample, verbose=0)).max()
+    print(f"Max abs difference: {diff:.2e}")
+
+    # ==========================
+    # Step 4: Save the fused model
+    # ==========================
+    fused_model.save(target_path)
+    print(f"Saved fused model to {target_path}")
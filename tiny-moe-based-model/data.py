@@ -0,0 +1,105 @@
+"""
+Streaming, memory-bounded training data for the tiny MoE model.
+
+Instead of materializing every prefix of every sentence and padding them all
+in memory, text files are read lazily:
+  1. `fit_vocabulary` makes one pass over the files to fit the ArrayTokenizer
+     (memory grows with the vocabulary, not the corpus).
+  2. `build_dataset` streams lines through tf.data, turns each sentence into
+     its (left-padded prefix, next word) pairs inside a parallel map, then
+     shuffles with a bounded buffer, batches and prefetches.
+
+Memory is bounded by `shuffle_buffer` + a few batches, whatever the corpus size.
+
+    python data.py corpus.txt [more.txt ...]   # reports examples/sec
+"""
+
+import re
+import sys
+import time
+
+import tensorflow as tf
+from tiny_tokenizer import KERAS_FILTERS, ArrayTokenizer
+
+
+def iter_lines(paths):
+    """Yields the non-empty lines of every file, one at a time"""
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield line
+
+
+def fit_vocabulary(paths):
+    """
+    One pass over the corpus: fits an ArrayTokenizer (same ids as the Keras
+    Tokenizer) and finds the longest prefix (longest sentence - 1), which
+    becomes max_seq_len.
+    """
+    splitter = ArrayTokenizer([])
+    longest = 0
+
+    def lines():
+        nonlocal longest
+        for line in iter_lines(paths):
+            longest = max(longest, len(splitter.split(line)))
+            yield line
+
+    tokenizer = ArrayTokenizer.fit(lines())
+    return tokenizer, max(longest - 1, 1)
+
+
+def build_dataset(paths, tokenizer, max_seq_len, batch_size=64, shuffle_buffer=10_000):
+    """(prefix, target) batches: prefix is (batch, max_seq_len) left-padded ids"""
+    table = tf.lookup.StaticHashTable(
+        tf.lookup.KeyValueTensorInitializer(
+            tf.constant(list(tokenizer.word_index.keys())),
+            tf.constant(list(tokenizer.word_index.values()), dtype=tf.int32)),
+        default_value=-1,
+    )
+    filters = f"[{re.escape(KERAS_FILTERS)}]"
+
+    def to_pairs(line):
+        cleaned = tf.strings.regex_replace(tf.strings.lower(line), filters, " ")
+        ids = table.lookup(tf.strings.split(cleaned))
+        ids = tf.boolean_mask(ids, ids >= 0)
+
+        # Frame k of [0]*max_seq_len + ids holds the max_seq_len tokens before ids[k]
+        padded = tf.concat([tf.zeros([max_seq_len], tf.int32), ids], axis=0)
+        prefixes = tf.signal.frame(padded, max_seq_len, frame_step=1)[1:tf.size(ids)]
+        return prefixes, ids[1:]
+
+    ds = tf.data.TextLineDataset(paths)
+    ds = ds.filter(lambda line: tf.strings.length(tf.strings.strip(line)) > 0)
+    ds = ds.map(to_pairs, num_parallel_calls=tf.data.AUTOTUNE).unbatch()
+    ds = ds.shuffle(shuffle_buffer)
+    return ds.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+
+def measure_throughput(dataset, max_batches=None):
+    """Iterates the dataset once and returns examples/sec"""
+    examples = 0
+    start = time.perf_counter()
+    for i, (_, targets) in enumerate(dataset):
+        examples += int(targets.shape[0])
+        if max_batches is not None and i + 1 >= max_batches:
+            break
+    elapsed = time.perf_counter() - start
+    return examples, examples / elapsed
+
+
+if __name__ == "__main__":
+
+    corpus_files = sys.argv[1:]
+    if not corpus_files:
+        sys.exit("usage: python data.py corpus.txt [more.txt ...]")
+
+    start = time.perf_counter()
+    corpus_tokenizer, seq_len = fit_vocabulary(corpus_files)
+    print(f"Vocabulary: {len(corpus_tokenizer.word_index)} words, max_seq_len={seq_len} "
+          f"(fitted in {time.perf_counter() - start:.2f}s)")
+
+    total, rate = measure_throughput(build_dataset(corpus_files, corpus_tokenizer, seq_len))
+    print(f"Streamed {total:,} examples → {rate:,.0f} examples/sec")
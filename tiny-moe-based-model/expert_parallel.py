@@ -0,0 +1,237 @@
+"""
+Expert-parallel inference for MoELayer / FusedMoELayer.
+
+The experts of one layer are sharded across a pool of worker processes.
+The parent process runs the gating network, routes every (example, expert)
+assignment to the worker owning that expert, and exchanges activations with
+the workers through shared-memory buffers. Only a tiny list of per-expert row
+counts travels through the pipe, never the activations themselves.
+
+Workers only import NumPy, so they start fast and do not duplicate TensorFlow.
+"""
+
+import argparse
+import os
+import time
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+# ==========================
+# Worker process
+# ==========================
+def _expert_worker(conn, in_name, out_name, max_rows, weights):
+    kernel_1, bias_1, kernel_2, bias_2 = weights
+    input_dim, output_dim = kernel_1.shape[1], kernel_2.shape[2]
+
+    shm_in = shared_memory.SharedMemory(name=in_name)
+    shm_out = shared_memory.SharedMemory(name=out_name)
+    in_buf = np.ndarray((max_rows, input_dim), dtype=np.float32, buffer=shm_in.buf)
+    out_buf = np.ndarray((max_rows, output_dim), dtype=np.float32, buffer=shm_out.buf)
+
+    try:
+        while True:
+            counts = conn.recv()  # rows per local expert, in shard order
+            if counts is None:
+                break
+            offset = 0
+            for local_id, count in enumerate(counts):
+                if count == 0:
+                    continue
+                rows = in_buf[offset:offset + count]
+                hidden = np.maximum(rows @ kernel_1[local_id] + bias_1[local_id], 0.0)
+                out_buf[offset:offset + count] = hidden @ kernel_2[local_id] + bias_2[local_id]
+                offset += count
+            conn.send(True)
+    finally:
+        del in_buf, out_buf
+        shm_in.close()
+        shm_out.close()
+
+
+def stacked_expert_weights(moe_layer):
+    """Returns (kernel_1, bias_1, kernel_2, bias_2) as stacked float32 NumPy arrays"""
+    from model import FusedMoELayer  # pylint: disable=import-outside-toplevel
+
+    fused = moe_layer if isinstance(moe_layer, FusedMoELayer) else FusedMoELayer.from_moe_layer(moe_layer)
+    return tuple(np.asarray(w, dtype=np.float32)
+                 for w in (fused.kernel_1, fused.bias_1, fused.kernel_2, fused.bias_2))
+
+
+# ==========================
+# Expert-parallel layer
+# ==========================
+class ExpertParallelMoE:
+    """
+    Runs a trained MoE layer with its experts sharded over `num_workers` processes.
+    Calling it on a (batch, input_dim) array returns the same (batch, output_dim)
+    result as the single-process layer. `max_batch_size` only sizes the shared
+    buffers; larger batches are exchanged in several round trips.
+    """
+
+    def __init__(self, moe_layer, num_workers, max_batch_size=4096):
+        self.layer = moe_layer
+        self.num_experts = moe_layer.num_experts
+        self.max_batch_size = max_batch_size
+
+        kernel_1, bias_1, kernel_2, bias_2 = stacked_expert_weights(moe_layer)
+        self.input_dim, self.output_dim = kernel_1.shape[1], kernel_2.shape[2]
+
+        # Contiguous expert shards, one per worker
+        self.shards = [s for s in np.array_split(np.arange(self.num_experts), num_workers) if len(s)]
+        self.owner = np.empty(self.num_experts, dtype=np.int64)
+        for worker_id, shard in enumerate(self.shards):
+            self.owner[shard] = worker_id
+
+        ctx = mp.get_context("spawn")
+        self.workers, self.conns, self.buffers = [], [], []
+        threads = os.environ.get("OMP_NUM_THREADS")
+        os.environ["OMP_NUM_THREADS"] = "1"  # one BLAS thread per worker; the pool is the parallelism
+        try:
+            for shard in self.shards:
+                # An example hits a shard at most once per expert it owns
+                max_rows = max_batch_size * min(len(shard), moe_layer.top_k or len(shard))
+                shm_in = shared_memory.SharedMemory(create=True, size=max_rows * self.input_dim * 4)
+                shm_out = shared_memory.SharedMemory(create=True, size=max_rows * self.output_dim * 4)
+                parent_conn, child_conn = ctx.Pipe()
+                weights = (kernel_1[shard], bias_1[shard], kernel_2[shard], bias_2[shard])
+                worker = ctx.Process(target=_expert_worker, daemon=True,
+                                     args=(child_conn, shm_in.name, shm_out.name, max_rows, weights))
+                worker.start()
+                self.workers.append(worker)
+                self.conns.append(parent_conn)
+                self.buffers.append((
+                    shm_in, shm_out,
+                    np.ndarray((max_rows, self.input_dim), dtype=np.float32, buffer=shm_in.buf),
+                    np.ndarray((max_rows, self.output_dim), dtype=np.float32, buffer=shm_out.buf),
+                ))
+        finally:
+            if threads is None:
+                os.environ.pop("OMP_NUM_THREADS")
+            else:
+                os.environ["OMP_NUM_THREADS"] = threads
+
+    def _route(self, x):
+        """Gating + top-k routing, reusing the layer's own inference rules (no capacity drop)"""
+        gate_values = self.layer.gating(x)
+        if self.layer.top_k is None:
+            batch_size = x.shape[0]
+            expert_ids = np.tile(np.arange(self.num_experts), batch_size)
+            rows = np.repeat(np.arange(batch_size), self.num_experts)
+            weights = np.asarray(gate_values).reshape(-1)
+            return expert_ids, weights, rows
+        expert_ids, weights, rows, _ = self.layer._route(gate_values)  # pylint: disable=protected-access
+        return np.asarray(expert_ids), np.asarray(weights), np.asarray(rows)
+
+    def __call__(self, x):
+        x = np.ascontiguousarray(x, dtype=np.float32)
+
+        # Route the whole batch at once; without capacity dropping each row routes independently
+        expert_ids, weights, rows = self._route(x)
+        order = np.argsort(expert_ids, kind="stable")
+        expert_ids, weights, rows = expert_ids[order], weights[order], rows[order]
+        owners = self.owner[expert_ids]
+
+        # Each shard's assignments, split into pieces that fit its shared buffer
+        pieces = []
+        for worker_id in range(len(self.shards)):
+            sel = np.flatnonzero(owners == worker_id)
+            max_rows = self.buffers[worker_id][2].shape[0]
+            pieces.append([sel[i:i + max_rows] for i in range(0, len(sel), max_rows)])
+
+        output = np.zeros((x.shape[0], self.output_dim), dtype=np.float32)
+        for round_id in range(max(len(p) for p in pieces)):
+            # Scatter: write each shard's rows into its shared input buffer
+            pending = []
+            for worker_id, shard in enumerate(self.shards):
+                if round_id >= len(pieces[worker_id]):
+                    continue
+                sel = pieces[worker_id][round_id]
+                np.take(x, rows[sel], axis=0, out=self.buffers[worker_id][2][:len(sel)])
+                counts = np.bincount(expert_ids[sel] - shard[0], minlength=len(shard))
+                self.conns[worker_id].send(counts.tolist())
+                pending.append((worker_id, sel))
+
+            # Gather: combine gate-weighted expert outputs back into batch order
+            for worker_id, sel in pending:
+                self.conns[worker_id].recv()
+                out_buf = self.buffers[worker_id][3]
+                np.add.at(output, rows[sel], weights[sel, None] * out_buf[:len(sel)])
+        return output
+
+    def close(self):
+        for conn in self.conns:
+            conn.send(None)
+        for worker in self.workers:
+            worker.join(timeout=5)
+        for shm_in, shm_out, in_buf, out_buf in self.buffers:
+            del in_buf, out_buf
+            shm_in.close()
+            shm_in.unlink()
+            shm_out.close()
+            shm_out.unlink()
+        self.buffers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ==========================
+# Scaling benchmark
+# ==========================
+def worker_counts(max_workers):
+    """1, 2, 4, ... up to max_workers, plus max_workers itself when it is not a power of two"""
+    return sorted({1 << i for i in range(max_workers.bit_length()) if 1 << i <= max_workers} | {max_workers})
+
+
+def benchmark(num_experts, input_dim, hidden_dim, output_dim, top_k, batch_size, counts, repeats):
+    import tensorflow as tf  # pylint: disable=import-outside-toplevel
+    from model import FusedMoELayer  # pylint: disable=import-outside-toplevel
+
+    layer = FusedMoELayer(num_experts, hidden_dim, output_dim, top_k=top_k)
+    x = np.random.rand(batch_size, input_dim).astype("float32")
+    reference = np.asarray(layer(x))
+
+    forward = tf.function(layer)
+    forward(x)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        forward(x)
+    single = (time.perf_counter() - start) / repeats
+    print(f"Experts={num_experts} top_k={top_k} batch={batch_size} hidden={hidden_dim}")
+    print(f"{'workers':>8} | {'ms/batch':>9} | {'examples/s':>11} | {'vs 1 proc':>9} | max abs diff")
+    print(f"{'single':>8} | {1000 * single:9.2f} | {batch_size / single:11,.0f} | {1.0:9.2f} | -")
+
+    for workers in counts:
+        with ExpertParallelMoE(layer, workers, max_batch_size=batch_size) as parallel:
+            diff = np.abs(parallel(x) - reference).max()
+            start = time.perf_counter()
+            for _ in range(repeats):
+                parallel(x)
+            elapsed = (time.perf_counter() - start) / repeats
+        print(f"{workers:>8} | {1000 * elapsed:9.2f} | {batch_size / elapsed:11,.0f} | "
+              f"{single / elapsed:9.2f} | {diff:.2e}")
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Expert-parallel MoE scaling benchmark")
+    parser.add_argument("--experts", type=int, default=32)
+    parser.add_argument("--input-dim", type=int, default=256)
+    parser.add_argument("--hidden-dim", type=int, default=1024)
+    parser.add_argument("--output-dim", type=int, default=256)
+    parser.add_argument("--top-k", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=2048)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count(),
+                        help="measure 1, 2, 4, ... workers up to this count (inclusive)")
+    parser.add_argument("--workers", type=int, nargs="+", help="explicit worker counts (overrides --max-workers)")
+    parser.add_argument("--repeats", type=int, default=10)
+    args = parser.parse_args()
+
+    benchmark(args.experts, args.input_dim, args.hidden_dim, args.output_dim,
+              args.top_k, args.batch_size, sorted(set(args.workers or worker_counts(args.max_workers))), args.repeats)
@@ -0,0 +1,91 @@
+"""
+TensorFlow-free NumPy runtime for the int8-quantized tiny MoE model.
+
+Weights are stored as per-channel symmetric int8 (`q * scale`) in one .npz
+file written by quantize.py. Matmuls run in float32 against the int8 kernels
+and the per-column scales are applied to the result, so the weights stay
+4x smaller in memory. Every call is batched: (batch, max_seq_len) ids in,
+(batch, vocab_size) probabilities out.
+"""
+
+import numpy as np
+from tiny_tokenizer import ArrayTokenizer
+
+
+def _int8_matmul(x, q, scale):
+    """x @ (q * scale) for a per-output-column int8 kernel q"""
+    return (x @ q.astype(np.float32)) * scale
+
+
+def _softmax(logits):
+    logits = logits - logits.max(axis=-1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+
+class Int8MoEModel:
+    def __init__(self, path="saved_model/tiny_moe_int8.npz"):
+        data = np.load(path)
+        self.weights = {name: data[name] for name in data.files}
+        self.vocabulary = [str(w) for w in self.weights.pop("vocabulary")]
+        self.tokenizer = ArrayTokenizer(self.vocabulary)
+        self.word_index = self.tokenizer.word_index
+        self.max_seq_len = int(self.weights.pop("max_seq_len"))
+        top_k = int(self.weights.pop("top_k"))
+        self.weights.pop("capacity_factor", None)  # training-only; older files still carry it
+        self.top_k = top_k or None            # 0 → dense routing
+        self.num_experts = self.weights["expert_bias_1"].shape[0]
+
+    def nbytes(self):
+        return sum(w.nbytes for w in self.weights.values())
+
+    # ==========================
+    # Tokenization
+    # ==========================
+    def encode(self, texts):
+        """Keras Tokenizer + pad_sequences(maxlen) equivalent"""
+        return self.tokenizer.encode_batch(texts, self.max_seq_len)
+
+    # ==========================
+    # Forward pass
+    # ==========================
+    def _route(self, gate_values):
+        """Same top-k rule as MoELayer._route at inference (no capacity drop)"""
+        batch_size = gate_values.shape[0]
+        top_indices = np.argsort(-gate_values, axis=-1, kind="stable")[:, :self.top_k]
+
+        expert_ids = top_indices.T.reshape(-1)  # choice-major
+        rows = np.tile(np.arange(batch_size), self.top_k)
+        weights = gate_values[rows, expert_ids]
+        return expert_ids, rows, weights
+
+    def _expert(self, e, x):
+        w = self.weights
+        hidden = np.maximum(_int8_matmul(x, w["expert_kernel_1"][e], w["expert_scale_1"][e])
+                            + w["expert_bias_1"][e], 0.0)
+        return _int8_matmul(hidden, w["expert_kernel_2"][e], w["expert_scale_2"][e]) + w["expert_bias_2"][e]
+
+    def forward(self, token_ids):
+        w = self.weights
+
+        # Embedding (per-row scales) + GlobalAveragePooling1D
+        embedded = w["embedding"][token_ids].astype(np.float32) * w["embedding_scale"][token_ids][..., None]
+        x = embedded.mean(axis=1)
+
+        gate_values = _softmax(_int8_matmul(x, w["gating_kernel"], w["gating_scale"]) + w["gating_bias"])
+
+        if self.top_k is None:
+            moe_out = sum(gate_values[:, e:e + 1] * self._expert(e, x) for e in range(self.num_experts))
+        else:
+            moe_out = np.zeros((x.shape[0], w["expert_bias_2"].shape[1]), dtype=np.float32)
+            expert_ids, rows, weights = self._route(gate_values)
+            for e in range(self.num_experts):
+                sel = expert_ids == e
+                if sel.any():
+                    np.add.at(moe_out, rows[sel], weights[sel, None] * self._expert(e, x[rows[sel]]))
+
+        return _softmax(_int8_matmul(moe_out, w["output_kernel"], w["output_scale"]) + w["output_bias"])
+
+    def predict_next(self, texts):
+        top_ids = self.forward(self.encode(texts)).argmax(axis=-1)
+        return [self.vocabulary[i] or "<UNK>" for i in top_ids]
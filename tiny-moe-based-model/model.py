@@ -1,8 +1,8 @@
 import numpy as np
-import pickle
 import tensorflow as tf
 from keras import layers, Model, Input, Sequential, saving
-from tensorflow.keras.preprocessing.text import Tokenizer
+from keras.models import clone_model
+from tiny_tokenizer import ArrayTokenizer
 from keras.utils import pad_sequences
 
 # ==========================
@@ -12,6 +12,10 @@ vocab_size = 1000      # Example vocab
 embed_dim = 32
 num_experts = 4
 hidden_dim = 64
+top_k = 2              # None → dense routing through every expert
+capacity_factor = 1.25 # None → unlimited expert capacity (training only)
+aux_loss_weight = 0.01 # 0.0 → no load-balancing loss
+epochs = 100
 
 # ==========================
 # Gating Network
@@ -40,13 +44,20 @@ class GatingNetwork(layers.Layer):
 # ==========================
 @saving.register_keras_serializable()
 class MoELayer(layers.Layer):
-    def __init__(self, num_experts, hidden_dim, output_dim, **kwargs):
+    def __init__(self, num_experts, hidden_dim, output_dim, top_k=None,
+                 capacity_factor=None, aux_loss_weight=0.0, **kwargs):
         super().__init__(**kwargs)
+        if top_k is not None and not 1 <= top_k <= num_experts:
+            raise ValueError(f"top_k must be in [1, {num_experts}], got {top_k}")
         self.num_experts = num_experts
         self.hidden_dim = hidden_dim
         self.output_dim = output_dim
+        self.top_k = top_k                      # None → dense routing
+        self.capacity_factor = capacity_factor  # None → unlimited capacity; applied in training only
+        self.aux_loss_weight = aux_loss_weight
         self.gating = GatingNetwork(num_experts)
         self.experts = []  # Will be created in build()
+        self.telemetry = None  # Opt-in RoutingTelemetry, see telemetry.py
 
     def build(self, input_shape):
         self.experts = []
@@ -66,9 +77,95 @@ class MoELayer(layers.Layer):
         """
         expert_outputs = [expert(x) for expert in self.experts]
         return tf.stack(expert_outputs, axis=1)
+
+    def _run_expert(self, index, x):
+        """Runs a single expert on x. Output shape: (rows, output_dim)"""
+        return self.experts[index](x)
     
-    def call(self, x):
+    def _expert_capacity(self, batch_size):
+        """
+        Max number of examples a single expert accepts per batch.
+        Output: scalar int32 tensor
+        """
+        tokens_per_expert = tf.cast(batch_size * self.top_k, tf.float32) / self.num_experts
+        return tf.cast(tf.math.ceil(self.capacity_factor * tokens_per_expert), tf.int32)
+
+    def _route(self, gate_values, training=False):
+        """
+        Picks the top_k experts for every example. In training, assignments past
+        an expert's capacity are dropped; at inference nothing is dropped, so an
+        example's output does not depend on the rest of its batch.
+        Returns one entry per kept (example, expert) assignment:
+          expert_ids, weights (gate value), rows (example index) and
+          position (slot of the assignment inside its expert's queue).
+        """
+        batch_size = tf.shape(gate_values)[0]
+        top_values, top_indices = tf.math.top_k(gate_values, k=self.top_k)  # (batch, top_k)
+
+        # Flatten choice-major: every example's 1st choice is queued before any 2nd choice
+        expert_ids = tf.reshape(tf.transpose(top_indices), [-1])  # (top_k * batch,)
+        weights = tf.reshape(tf.transpose(top_values), [-1])
+        rows = tf.tile(tf.range(batch_size), [self.top_k])
+
+        one_hot = tf.one_hot(expert_ids, self.num_experts, dtype=tf.int32)
+        position = tf.reduce_sum(tf.cumsum(one_hot, axis=0) * one_hot, axis=-1) - 1
+
+        if training and self.capacity_factor is not None:
+            keep = position < self._expert_capacity(batch_size)
+            expert_ids = tf.boolean_mask(expert_ids, keep)
+            weights = tf.boolean_mask(weights, keep)
+            rows = tf.boolean_mask(rows, keep)
+            position = tf.boolean_mask(position, keep)
+
+        if self.telemetry is not None:
+            self.telemetry.record_routing(expert_ids, batch_size * self.top_k)
+
+        return expert_ids, weights, rows, position
+
+    def _compute_sparse_outputs(self, x, gate_values, training=False):
+        """
+        Dispatches every example only to its top_k experts and combines the
+        gate-weighted expert outputs back into batch order.
+        In training, assignments past an expert's capacity overflow and are
+        dropped, so they contribute nothing to that example's output.
+        Output shape: (batch, output_dim)
+        """
+        batch_size = tf.shape(x)[0]
+        expert_ids, weights, rows, _ = self._route(gate_values, training)
+
+        expert_rows = tf.dynamic_partition(rows, expert_ids, self.num_experts)
+        expert_weights = tf.dynamic_partition(weights, expert_ids, self.num_experts)
+
+        output = tf.zeros(tf.stack([batch_size, self.output_dim]), dtype=x.dtype)
+        for expert, idx, w in zip(self.experts, expert_rows, expert_weights):
+            expert_out = expert(tf.gather(x, idx))  # (tokens_for_expert, output_dim)
+            output = tf.tensor_scatter_nd_add(output, tf.expand_dims(idx, -1),
+                                              tf.expand_dims(w, -1) * expert_out)
+        return output
+
+    def _load_balancing_loss(self, gate_values):
+        """
+        Switch-Transformer style auxiliary loss: num_experts * sum(f_e * P_e),
+        where f_e is the share of examples whose top-1 expert is e and P_e is
+        the mean gate probability of e. Equals 1.0 under perfect balance.
+        """
+        top1 = tf.one_hot(tf.argmax(gate_values, axis=-1), self.num_experts, dtype=gate_values.dtype)
+        fraction_routed = tf.reduce_mean(top1, axis=0)
+        mean_gate = tf.reduce_mean(gate_values, axis=0)
+        return self.num_experts * tf.reduce_sum(fraction_routed * mean_gate)
+
+    def call(self, x, training=None):
         gate_values = self.gating(x)  # (batch, num_experts)
+
+        if self.telemetry is not None:
+            self.telemetry.record_gates(gate_values, dense=self.top_k is None)
+
+        if self.aux_loss_weight:
+            self.add_loss(self.aux_loss_weight * self._load_balancing_loss(gate_values))
+
+        if self.top_k is not None:
+            return self._compute_sparse_outputs(x, gate_values, training)  # (batch, output_dim)
+
         expert_outputs = self._compute_expert_outputs(x)  # (batch, num_experts, output_dim)
         gate_values = tf.expand_dims(gate_values, axis=-1)  # (batch, num_experts, 1)
         return tf.reduce_sum(gate_values * expert_outputs, axis=1)  # (batch, output_dim)
@@ -79,6 +176,9 @@ class MoELayer(layers.Layer):
             "num_experts": self.num_experts,
             "hidden_dim": self.hidden_dim,
             "output_dim": self.output_dim,
+            "top_k": self.top_k,
+            "capacity_factor": self.capacity_factor,
+            "aux_loss_weight": self.aux_loss_weight,
         })
         return config
 
@@ -87,50 +187,170 @@ class MoELayer(layers.Layer):
         return cls(**config)
 
 
+# ==========================
+# Fused Mixture of Experts Layer
+# ==========================
+@saving.register_keras_serializable()
+class FusedMoELayer(MoELayer):
+    """
+    Same maths as MoELayer, but all expert weights live in stacked tensors:
+      kernel_1: (num_experts, input_dim, hidden_dim)
+      kernel_2: (num_experts, hidden_dim, output_dim)
+    so every expert runs in one batched einsum instead of one Sequential per expert.
+    """
+
+    def build(self, input_shape):
+        input_dim = input_shape[-1]
+        self.kernel_1 = self.add_weight(name="expert_kernel_1",
+                                        shape=(self.num_experts, input_dim, self.hidden_dim),
+                                        initializer="glorot_uniform")
+        self.bias_1 = self.add_weight(name="expert_bias_1",
+                                      shape=(self.num_experts, self.hidden_dim),
+                                      initializer="zeros")
+        self.kernel_2 = self.add_weight(name="expert_kernel_2",
+                                        shape=(self.num_experts, self.hidden_dim, self.output_dim),
+                                        initializer="glorot_uniform")
+        self.bias_2 = self.add_weight(name="expert_bias_2",
+                                      shape=(self.num_experts, self.output_dim),
+                                      initializer="zeros")
+        layers.Layer.build(self, input_shape)
+
+    def _compute_expert_outputs(self, x):
+        """
+        Runs every example through every expert in two einsums.
+        Output shape: (batch, num_experts, output_dim)
+        """
+        hidden = tf.nn.relu(tf.einsum("bi,eih->beh", x, self.kernel_1) + self.bias_1)
+        return tf.einsum("beh,eho->beo", hidden, self.kernel_2) + self.bias_2
+
+    def _run_expert(self, index, x):
+        """Runs a single expert on x using its slice of the stacked kernels"""
+        hidden = tf.nn.relu(tf.matmul(x, self.kernel_1[index]) + self.bias_1[index])
+        return tf.matmul(hidden, self.kernel_2[index]) + self.bias_2[index]
+
+    def _compute_sparse_outputs(self, x, gate_values, training=False):
+        """
+        Scatters the routed examples into a (num_experts, capacity, input_dim)
+        buffer, runs all experts with one batched matmul and gathers back.
+        Output shape: (batch, output_dim)
+        """
+        batch_size = tf.shape(x)[0]
+        expert_ids, weights, rows, position = self._route(gate_values, training)
+
+        capacity = tf.maximum(tf.reduce_max(position) + 1, 0)
+        slots = tf.stack([expert_ids, position], axis=-1)
+        buffer = tf.scatter_nd(slots, tf.gather(x, rows),
+                               tf.stack([self.num_experts, capacity, tf.shape(x)[-1]]))
+
+        hidden = tf.nn.relu(tf.einsum("eci,eih->ech", buffer, self.kernel_1)
+                            + tf.expand_dims(self.bias_1, 1))
+        expert_out = tf.einsum("ech,eho->eco", hidden, self.kernel_2) + tf.expand_dims(self.bias_2, 1)
+
+        combined = tf.expand_dims(weights, -1) * tf.gather_nd(expert_out, slots)
+        return tf.math.unsorted_segment_sum(combined, rows, batch_size)
+
+    @classmethod
+    def from_moe_layer(cls, moe_layer):
+        """Builds a FusedMoELayer holding the same weights as a trained MoELayer."""
+        fused = cls.from_config(moe_layer.get_config())
+        input_dim = moe_layer.experts[0].layers[0].kernel.shape[0]
+        fused(np.zeros((1, input_dim), dtype="float32"))  # builds gating + stacked kernels
+        fused.gating.set_weights(moe_layer.gating.get_weights())
+
+        first = [expert.layers[0].get_weights() for expert in moe_layer.experts]
+        second = [expert.layers[1].get_weights() for expert in moe_layer.experts]
+        fused.kernel_1.assign(np.stack([k for k, _ in first]))
+        fused.bias_1.assign(np.stack([b for _, b in first]))
+        fused.kernel_2.assign(np.stack([k for k, _ in second]))
+        fused.bias_2.assign(np.stack([b for _, b in second]))
+        return fused
+
+
+def convert_to_fused(model):
+    """
+    Returns a copy of `model` where every MoELayer is replaced by an
+    equivalent FusedMoELayer. All other layers keep their weights.
+    """
+    converted = {}
+
+    def clone_layer(layer):
+        if type(layer) is MoELayer:
+            converted[layer.name] = FusedMoELayer.from_moe_layer(layer)
+            return converted[layer.name]
+        return layer.__class__.from_config(layer.get_config())
+
+    fused_model = clone_model(model, clone_function=clone_layer)
+    for old_layer, new_layer in zip(model.layers, fused_model.layers):
+        if old_layer.name not in converted:
+            new_layer.set_weights(old_layer.get_weights())
+    return fused_model
+
 if __name__ == "__main__":
+    import sys
+    from data import build_dataset, fit_vocabulary
+    from telemetry import RoutingTelemetryCallback
 
-    # ==========================
-    # Step 1: Tokenize the corpus
-    # ==========================
-    corpus = [
-        "hello world how are you",
-        "how are you doing today",
-        "hello world again",
-        "fine thank you"
-    ]
+    # `python model.py corpus.txt ...` streams the corpus through data.py;
+    # without arguments the tiny in-memory corpus below is used.
+    # `--telemetry` records MoE routing telemetry every epoch.
+    use_telemetry = "--telemetry" in sys.argv[1:]
+    corpus_files = [arg for arg in sys.argv[1:] if arg != "--telemetry"]
 
-    tokenizer = Tokenizer()
-    tokenizer.fit_on_texts(corpus)
-    word_index = tokenizer.word_index
-    index_word = {v: k for k, v in word_index.items()}
-    vocab_size = len(word_index) + 1  # +1 for padding
+    if corpus_files:
+        # ==========================
+        # Step 1+2: Stream the corpus
+        # ==========================
+        tokenizer, max_seq_len = fit_vocabulary(corpus_files)
+        index_word = tokenizer.index_word
+        vocab_size = len(tokenizer)  # includes padding id 0
+        print(f"Vocabulary: {vocab_size - 1} words, max_seq_len={max_seq_len}")
 
-    print("Vocabulary:", word_index)
+        train_data = build_dataset(corpus_files, tokenizer, max_seq_len)
+        X = next(iter(train_data))[0]  # sample batch for telemetry profiling
 
-    # ==========================
-    # Step 2: Generate input-output pairs
-    # ==========================
-    input_sequences = []
-    target_tokens = []
-
-    for line in corpus:
-        tokens = tokenizer.texts_to_sequences([line])[0]  # e.g., [1, 2, 3, 4]
-        for i in range(1, len(tokens)):
-            input_seq = tokens[:i]
-            target = tokens[i]
-            input_sequences.append(input_seq)
-            target_tokens.append(target)
-
-    # Pad sequences to the same length
-    max_seq_len = max(len(seq) for seq in input_sequences)
-    X = pad_sequences(input_sequences, maxlen=max_seq_len)
-    y = np.array(target_tokens)
-
-    print("\nSample input-output:")
-    for i in range(len(X)):
-        input_words = [index_word.get(id, '') for id in X[i]]
-        print(f"Input: {input_words} → Target: {index_word[y[i]]}")
-        
+    else:
+        # ==========================
+        # Step 1: Tokenize the corpus
+        # ==========================
+        corpus = [
+            "hello world how are you",
+            "how are you doing today",
+            "hello world again",
+            "fine thank you"
+        ]
+
+        tokenizer = ArrayTokenizer.fit(corpus)  # same ids as the Keras Tokenizer
+        word_index = tokenizer.word_index
+        index_word = tokenizer.index_word
+        vocab_size = len(tokenizer)  # includes padding id 0
+
+        print("Vocabulary:", word_index)
+
+        # ==========================
+        # Step 2: Generate input-output pairs
+        # ==========================
+        input_sequences = []
+        target_tokens = []
+
+        for line in corpus:
+            tokens = tokenizer.texts_to_sequences([line])[0]  # e.g., [1, 2, 3, 4]
+            for i in range(1, len(tokens)):
+                input_seq = tokens[:i]
+                target = tokens[i]
+                input_sequences.append(input_seq)
+                target_tokens.append(target)
+
+        # Pad sequences to the same length
+        max_seq_len = max(len(seq) for seq in input_sequences)
+        X = pad_sequences(input_sequences, maxlen=max_seq_len)
+        y = np.array(target_tokens)
+
+        print("\nSample input-output:")
+        for i in range(len(X)):
+            input_words = [index_word.get(id, '') for id in X[i]]
+            print(f"Input: {input_words} → Target: {index_word[y[i]]}")
+
+        train_data = None
 
     # ==========================
     # Step 3: Build MoE Language Model
@@ -138,7 +358,8 @@ if __name__ == "__main__":
     inputs = Input(shape=(max_seq_len,))
     x = layers.Embedding(input_dim=vocab_size, output_dim=embed_dim)(inputs)
     x = layers.GlobalAveragePooling1D()(x)  # Reduce sequence dimension
-    x = MoELayer(num_experts=num_experts, hidden_dim=hidden_dim, output_dim=embed_dim)(x)
+    x = FusedMoELayer(num_experts=num_experts, hidden_dim=hidden_dim, output_dim=embed_dim,
+                      top_k=top_k, capacity_factor=capacity_factor, aux_loss_weight=aux_loss_weight)(x)
     outputs = layers.Dense(vocab_size, activation="softmax")(x)
 
     model = Model(inputs=inputs, outputs=outputs)
@@ -148,7 +369,14 @@ if __name__ == "__main__":
     # ==========================
     # Step 3: Training
     # ==========================    
-    model.fit(X, y, epochs=100, batch_size=8) 
+    routing_telemetry = RoutingTelemetryCallback(sample_inputs=X, verbose=0) if use_telemetry else None
+    train_callbacks = [routing_telemetry] if routing_telemetry else []
+    if train_data is not None:
+        model.fit(train_data, epochs=epochs, callbacks=train_callbacks)
+    else:
+        model.fit(X, y, epochs=epochs, batch_size=8, callbacks=train_callbacks)
+    if routing_telemetry:
+        print("\nRouting telemetry (last epoch):", routing_telemetry.history[-1])
 
     # ==========================
     # Step 4: Save to .keras format
@@ -161,6 +389,5 @@ if __name__ == "__main__":
     # Save model as keras format
     model.save("saved_model/tiny_moe_model.keras")
 
-    # Save the tokenizer
-    with open("saved_model/tokenizer.pkl", "wb") as f:
-        pickle.dump(tokenizer, f)
\ No newline at end of file
+    # Save the tokenizer (array format, memory-mapped by serve.load_artifacts)
+    tokenizer.save("saved_model/tokenizer")
\ No newline at end of file
@@ -0,0 +1,128 @@
+"""
+Per-channel int8 weight quantization for the tiny MoE model.
+
+    python quantize.py   # saved_model/tiny_moe_model.keras → saved_model/tiny_moe_int8.npz
+                         # then checks accuracy parity, latency and memory against Keras
+
+Quantized: Embedding (one scale per token row), gating Dense, both expert
+Dense stacks and the output Dense (one scale per output column, per expert).
+GlobalAveragePooling1D has no weights; the runtime averages the dequantized
+embeddings. Biases stay float32.
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+INT8_PATH = "saved_model/tiny_moe_int8.npz"
+
+
+def quantize_per_channel(weights, axis):
+    """Symmetric int8: returns (q, scale) with weights ≈ q * scale, reducing over `axis`"""
+    scale = np.abs(weights).max(axis=axis) / 127.0
+    scale = np.where(scale == 0, 1.0, scale).astype(np.float32)
+    q = np.clip(np.round(weights / np.expand_dims(scale, axis)), -127, 127).astype(np.int8)
+    return q, scale
+
+
+def quantize(model, index_word, max_seq_len, path=INT8_PATH):
+    from keras import layers  # pylint: disable=import-outside-toplevel
+    from expert_parallel import stacked_expert_weights  # pylint: disable=import-outside-toplevel
+
+    embedding = next(l for l in model.layers if isinstance(l, layers.Embedding))
+    moe = next(l for l in model.layers if hasattr(l, "telemetry"))
+    output = model.layers[-1]
+
+    kernel_1, bias_1, kernel_2, bias_2 = stacked_expert_weights(moe)
+    gating_kernel, gating_bias = moe.gating.dense.get_weights()
+    output_kernel, output_bias = output.get_weights()
+
+    arrays = {}
+    arrays["embedding"], arrays["embedding_scale"] = quantize_per_channel(embedding.get_weights()[0], axis=-1)
+    arrays["gating_kernel"], arrays["gating_scale"] = quantize_per_channel(gating_kernel, axis=-2)
+    arrays["expert_kernel_1"], arrays["expert_scale_1"] = quantize_per_channel(kernel_1, axis=-2)
+    arrays["expert_kernel_2"], arrays["expert_scale_2"] = quantize_per_channel(kernel_2, axis=-2)
+    arrays["output_kernel"], arrays["output_scale"] = quantize_per_channel(output_kernel, axis=-2)
+    arrays.update(gating_bias=gating_bias, expert_bias_1=bias_1, expert_bias_2=bias_2, output_bias=output_bias)
+
+    vocabulary = [""] + [index_word[i] for i in range(1, len(index_word) + 1)]
+    np.savez(path, vocabulary=np.array(vocabulary), max_seq_len=max_seq_len,
+             top_k=moe.top_k or 0, **arrays)
+    return path
+
+
+# ==========================
+# Parity, latency and memory checks
+# ==========================
+def time_call(fn, x, repeats=50):
+    fn(x)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn(x)
+    return 1000.0 * (time.perf_counter() - start) / repeats
+
+
+# VmHWM (peak RSS) is read from /proc because ru_maxrss survives fork+exec from this process
+PEAK_RSS = "print(next(l.split()[1] for l in open('/proc/self/status') if l.startswith('VmHWM')))"
+
+KERAS_RSS = """
+import serve
+model, serve.tokenizer, serve.max_seq_len, serve.index_word = serve.load_artifacts()
+serve.predict_next(model, "hello world")
+""" + PEAK_RSS
+
+INT8_RSS = """
+from int8_runtime import Int8MoEModel
+Int8MoEModel().predict_next(["hello world"])
+""" + PEAK_RSS
+
+
+def peak_rss_mb(code):
+    env = dict(os.environ, TF_CPP_MIN_LOG_LEVEL="3")
+    result = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    return int(result.stdout.split()[-1]) / 1024.0
+
+
+def compare(model, runtime, num_samples=256):
+    import tensorflow as tf  # pylint: disable=import-outside-toplevel
+
+    vocab_size = len(runtime.vocabulary)
+    samples = np.random.randint(0, vocab_size, size=(num_samples, runtime.max_seq_len)).astype("int32")
+
+    keras_probs = model(samples, training=False).numpy()
+    int8_probs = runtime.forward(samples)
+    agreement = (keras_probs.argmax(-1) == int8_probs.argmax(-1)).mean()
+    print(f"Accuracy parity ({num_samples} inputs, one batch):")
+    print(f"  top-1 agreement with Keras: {100 * agreement:.2f}%")
+    print(f"  max abs prob difference:    {np.abs(keras_probs - int8_probs).max():.2e}")
+
+    forward = tf.function(lambda x: model(x, training=False),
+                          input_signature=[tf.TensorSpec((None, runtime.max_seq_len), tf.int32)])
+    print("\nLatency per call (ms):")
+    print(f"  {'batch':>5} | {'model.predict':>13} | {'tf.function':>11} | {'int8 numpy':>10}")
+    for batch in (1, 256):
+        x = samples[:batch]
+        predict_ms = time_call(lambda b: model.predict(b, verbose=0), x, repeats=10)
+        print(f"  {batch:>5} | {predict_ms:13.3f} | {time_call(forward, x):11.3f} | "
+              f"{time_call(runtime.forward, x):10.3f}")
+
+    float_bytes = sum(w.nbytes for w in model.get_weights())
+    print("\nMemory:")
+    print(f"  weights: float32 {float_bytes / 1024:.1f} KiB → int8 {runtime.nbytes() / 1024:.1f} KiB")
+    print(f"  peak process RSS: Keras {peak_rss_mb(KERAS_RSS):.0f} MiB → "
+          f"int8 numpy {peak_rss_mb(INT8_RSS):.0f} MiB")
+
+
+if __name__ == "__main__":
+
+    from serve import load_artifacts
+    from int8_runtime import Int8MoEModel
+
+    print("============ Quantizing the model ===========")
+    keras_model, _, seq_len, words = load_artifacts()
+    print(f"Saved int8 model to {quantize(keras_model, words, seq_len)}\n")
+
+    compare(keras_model, Int8MoEModel(INT8_PATH))
@@ -1,48 +1,67 @@
+import json
+import os
 import pickle
+import sys
 import numpy as np
-from tensorflow.keras.utils import pad_sequences
 from keras.models import load_model
-from model import MoELayer, GatingNetwork
+from tiny_inference import CompiledPredictor
+from tiny_tokenizer import ArrayTokenizer
+from model import MoELayer, GatingNetwork, FusedMoELayer
+from telemetry import enable_telemetry, telemetry_snapshot
 
 def predict_next(model,text):
-    seq = tokenizer.texts_to_sequences([text])[0]
-    padded = pad_sequences([seq], maxlen=max_seq_len)
-    preds = model.predict(padded, verbose=0)[0]
+    predictor = CompiledPredictor.for_model(model)  # traced once, reused every call
+    tokenizer.encode_batch([text], max_seq_len, out=predictor.inputs)
+    preds = predictor()[0]
     top_idx = np.argmax(preds)
     return index_word.get(top_idx, "<UNK>")
 
 
-if __name__ == "__main__":
-
-    print("============ Evaluating the model ===========")
+def load_artifacts(model_dir="saved_model"):
+    """Loads the trained model, tokenizer and max sequence length from `model_dir`"""
 
     # =============================
     # Step 1: Load Tokenizer
     # =============================
-    with open("saved_model/tokenizer.pkl", "rb") as f:
-        tokenizer = pickle.load(f)
+    # saved_model/tokenizer/ is memory-mapped; older artifacts only have the pickled Keras Tokenizer
+    if os.path.exists(f"{model_dir}/tokenizer/config.json"):
+        tokenizer = ArrayTokenizer.load(f"{model_dir}/tokenizer")
+    else:
+        with open(f"{model_dir}/tokenizer.pkl", "rb") as f:
+            tokenizer = ArrayTokenizer.from_keras(pickle.load(f))
 
-    word_index = tokenizer.word_index
-    index_word = {v: k for k, v in word_index.items()}
-    vocab_size = len(word_index) + 1
+    index_word = tokenizer.index_word
 
     # =============================
     # Step 2: Load Max Seq length
     # =============================
-    max_seq_len = 0
-    with open("saved_model/max_seq_len.txt", "r") as f:
-        max_seq_len = int(f.read()) # Must match training value!    
+    with open(f"{model_dir}/max_seq_len.txt", "r") as f:
+        max_seq_len = int(f.read()) # Must match training value!
 
     # ==========================
     # Step 3: Load model from file
     # ==========================
-    loaded_model = load_model("saved_model/tiny_moe_model.keras", custom_objects={
+    model = load_model(f"{model_dir}/tiny_moe_model.keras", custom_objects={
     "MoELayer": MoELayer,
+    "FusedMoELayer": FusedMoELayer,
     "GatingNetwork": GatingNetwork
     })
+    return model, tokenizer, max_seq_len, index_word
+
+
+if __name__ == "__main__":
+
+    print("============ Evaluating the model ===========")
+
+    loaded_model, tokenizer, max_seq_len, index_word = load_artifacts()
     
     print("Model loaded successfully")
 
+    # Optional: `python serve.py telemetry.json` dumps MoE routing telemetry
+    telemetry_path = sys.argv[1] if len(sys.argv) > 1 else None
+    if telemetry_path:
+        enable_telemetry(loaded_model, tokenizer.encode_batch(["hello world", "how are", "thank"], max_seq_len))
+
     # ==========================
     # Step 4: Verify prediction
     # ==========================
@@ -55,4 +74,9 @@ if __name__ == "__main__":
 
     for phrase in test_phrases:
         next_word = predict_next(loaded_model,phrase)
-        print(f"Input: '{phrase}' → Next word: '{next_word}'")
\ No newline at end of file
+        print(f"Input: '{phrase}' → Next word: '{next_word}'")
+
+    if telemetry_path:
+        with open(telemetry_path, "w") as f:
+            json.dump(telemetry_snapshot(loaded_model), f, indent=2)
+        print(f"\nRouting telemetry written to {telemetry_path}")
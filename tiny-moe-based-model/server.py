@@ -0,0 +1,243 @@
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import tensorflow as tf
+from serve import load_artifacts
+from telemetry import enable_telemetry, profile_expert_latency, telemetry_snapshot
+
+WARMUP_PHRASES = ["hello world", "how are", "thank", "fine thank", "how are you doing"]
+
+
+# ==========================
+# Micro-batching engine
+# ==========================
+class MicroBatcher:
+    """
+    Collects concurrent next-word requests into one batch.
+    A batch is flushed when it reaches `max_batch_size` or when the oldest
+    request has waited `max_wait_ms`, whichever comes first.
+    """
+
+    def __init__(self, model, tokenizer, max_seq_len, index_word,
+                 max_batch_size=256, max_wait_ms=2.0):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.max_seq_len = max_seq_len
+        self.index_word = index_word
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.queue = asyncio.Queue()
+        # One worker thread: batch N+1 is gathered while batch N runs
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+        # Compiled forward pass with a fixed signature → traced once, no predict() overhead.
+        # training=False disables capacity dropping, so batching never changes a result.
+        self.forward = tf.function(
+            lambda x: tf.argmax(model(x, training=False), axis=-1, output_type=tf.int32),
+            input_signature=[tf.TensorSpec((None, max_seq_len), tf.int32)],
+        )
+
+        self.last_batch = None  # latest padded batch, re-profiled for /metrics when telemetry is on
+        self.requests_served = 0
+        self.batches_served = 0
+        self.max_queue_depth = 0
+        self.forward_seconds = 0.0
+        self.batch_sizes = Counter()
+
+    async def predict(self, text):
+        """Queues one phrase and waits for its predicted next word"""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((text, future))
+        self.max_queue_depth = max(self.max_queue_depth, self.queue.qsize())
+        return await future
+
+    async def _next_batch(self):
+        batch = [await self.queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    def _run_batch(self, texts):
+        padded = self.tokenizer.encode_batch(texts, self.max_seq_len)
+        self.last_batch = padded
+        start = time.perf_counter()
+        top_ids = self.forward(padded).numpy()
+        self.forward_seconds += time.perf_counter() - start
+        return [self.index_word.get(int(i), "<UNK>") for i in top_ids]
+
+    async def run(self):
+        """Background loop: gather → pad → one forward pass → fan results out"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            texts = [text for text, _ in batch]
+            try:
+                words = await loop.run_in_executor(self.executor, self._run_batch, texts)
+            except Exception as exc:  # pylint: disable=broad-except
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+
+            for (_, future), word in zip(batch, words):
+                if not future.done():
+                    future.set_result(word)
+
+            self.requests_served += len(batch)
+            self.batches_served += 1
+            self.batch_sizes[1 << (len(batch) - 1).bit_length()] += 1  # power-of-two buckets
+
+    def profile_experts(self):
+        """Per-expert latency on the latest served batch (runs on the batch worker thread)"""
+        if self.last_batch is not None and telemetry_snapshot(self.model):
+            profile_expert_latency(self.model, self.last_batch, repeats=3)
+
+    def metrics(self):
+        """Snapshot of queue depth, batch-size statistics and MoE routing telemetry"""
+        batches = max(self.batches_served, 1)
+        return {
+            "routing": telemetry_snapshot(self.model),
+            "queue_depth": self.queue.qsize(),
+            "max_queue_depth": self.max_queue_depth,
+            "requests_served": self.requests_served,
+            "batches_served": self.batches_served,
+            "avg_batch_size": self.requests_served / batches,
+            "avg_forward_ms": 1000.0 * self.forward_seconds / batches,
+            "batch_size_histogram": {f"<={size}": count for size, count in sorted(self.batch_sizes.items())},
+        }
+
+
+# ==========================
+# Minimal asyncio HTTP front-end
+# ==========================
+async def handle_request(batcher, method, path, body):
+    if method == "GET" and path == "/metrics":
+        # Queued behind the running batch, so the timings do not overlap with serving
+        await asyncio.get_running_loop().run_in_executor(batcher.executor, batcher.profile_experts)
+        return "200 OK", batcher.metrics()
+
+    if method == "POST" and path == "/predict":
+        try:
+            payload = json.loads(body or b"{}")
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return "400 Bad Request", {"error": "body must be JSON"}
+        if not isinstance(payload, dict):
+            return "400 Bad Request", {"error": "body must be a JSON object"}
+        # Validate before queueing: one bad text would fail every request in its batch
+        if "texts" in payload:
+            texts = payload["texts"]
+            if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+                return "400 Bad Request", {"error": "'texts' must be a list of strings"}
+            words = await asyncio.gather(*(batcher.predict(t) for t in payload["texts"]))
+            return "200 OK", {"next_words": list(words)}
+        if "text" in payload:
+            if not isinstance(payload["text"], str):
+                return "400 Bad Request", {"error": "'text' must be a string"}
+            return "200 OK", {"next_word": await batcher.predict(payload["text"])}
+        return "400 Bad Request", {"error": "expected 'text' or 'texts'"}
+
+    return "404 Not Found", {"error": f"no route for {method} {path}"}
+
+
+async def handle_connection(batcher, reader, writer):
+    """Serves keep-alive HTTP/1.1 requests on one connection"""
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            method, path, _ = request_line.decode().split(" ", 2)
+
+            headers = {}
+            while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                key, value = line.decode().split(":", 1)
+                headers[key.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+            try:
+                status, payload = await handle_request(batcher, method, path, body)
+            except Exception as exc:  # pylint: disable=broad-except
+                status, payload = "500 Internal Server Error", {"error": f"{type(exc).__name__}: {exc}"}
+            data = json.dumps(payload).encode()
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(data)}\r\n\r\n".encode() + data
+            )
+            await writer.drain()
+            if headers.get("connection", "").lower() == "close":
+                break
+    except (asyncio.IncompleteReadError, ConnectionResetError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+# ==========================
+# In-process throughput check
+# ==========================
+async def benchmark(batcher, num_requests, concurrency):
+    phrases = WARMUP_PHRASES
+    pending = iter(range(num_requests))
+
+    async def client():
+        for i in pending:
+            await batcher.predict(phrases[i % len(phrases)])
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    print(f"{num_requests} predictions in {elapsed:.2f}s → {num_requests / elapsed:,.0f} predictions/sec")
+    await asyncio.get_running_loop().run_in_executor(batcher.executor, batcher.profile_experts)
+    print(json.dumps(batcher.metrics(), indent=2))
+
+
+async def main(args):
+    model, tokenizer, max_seq_len, index_word = load_artifacts(args.model_dir)
+    if args.telemetry:
+        # Expert latency starts from the warm-up phrases and follows live traffic under /metrics
+        enable_telemetry(model, tokenizer.encode_batch(WARMUP_PHRASES, max_seq_len))
+    batcher = MicroBatcher(model, tokenizer, max_seq_len, index_word,
+                           max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms)
+    batcher_task = asyncio.create_task(batcher.run())
+
+    # Warm up so the tf.function trace is not billed to the first request
+    batcher.forward(np.zeros((1, max_seq_len), dtype="int32"))
+
+    if args.benchmark:
+        await benchmark(batcher, args.benchmark, args.concurrency)
+        batcher_task.cancel()
+        return
+
+    server = await asyncio.start_server(
+        lambda r, w: handle_connection(batcher, r, w), args.host, args.port)
+    print(f"Serving on http://{args.host}:{args.port} (POST /predict, GET /metrics)")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Micro-batching server for the tiny MoE model")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--model-dir", default="saved_model")
+    parser.add_argument("--max-batch-size", type=int, default=256)
+    parser.add_argument("--max-wait-ms", type=float, default=2.0)
+    parser.add_argument("--benchmark", type=int, default=0,
+                        help="run N in-process predictions and exit instead of serving")
+    parser.add_argument("--concurrency", type=int, default=512)
+    parser.add_argument("--telemetry", action="store_true",
+                        help="record MoE routing telemetry and report it under /metrics")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,177 @@
+"""
+Opt-in routing telemetry for MoELayer / FusedMoELayer.
+
+When enabled, each MoE layer accumulates (inside the compiled graph):
+  - per-expert token counts (assignments actually processed by each expert)
+  - assignments dropped because an expert was over capacity (training only)
+  - mean gate entropy (low → gating is confident / collapsing)
+  - per-expert top-1 share (one expert near 1.0 → routing has collapsed)
+Per-expert forward latency is measured separately by `profile_expert_latency`:
+at every epoch end in training, and on the warm-up / latest served batch when
+serving (`enable_telemetry(model, sample_inputs)`).
+
+When disabled, `layer.telemetry` is None and the layer adds no ops at all.
+"""
+
+import time
+
+import numpy as np
+import tensorflow as tf
+from keras import Model, callbacks
+
+
+# ==========================
+# Per-layer counters
+# ==========================
+class RoutingTelemetry:
+    """Graph-safe routing counters for one MoE layer"""
+
+    def __init__(self, num_experts):
+        self.num_experts = num_experts
+        self.token_counts = tf.Variable(tf.zeros([num_experts], tf.int64), trainable=False)
+        self.top1_counts = tf.Variable(tf.zeros([num_experts], tf.int64), trainable=False)
+        self.dropped = tf.Variable(0, dtype=tf.int64, trainable=False)
+        self.examples = tf.Variable(0, dtype=tf.int64, trainable=False)
+        self.entropy_sum = tf.Variable(0.0, dtype=tf.float64, trainable=False)
+        self.expert_latency_ms = [None] * num_experts
+
+    def record_gates(self, gate_values, dense=False):
+        batch_size = tf.cast(tf.shape(gate_values)[0], tf.int64)
+        gates = tf.cast(gate_values, tf.float32)
+        entropy = -tf.reduce_sum(gates * tf.math.log(gates + 1e-9), axis=-1)
+        top1 = tf.argmax(gates, axis=-1, output_type=tf.int32)
+
+        self.examples.assign_add(batch_size)
+        self.entropy_sum.assign_add(tf.cast(tf.reduce_sum(entropy), tf.float64))
+        self.top1_counts.assign_add(tf.math.bincount(top1, minlength=self.num_experts,
+                                                     maxlength=self.num_experts, dtype=tf.int64))
+        if dense:  # every expert processes every example
+            self.token_counts.assign_add(tf.fill([self.num_experts], batch_size))
+
+    def record_routing(self, expert_ids, num_assignments):
+        kept = tf.math.bincount(tf.cast(expert_ids, tf.int32), minlength=self.num_experts,
+                                maxlength=self.num_experts, dtype=tf.int64)
+        self.token_counts.assign_add(kept)
+        self.dropped.assign_add(tf.cast(num_assignments, tf.int64) - tf.reduce_sum(kept))
+
+    def reset(self):
+        for variable in (self.token_counts, self.top1_counts):
+            variable.assign(tf.zeros_like(variable))
+        for variable in (self.dropped, self.examples, self.entropy_sum):
+            variable.assign(tf.zeros_like(variable))
+
+    def snapshot(self):
+        """Plain-Python view of the counters, safe to json.dumps"""
+        examples = int(self.examples.numpy())
+        top1 = self.top1_counts.numpy()
+        top1_share = top1 / max(examples, 1)
+        return {
+            "examples": examples,
+            "expert_token_counts": self.token_counts.numpy().tolist(),
+            "dropped_assignments": int(self.dropped.numpy()),
+            "mean_gate_entropy": float(self.entropy_sum.numpy()) / max(examples, 1),
+            "max_gate_entropy": float(np.log(self.num_experts)),
+            "top1_share": top1_share.tolist(),
+            "max_top1_share": float(top1_share.max()),
+            "expert_latency_ms": list(self.expert_latency_ms),
+        }
+
+
+# ==========================
+# Model-level helpers
+# ==========================
+def moe_layers(model):
+    """All MoE layers (MoELayer / FusedMoELayer) inside `model`, including nested models"""
+    return [layer for layer in model._flatten_layers() if hasattr(layer, "telemetry")]  # pylint: disable=protected-access
+
+
+def enable_telemetry(model, sample_inputs=None):
+    """Attaches fresh counters to every MoE layer of `model`.
+    Call before the model's forward pass is traced (fit/predict/tf.function).
+    With `sample_inputs`, per-expert latency is profiled on them right away."""
+    layers = moe_layers(model)
+    for layer in layers:
+        if layer.telemetry is None:
+            layer.telemetry = RoutingTelemetry(layer.num_experts)
+    if sample_inputs is not None:
+        profile_expert_latency(model, sample_inputs)
+    return layers
+
+
+def disable_telemetry(model):
+    for layer in moe_layers(model):
+        layer.telemetry = None
+
+
+def telemetry_snapshot(model):
+    """{layer name: snapshot} for every instrumented MoE layer"""
+    return {layer.name: layer.telemetry.snapshot()
+            for layer in moe_layers(model) if layer.telemetry is not None}
+
+
+def profile_expert_latency(model, sample_inputs, repeats=10):
+    """
+    Times every expert of every instrumented MoE layer on the rows the
+    gating network would send it for `sample_inputs` (eagerly, outside fit).
+    """
+    for layer in moe_layers(model):
+        if layer.telemetry is None:
+            continue
+        features = Model(model.inputs, layer.input)([sample_inputs])
+        gate_values = layer.gating(features)
+        if layer.top_k is None:
+            routed = [features] * layer.num_experts
+        else:
+            top_indices = tf.math.top_k(gate_values, k=layer.top_k).indices
+            routed = [tf.boolean_mask(features, tf.reduce_any(tf.equal(top_indices, e), axis=-1))
+                      for e in range(layer.num_experts)]
+
+        for e, rows in enumerate(routed):
+            if rows.shape[0] == 0:
+                layer.telemetry.expert_latency_ms[e] = 0.0
+                continue
+            layer._run_expert(e, rows)  # pylint: disable=protected-access
+            start = time.perf_counter()
+            for _ in range(repeats):
+                layer._run_expert(e, rows)  # pylint: disable=protected-access
+            layer.telemetry.expert_latency_ms[e] = 1000.0 * (time.perf_counter() - start) / repeats
+
+
+# ==========================
+# Keras callback
+# ==========================
+class RoutingTelemetryCallback(callbacks.Callback):
+    """
+    Records routing telemetry per epoch during training.
+    Snapshots are kept in `self.history` and the headline numbers are added
+    to the epoch logs (e.g. `moe_layer/max_top1_share`).
+    """
+
+    def __init__(self, sample_inputs=None, verbose=1):
+        super().__init__()
+        self.sample_inputs = sample_inputs
+        self.verbose = verbose
+        self.history = []
+
+    def on_train_begin(self, logs=None):
+        enable_telemetry(self.model)
+
+    def on_epoch_begin(self, epoch, logs=None):
+        for layer in moe_layers(self.model):
+            layer.telemetry.reset()
+
+    def on_epoch_end(self, epoch, logs=None):
+        if self.sample_inputs is not None:
+            profile_expert_latency(self.model, self.sample_inputs)
+        snapshot = telemetry_snapshot(self.model)
+        self.history.append(snapshot)
+
+        for name, stats in snapshot.items():
+            if logs is not None:
+                logs[f"{name}/max_top1_share"] = stats["max_top1_share"]
+                logs[f"{name}/mean_gate_entropy"] = stats["mean_gate_entropy"]
+            if self.verbose:
+                print(f"\n[{name}] tokens/expert={stats['expert_token_counts']} "
+                      f"dropped={stats['dropped_assignments']} "
+                      f"entropy={stats['mean_gate_entropy']:.3f}/{stats['max_gate_entropy']:.3f} "
+                      f"max_top1_share={stats['max_top1_share']:.2f}")
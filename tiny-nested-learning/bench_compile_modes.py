@@ -0,0 +1,98 @@
+"""
+Training throughput and peak memory of every compile mode, for both models.
+
+Modes are combinations of the builder options `jit_compile`,
+`steps_per_execution` and `mixed_precision` (mixed_bfloat16). Each
+(model, mode) pair is measured in a fresh subprocess, so its peak RSS
+(VmHWM) is not inflated by earlier runs.
+
+    python bench_compile_modes.py
+    python bench_compile_modes.py --models transformer hope --rows 8192 --epochs 3
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+MODES = {
+    "default": {},
+    "jit": {"jit_compile": True},
+    "spe16": {"steps_per_execution": 16},
+    "jit+spe16": {"jit_compile": True, "steps_per_execution": 16},
+    "bf16": {"mixed_precision": True},
+    "bf16+jit+spe16": {"mixed_precision": True, "jit_compile": True, "steps_per_execution": 16},
+}
+
+MODELS = ("transformer", "hope", "hope_vectorized", "hope_scan")
+
+
+def peak_rss_mb():
+    with open("/proc/self/status", encoding="utf-8") as f:
+        return int(next(l.split()[1] for l in f if l.startswith("VmHWM"))) / 1024.0
+
+
+def measure(model_name, mode, rows, epochs, batch_size, vocab_size=64, seq_len=12):
+    """Runs in the child process: sequences/sec over `epochs` timed epochs after one warm-up epoch"""
+    import numpy as np  # pylint: disable=import-outside-toplevel
+    from models import build_tiny_hope, build_tiny_transformer  # pylint: disable=import-outside-toplevel
+
+    options = MODES[mode]
+    if model_name == "transformer":
+        model = build_tiny_transformer(vocab_size, seq_len, **options)
+    else:
+        model = build_tiny_hope(vocab_size, seq_len, vectorized=model_name == "hope_vectorized",
+                                parallel_scan=model_name == "hope_scan", **options)
+
+    x = np.random.randint(0, vocab_size, size=(rows, seq_len)).astype("int32")
+    y = np.random.randint(0, vocab_size, size=(rows, seq_len)).astype("int32")
+
+    model.fit(x, y, epochs=1, batch_size=batch_size, verbose=0)  # trace / compile
+    start = time.perf_counter()
+    model.fit(x, y, epochs=epochs, batch_size=batch_size, verbose=0)
+    elapsed = time.perf_counter() - start
+    return {"seq_per_sec": rows * epochs / elapsed, "peak_rss_mb": peak_rss_mb()}
+
+
+def run_child(model_name, mode, args):
+    env = dict(os.environ, TF_CPP_MIN_LOG_LEVEL="3")
+    cmd = [sys.executable, __file__, "--child", model_name, mode, "--rows", str(args.rows),
+           "--epochs", str(args.epochs), "--batch-size", str(args.batch_size)]
+    result = subprocess.run(cmd, env=env, capture_output=True, text=True, check=False)
+    if result.returncode != 0:
+        return {"error": result.stderr.strip().splitlines()[-1] if result.stderr else "failed"}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", nargs="+", default=list(MODELS), choices=MODELS)
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+    parser.add_argument("--rows", type=int, default=4096)
+    parser.add_argument("--epochs", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--child", nargs=2, metavar=("MODEL", "MODE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(*args.child, args.rows, args.epochs, args.batch_size)))
+        return
+
+    print(f"{'model':<16} | {'mode':<15} | {'seq/sec':>9} | {'vs default':>10} | {'peak RSS':>9}")
+    print("-" * 72)
+    for model_name in args.models:
+        baseline = None
+        for mode in args.modes:
+            result = run_child(model_name, mode, args)
+            if "error" in result:
+                print(f"{model_name:<16} | {mode:<15} | failed: {result['error']}")
+                continue
+            baseline = baseline or result["seq_per_sec"]
+            print(f"{model_name:<16} | {mode:<15} | {result['seq_per_sec']:9,.0f} | "
+                  f"{result['seq_per_sec'] / baseline:9.2f}x | {result['peak_rss_mb']:6.0f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Per-task checkpoints for `continual_train`, written in the background.
+
+After every task the trainer copies the model weights and optimizer slots
+(Adam m/v + iteration count) into host memory and hands them to a writer
+thread, so training continues while the files are written. Each checkpoint
+is a delta against the previous one: a variable that did not change is
+skipped, and when only some rows changed (e.g. embeddings of words the task
+never uses) just those rows are stored. Every `full_every` tasks a full
+snapshot bounds how many deltas a restore has to replay.
+
+    checkpoint_dir/
+      manifest.json       completed tasks, retention history, checkpoint chain
+      task_0000.npz       full snapshot
+      task_0001.npz       delta
+      ...
+
+The manifest is replaced atomically after its checkpoint file is on disk,
+so a crash never leaves a manifest that points at a half-written file.
+"""
+
+import concurrent.futures
+import json
+import os
+from typing import Dict, List
+
+import numpy as np
+
+MANIFEST = "manifest.json"
+
+
+def tracked_variables(model):
+    """Model weights + optimizer variables, building the optimizer slots first"""
+    # `optimizer.variables` is never empty (the iteration counter exists from
+    # __init__), so build unconditionally; it is a no-op once the slots exist.
+    optimizer = model.optimizer
+    optimizer.build(model.trainable_variables)
+    return list(model.weights) + list(optimizer.variables)
+
+
+def changed_rows(new, old):
+    """Rows of `new` that differ from `old` (row = first axis), or None for 'store it all'"""
+    if old is None or new.ndim == 0 or new.shape != old.shape:
+        return None
+    diff = (new != old).reshape(len(new), -1).any(axis=1)
+    return np.flatnonzero(diff)
+
+
+class TaskCheckpointer:
+    """Incremental, asynchronous checkpoints of one model, one per completed task"""
+
+    def __init__(self, directory: str, model, full_every: int = 10):
+        self.directory = directory
+        self.variables = tracked_variables(model)
+        self.full_every = full_every
+        os.makedirs(directory, exist_ok=True)
+
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self._pending = None
+        self._last_saved = None      # host copy of the last snapshot (for deltas)
+        self._manifest = self._read_manifest()
+
+    # ------------------------------------------------------------------
+    # Manifest
+    # ------------------------------------------------------------------
+    def _read_manifest(self):
+        path = os.path.join(self.directory, MANIFEST)
+        if not os.path.exists(path):
+            return {"completed": [], "history": {}, "chain": []}
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_manifest(self, manifest):
+        path = os.path.join(self.directory, MANIFEST)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(path + ".tmp", path)
+
+    @property
+    def completed_tasks(self) -> List[str]:
+        return list(self._manifest["completed"])
+
+    @property
+    def history(self) -> Dict[str, Dict[str, float]]:
+        return dict(self._manifest["history"])
+
+    # ------------------------------------------------------------------
+    # Save
+    # ------------------------------------------------------------------
+    def save(self, task_name: str, history: Dict[str, Dict[str, float]]):
+        """Snapshots the variables now and writes the checkpoint on the writer thread"""
+        self.wait()  # keep checkpoints ordered; the previous one is normally done long ago
+        values = [v.numpy() for v in self.variables]
+
+        manifest = {
+            "completed": self._manifest["completed"] + [task_name],
+            "history": {k: dict(v) for k, v in history.items()},
+            "chain": list(self._manifest["chain"]),
+        }
+        index = len(manifest["completed"]) - 1
+        full = self._last_saved is None or index % self.full_every == 0
+        previous = self._last_saved
+        self._last_saved = values
+        self._manifest = manifest
+
+        self._pending = self._executor.submit(self._write, index, values, None if full else previous, manifest)
+
+    def _write(self, index, values, previous, manifest):
+        arrays = {}
+        for i, value in enumerate(values):
+            rows = changed_rows(value, previous[i]) if previous is not None else None
+            if rows is None or len(rows) == len(value):
+                arrays[f"full_{i}"] = value
+            elif len(rows):
+                arrays[f"rows_{i}"] = rows
+                arrays[f"values_{i}"] = value[rows]
+            # else: unchanged since the previous checkpoint → nothing to store
+
+        filename = f"task_{index:04d}.npz"
+        path = os.path.join(self.directory, filename)
+        np.savez(path + ".tmp.npz", **arrays)
+        os.replace(path + ".tmp.npz", path)
+
+        stored_bytes = sum(a.nbytes for a in arrays.values())
+        if previous is None:
+            manifest["chain"] = []  # a full snapshot starts a new chain
+        manifest["chain"].append({"file": filename, "full": previous is None, "bytes": stored_bytes})
+        self._write_manifest(manifest)
+
+    def wait(self):
+        """Blocks until the last checkpoint is on disk (re-raises write errors)"""
+        if self._pending is not None:
+            self._pending.result()
+            self._pending = None
+
+    def close(self):
+        self.wait()
+        self._executor.shutdown()
+
+    # ------------------------------------------------------------------
+    # Restore
+    # ------------------------------------------------------------------
+    def restore(self) -> bool:
+        """Loads the latest checkpoint into the model and optimizer; False if there is none"""
+        chain = self._manifest["chain"]
+        if not chain:
+            return False
+
+        values = [None] * len(self.variables)
+        for entry in chain:
+            with np.load(os.path.join(self.directory, entry["file"])) as data:
+                for i in range(len(values)):
+                    if f"full_{i}" in data:
+                        values[i] = data[f"full_{i}"]
+                    elif f"rows_{i}" in data:
+                        values[i] = values[i].copy()
+                        values[i][data[f"rows_{i}"]] = data[f"values_{i}"]
+
+        for variable, value in zip(self.variables, values):
+            variable.assign(value)
+        self._last_saved = values
+        return True
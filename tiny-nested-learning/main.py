@@ -1,9 +1,13 @@
+import argparse
 import dataclasses
+import os
+import time
 from typing import Dict, List, Tuple
 
 import numpy as np
 import tensorflow as tf
 
+from checkpointing import TaskCheckpointer
 from models import build_tiny_hope, build_tiny_transformer
 
 # ==========================================================
@@ -43,50 +47,104 @@ TEXT_CURRICULUM = {
 
 @dataclasses.dataclass
 class TaskData:
+    """
+    One task: each unique sentence is stored once as (inputs, targets);
+    `as_dataset` yields every row `repeats` times per epoch.
+    """
     name: str
     inputs: np.ndarray
     targets: np.ndarray
+    repeats: int = 1
+
+    @property
+    def size(self) -> int:
+        return len(self.inputs) * self.repeats
 
 
 # ==========================================================
 # Vocabulary + token utilities
 # ==========================================================
 
-def build_vocab(curriculum: Dict[str, List[str]]) -> Dict[str, int]:
-    vocab = {"<pad>": 0, "<eos>": 1}
-    for sentences in curriculum.values():
-        for sentence in sentences:
-            for word in sentence.split():
-                if word not in vocab:
-                    vocab[word] = len(vocab)
-    return vocab
-
-
-def sentence_to_arrays(sentence: str, vocab: Dict[str, int], seq_len: int):
-    tokens = sentence.split() + ["<eos>"]
-    tokens = tokens[:seq_len]
-    tokens += ["<pad>"] * (seq_len - len(tokens))
+def split_words(sentences: List[str]):
+    """All words of all sentences as one array, plus the word count of each sentence"""
+    words = " ".join(sentences).split()
+    lengths = np.fromiter(map(len, map(str.split, sentences)), dtype=np.int64, count=len(sentences))
+    return np.array(words), lengths
 
-    target_tokens = tokens[1:] + ["<pad>"]
 
-    inputs = np.array([vocab[t] for t in tokens], dtype="int32")
-    targets = np.array([vocab[t] for t in target_tokens], dtype="int32")
-    return inputs, targets
+def build_vocab(curriculum: Dict[str, List[str]]) -> Dict[str, int]:
+    words, _ = split_words([s for sentences in curriculum.values() for s in sentences])
+    unique, first_seen = np.unique(words, return_index=True)
+    ordered = unique[np.argsort(first_seen)]  # ids in order of first appearance
+    return {"<pad>": 0, "<eos>": 1, **{str(w): i + 2 for i, w in enumerate(ordered)}}
 
 
-def make_text_task(name, sentences, vocab, seq_len, repeats_per_sentence=32):
-    inputs, targets = [], []
+def sentence_to_arrays(sentence: str, vocab: Dict[str, int], seq_len: int):
+    inputs, targets = encode_sentences([sentence], vocab, seq_len)
+    return inputs[0], targets[0]
+
+
+def encode_sentences(sentences: List[str], vocab: Dict[str, int], seq_len: int):
+    """
+    Vectorized sentence_to_arrays for a whole list: each row is the words
+    + <eos>, cut to seq_len and right-padded; targets are inputs shifted by one.
+    """
+    words, lengths = split_words(sentences)
+
+    # Word → id through a sorted key array instead of one dict lookup per word
+    keys = np.array(list(vocab))
+    values = np.fromiter(vocab.values(), dtype=np.int32, count=len(vocab))
+    order = np.argsort(keys)
+    sorted_keys = keys[order]
+    pos = np.minimum(np.searchsorted(sorted_keys, words), len(sorted_keys) - 1)
+    missing = sorted_keys[pos] != words
+    if missing.any():
+        raise KeyError(f"words not in vocab: {sorted(set(np.asarray(words)[missing].tolist()))}")
+    ids = values[order][pos] if len(words) else np.zeros(0, np.int32)
+
+    # Scatter every word into (row, column); one extra column makes the shifted targets end in <pad>
+    tokens = np.full((len(sentences), seq_len + 1), vocab["<pad>"], dtype=np.int32)
+    rows = np.repeat(np.arange(len(sentences)), lengths)
+    cols = np.arange(len(words)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    keep = cols < seq_len
+    tokens[rows[keep], cols[keep]] = ids[keep]
+
+    has_eos = lengths < seq_len
+    tokens[np.flatnonzero(has_eos), lengths[has_eos]] = vocab["<eos>"]
+    return tokens[:, :seq_len], tokens[:, 1:]
+
+
+def make_text_task(name, sentences, vocab, seq_len, repeats_per_sentence=32, max_listed=10):
     print(f"{C.BLUE}📄 Building dataset for {name}...{C.RESET}")
-
-    for sentence in sentences:
+    for sentence in sentences[:max_listed]:
         print(f"   • {C.CYAN}{sentence}{C.RESET}")
-        x, y = sentence_to_arrays(sentence, vocab, seq_len)
-        for _ in range(repeats_per_sentence):
-            inputs.append(x)
-            targets.append(y)
-
-    print(f"   {C.GREEN}✓ Completed dataset for {name} (size={len(inputs)}){C.RESET}")
-    return TaskData(name=name, inputs=np.stack(inputs), targets=np.stack(targets))
+    if len(sentences) > max_listed:
+        print(f"   • {C.CYAN}... and {len(sentences) - max_listed} more{C.RESET}")
+
+    inputs, targets = encode_sentences(sentences, vocab, seq_len)
+    task = TaskData(name=name, inputs=inputs, targets=targets, repeats=repeats_per_sentence)
+
+    print(f"   {C.GREEN}✓ Completed dataset for {name} (size={task.size}){C.RESET}")
+    return task
+
+
+def load_curriculum(paths: List[str]) -> Dict[str, List[str]]:
+    """
+    One task per text file (task name = file name without extension), one
+    sentence per line. Files are streamed line by line and only unique
+    sentences are kept, so memory grows with unique sentences, not file size.
+    """
+    curriculum = {}
+    for path in paths:
+        name = os.path.splitext(os.path.basename(path))[0]
+        unique = {}
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                sentence = " ".join(line.lower().split())
+                if sentence:
+                    unique.setdefault(sentence, None)
+        curriculum[name] = list(unique)
+    return curriculum
 
 
 def create_curriculum(curriculum):
@@ -108,22 +166,89 @@ def create_curriculum(curriculum):
 
 
 def as_dataset(task: TaskData, batch_size: int):
-    ds = tf.data.Dataset.from_tensor_slices((task.inputs, task.targets))
-    ds = ds.shuffle(buffer_size=len(task.inputs), reshuffle_each_iteration=True)
-    return ds.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+    """
+    Shuffles row indices (each unique row `repeats` times) instead of copies of
+    the rows, then gathers every batch from the single stored copy.
+    """
+    inputs, targets = tf.constant(task.inputs), tf.constant(task.targets)
+    num_rows = len(task.inputs)
+
+    ds = tf.data.Dataset.range(task.size)
+    ds = ds.shuffle(buffer_size=task.size, reshuffle_each_iteration=True)
+    ds = ds.batch(batch_size).map(lambda idx: (tf.gather(inputs, idx % num_rows), tf.gather(targets, idx % num_rows)))
+    return ds.prefetch(tf.data.AUTOTUNE)
+
+
+# ==========================================================
+# Retention evaluation
+# ==========================================================
+
+class RetentionEvaluator:
+    """
+    Per-task token accuracy for every task in one compiled pass.
+
+    All tasks are concatenated once into a cached dataset whose rows carry
+    their task id. `evaluate` runs the whole dataset through one tf.function
+    and adds up correct predictions per task with segment sums, instead of
+    one `model.evaluate` call per task. Matches Keras' "accuracy" metric.
+    """
+
+    def __init__(self, tasks: List[TaskData], batch_size: int):
+        self.task_names = [task.name for task in tasks]
+        inputs = np.concatenate([task.inputs for task in tasks])
+        targets = np.concatenate([task.targets for task in tasks])
+        task_ids = np.concatenate([np.full(len(task.inputs), i, dtype="int32") for i, task in enumerate(tasks)])
+
+        # Tokens per task (every position counts, as in model.evaluate)
+        self.token_counts = np.bincount(task_ids, minlength=len(tasks)) * targets.shape[1]
+        self.dataset = tf.data.Dataset.from_tensor_slices((inputs, targets, task_ids)).batch(batch_size).cache()
+        self._eval_fns = {}
+
+    def _correct_per_task(self, model):
+        num_tasks = len(self.task_names)
+
+        def accumulate(correct, batch):
+            inputs, targets, task_ids = batch
+            predictions = tf.argmax(model(inputs, training=False), axis=-1, output_type=tf.int32)
+            hits = tf.reduce_sum(tf.cast(predictions == targets, tf.float32), axis=-1)
+            return correct + tf.math.unsorted_segment_sum(hits, task_ids, num_tasks)
+
+        return self.dataset.reduce(tf.zeros([num_tasks]), accumulate)
+
+    def evaluate(self, model) -> Dict[str, float]:
+        if model not in self._eval_fns:
+            self._eval_fns[model] = tf.function(lambda: self._correct_per_task(model))
+        accuracy = self._eval_fns[model]().numpy() / self.token_counts
+        return {name: float(acc) for name, acc in zip(self.task_names, accuracy)}
 
 
 # ==========================================================
 # Continual learning core
 # ==========================================================
 
-def continual_train(model, tasks, *, epochs, batch_size):
+def continual_train(model, tasks, *, epochs, batch_size, checkpoint_dir=None):
+    """
+    Trains on each task in order and evaluates every task after each one.
+
+    With `checkpoint_dir`, weights, optimizer slots and history are checkpointed
+    after every task (in the background, as deltas), and a rerun with the same
+    directory resumes after the last completed task.
+    """
     history = {}
+    evaluator = RetentionEvaluator(tasks, batch_size=batch_size)
+    checkpointer = TaskCheckpointer(checkpoint_dir, model) if checkpoint_dir else None
 
     print(f"\n{C.BOLD}{C.BLUE}==================== TRAINING {model.name.upper()} ===================={C.RESET}")
     print(f"{C.CYAN}Epochs per task: {epochs}, Batch size: {batch_size}{C.RESET}")
 
+    if checkpointer and checkpointer.restore():
+        history = checkpointer.history
+        print(f"{C.YELLOW}↻ Resumed from {checkpoint_dir} after {checkpointer.completed_tasks[-1]}{C.RESET}")
+
     for task in tasks:
+        if task.name in history:
+            continue
+
         print(f"\n{C.BOLD}{C.BLUE}📘 Training {model.name}{C.RESET}")
         print(f"{C.CYAN}→ Starting {task.name}{C.RESET}")
 
@@ -132,13 +257,12 @@ def continual_train(model, tasks, *, epochs, batch_size):
         print(f"{C.GREEN}✓ Finished {task.name}{C.RESET}")
         print(f"{C.YELLOW}Evaluating retention after {task.name}...{C.RESET}")
 
-        checkpoint_metrics = {}
-        for eval_task in tasks:
-            ds = tf.data.Dataset.from_tensor_slices((eval_task.inputs, eval_task.targets)).batch(batch_size)
-            loss, acc = model.evaluate(ds, verbose=0)
-            checkpoint_metrics[eval_task.name] = float(acc)
+        history[task.name] = evaluator.evaluate(model)
+        if checkpointer:
+            checkpointer.save(task.name, history)
 
-        history[task.name] = checkpoint_metrics
+    if checkpointer:
+        checkpointer.close()
 
     print(f"{C.GREEN}✓ Completed all tasks for {model.name}\n{C.RESET}")
     return history
@@ -204,17 +328,29 @@ def summarize(hist_a, hist_b):
 
 
 
+# ==========================================================
+# Wall-clock comparison
+# ==========================================================
+
+def print_timings(timings: Dict[str, float]):
+    print(f"\n{C.BOLD}{C.BLUE}==================== WALL-CLOCK TRAINING TIME ===================={C.RESET}")
+    for name, seconds in timings.items():
+        print(f"{C.BOLD}{name:<15}{C.RESET}| {seconds:8.2f}s")
+    print(C.BLUE + "=" * 75 + C.RESET)
+
+
 # ==========================================================
 # Entrypoint
 # ==========================================================
 
-def main():
+def main(parallel_scan: bool = False, curriculum_files: List[str] | None = None, checkpoint_dir: str | None = None):
     print(f"{C.BOLD}{C.HEADER}\n🚀 Starting Tiny Nested Learning Experiment...\n{C.RESET}")
 
     np.random.seed(7)
     tf.random.set_seed(7)
 
-    tasks, vocab, seq_len = create_curriculum(TEXT_CURRICULUM)
+    curriculum = load_curriculum(curriculum_files) if curriculum_files else TEXT_CURRICULUM
+    tasks, vocab, seq_len = create_curriculum(curriculum)
     vocab_size = len(vocab)
 
     print(f"{C.BLUE}Building Models...{C.RESET}")
@@ -223,11 +359,34 @@ def main():
     print(f"{C.GREEN}✓ Models Ready\n{C.RESET}")
 
     print(f"{C.BLUE}Beginning Training...\n{C.RESET}")
-    transformer_history = continual_train(transformer, tasks, epochs=5, batch_size=64)
-    hope_history = continual_train(hope, tasks, epochs=3, batch_size=64)
+    timings = {}
+
+    def model_checkpoints(model):
+        return os.path.join(checkpoint_dir, model.name) if checkpoint_dir else None
+
+    start = time.perf_counter()
+    transformer_history = continual_train(transformer, tasks, epochs=5, batch_size=64,
+                                          checkpoint_dir=model_checkpoints(transformer))
+    timings["Transformer"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    hope_history = continual_train(hope, tasks, epochs=3, batch_size=64,
+                                   checkpoint_dir=model_checkpoints(hope))
+    timings["HOPE"] = time.perf_counter() - start
+
+    if parallel_scan:
+        # Linearized HOPE trained with a parallel scan instead of step-by-step RNN
+        hope_scan = build_tiny_hope(vocab_size, seq_len, parallel_scan=True)
+        start = time.perf_counter()
+        hope_scan_history = continual_train(hope_scan, tasks, epochs=3, batch_size=64,
+                                            checkpoint_dir=model_checkpoints(hope_scan))
+        timings["HOPE (scan)"] = time.perf_counter() - start
 
     print_history("Transformer", transformer_history)
     print_history("HOPE", hope_history)
+    if parallel_scan:
+        print_history("HOPE (scan)", hope_scan_history)
+    print_timings(timings)
 
     summarize(transformer_history, hope_history)
 
@@ -235,4 +394,12 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Tiny nested learning experiment")
+    parser.add_argument("--parallel-scan", action="store_true",
+                        help="also train the linearized parallel-scan HOPE and compare it")
+    parser.add_argument("--curriculum", nargs="+", metavar="FILE",
+                        help="text files, one task per file and one sentence per line (default: built-in stories)")
+    parser.add_argument("--checkpoint-dir",
+                        help="checkpoint after every task and resume from here on rerun")
+    args = parser.parse_args()
+    main(parallel_scan=args.parallel_scan, curriculum_files=args.curriculum, checkpoint_dir=args.checkpoint_dir)
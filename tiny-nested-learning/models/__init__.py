@@ -1,7 +1,9 @@
 """Expose tiny model builders for easy imports."""
 
 from .transformer import build_tiny_transformer
-from .hope import HopeCell, build_tiny_hope
+from .hope import HopeCell, ParallelHopeLayer, VectorizedHopeCell, build_tiny_hope
+from .streaming import HopeSession, HopeStreamer
 
-__all__ = ["build_tiny_transformer", "HopeCell", "build_tiny_hope"]
+__all__ = ["build_tiny_transformer", "HopeCell", "VectorizedHopeCell", "ParallelHopeLayer", "build_tiny_hope",
+           "HopeSession", "HopeStreamer"]
 
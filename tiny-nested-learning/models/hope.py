@@ -17,11 +17,18 @@ This implementation is tuned to demonstrate *better retention* than a Transforme
 from typing import List
 import tensorflow as tf
 
+from .precision import dtype_policy
+
 
 # =======================================================================
 # HOPE CELL (Continuum Memory System)
 # =======================================================================
 
+def slowest_memory(update_rates: List[float]) -> int:
+    """Index of the memory with the lowest base rate (the protected slow memory)"""
+    return min(range(len(update_rates)), key=lambda i: update_rates[i])
+
+
 class HopeCell(tf.keras.layers.AbstractRNNCell):
     """
     RNN cell that maintains multiple memories (fast, medium, slow)
@@ -31,12 +38,16 @@ class HopeCell(tf.keras.layers.AbstractRNNCell):
       - Base update rates (fast/medium/slow)
       - Rate adapter network with CLAMPING to avoid overwriting slow memory
       - Strong retention behavior for continual learning demos
+
+    The protected slow memory defaults to the one with the lowest base rate
+    (index 2 for [0.6, 0.3, 0.02]).
     """
 
-    def __init__(self, units: int, update_rates: List[float], **kwargs):
+    def __init__(self, units: int, update_rates: List[float], protected_index: int | None = None, **kwargs):
         super().__init__(**kwargs)
         self.units = units
         self.update_rates = update_rates  # e.g., [0.6, 0.3, 0.02]
+        self.protected_index = slowest_memory(update_rates) if protected_index is None else protected_index
 
         # Controller creates a proposal vector for all memories
         self.controller = tf.keras.layers.Dense(units, activation="tanh")
@@ -79,7 +90,7 @@ class HopeCell(tf.keras.layers.AbstractRNNCell):
             # -------------------------------------------
             # SLOW MEMORY PROTECTED: NO ACCIDENTAL SPEED-UP
             # -------------------------------------------
-            if idx == 2:  # slow memory index
+            if idx == self.protected_index:  # slow memory index
                 dynamic_rate = base_rate  # fixed slow update rate (e.g., 0.02)
 
             else:
@@ -102,6 +113,153 @@ class HopeCell(tf.keras.layers.AbstractRNNCell):
         return output, new_states
 
 
+def clamped_dynamic_rates(base_rates, protected, rate_adjust):
+    """
+    HopeCell's rate rule for every memory at once:
+      base + (1 - base) * adjust, clamped to base + 0.05,
+      and pinned to base for protected (slow) memories.
+    base_rates/protected: (M,), rate_adjust: (..., M) → (..., M)
+    """
+    dynamic_rate = base_rates + (1.0 - base_rates) * rate_adjust
+    dynamic_rate = tf.clip_by_value(dynamic_rate, 0.0, base_rates + 0.05)
+    return tf.where(protected, base_rates, dynamic_rate)
+
+
+# =======================================================================
+# VECTORIZED HOPE CELL
+# =======================================================================
+
+class VectorizedHopeCell(tf.keras.layers.AbstractRNNCell):
+    """
+    Same update rule as HopeCell, but all timescales live in one
+    (batch, num_memories, units) state tensor and every memory is updated
+    by a single broadcasted op instead of a Python loop.
+
+      - Works with any number of update_rates.
+      - The protected slow memory is selected by a mask, not a Python branch.
+      - No Python control flow → XLA-compilable (`jit_compile=True`).
+
+    Weights have the same shapes as HopeCell and the same memory is protected
+    (`slowest_memory` by default), so the two are interchangeable.
+    """
+
+    def __init__(self, units: int, update_rates: List[float], protected_index: int | None = None, **kwargs):
+        super().__init__(**kwargs)
+        self.units = units
+        self.update_rates = update_rates
+        self.num_memories = len(update_rates)
+
+        self.protected_index = slowest_memory(update_rates) if protected_index is None else protected_index
+
+        self.controller = tf.keras.layers.Dense(units, activation="tanh")
+        self.rate_adapter = tf.keras.layers.Dense(self.num_memories, activation="sigmoid")
+
+    @property
+    def state_size(self):
+        # All memories in one tensor
+        return tf.TensorShape([self.num_memories, self.units])
+
+    @property
+    def output_size(self):
+        return self.units
+
+    def build(self, input_shape):
+        self.base_rates = tf.constant(self.update_rates, dtype=self.compute_dtype)    # (M,)
+        self.protected = tf.one_hot(self.protected_index, self.num_memories) > 0.5   # (M,)
+        super().build(input_shape)
+
+    def call(self, inputs, states):
+        state = states[0] if isinstance(states, (list, tuple)) else states  # (batch, M, units)
+
+        # Same input layout as HopeCell: [inputs, fast, medium, slow, ...]
+        flat_state = tf.reshape(state, [-1, self.num_memories * self.units])
+        concat = tf.concat([inputs, flat_state], axis=-1)
+
+        proposal = self.controller(concat)       # (batch, units)
+        rate_adjust = self.rate_adapter(concat)  # (batch, M)
+
+        dynamic_rate = tf.expand_dims(
+            clamped_dynamic_rates(self.base_rates, self.protected, rate_adjust), -1)  # (batch, M, 1)
+
+        new_state = (1.0 - dynamic_rate) * state + dynamic_rate * tf.expand_dims(proposal, 1)
+        output = tf.reduce_mean(new_state, axis=1)
+        return output, [new_state]
+
+
+# =======================================================================
+# LINEARIZED HOPE + PARALLEL SCAN
+# =======================================================================
+
+def linear_recurrence_scan(a, b):
+    """
+    Solves s_t = a_t * s_{t-1} + b_t (s_0 = 0) for every t along axis 1
+    with a Hillis-Steele associative scan: log2(seq_len) vectorized steps
+    instead of seq_len sequential ones. Needs a static seq_len.
+
+    Combining an earlier segment (a', b') with a later one (a, b) gives
+    (a * a', a * b' + b).
+    """
+    seq_len = b.shape[1]
+    offset = 1
+    while offset < seq_len:
+        a_prev = tf.concat([tf.ones_like(a[:, :offset]), a[:, :-offset]], axis=1)
+        b_prev = tf.concat([tf.zeros_like(b[:, :offset]), b[:, :-offset]], axis=1)
+        b = a * b_prev + b
+        a = a * a_prev
+        offset *= 2
+    return b
+
+
+class ParallelHopeLayer(tf.keras.layers.Layer):
+    """
+    Opt-in linearized HOPE block for fast training.
+
+    Unlike HopeCell, the controller proposal and the rate adapter only see the
+    current input x_t (not the memories). Every memory update
+
+        m_t = (1 - rate_t) * m_{t-1} + rate_t * proposal_t
+
+    then becomes a linear recurrence, which is solved for the whole sequence
+    with an associative (parallel prefix) scan. Same rate clamping and slow
+    memory protection as HopeCell. Output: (batch, seq_len, units), the mean
+    of all memories at every step.
+    """
+
+    def __init__(self, units: int, update_rates: List[float], protected_index: int | None = None, **kwargs):
+        super().__init__(**kwargs)
+        self.units = units
+        self.update_rates = update_rates
+        self.num_memories = len(update_rates)
+        self.protected_index = slowest_memory(update_rates) if protected_index is None else protected_index
+
+        self.controller = tf.keras.layers.Dense(units, activation="tanh")
+        self.rate_adapter = tf.keras.layers.Dense(self.num_memories, activation="sigmoid")
+
+    def build(self, input_shape):
+        self.base_rates = tf.constant(self.update_rates, dtype=self.compute_dtype)
+        self.protected = tf.one_hot(self.protected_index, self.num_memories) > 0.5
+        super().build(input_shape)
+
+    def call(self, inputs):
+        proposal = self.controller(inputs)                     # (batch, T, units)
+        rate_adjust = self.rate_adapter(inputs)                # (batch, T, M)
+        rate = clamped_dynamic_rates(self.base_rates, self.protected, rate_adjust)
+        rate = tf.expand_dims(rate, -1)                        # (batch, T, M, 1)
+
+        memories = linear_recurrence_scan(
+            1.0 - rate, rate * tf.expand_dims(proposal, 2))   # (batch, T, M, units)
+        return tf.reduce_mean(memories, axis=2)
+
+    def get_config(self):
+        config = super().get_config()
+        config.update({
+            "units": self.units,
+            "update_rates": self.update_rates,
+            "protected_index": self.protected_index,
+        })
+        return config
+
+
 # =======================================================================
 # HOPE MODEL WRAPPER
 # =======================================================================
@@ -111,46 +269,65 @@ def build_tiny_hope(
     seq_len: int,
     units: int = 96,
     update_rates: List[float] | None = None,
+    protected_index: int | None = None,
     dropout_rate: float = 0.0,
     learning_rate: float = 7e-4,
+    vectorized: bool = False,
+    parallel_scan: bool = False,
+    jit_compile: bool = False,
+    steps_per_execution: int = 1,
+    mixed_precision: bool = False,
 ) -> tf.keras.Model:
     """
     Builds a 1-layer HOPE model with controlled multi-timescale memory.
 
     Defaults:
       update_rates = [0.6, 0.3, 0.02] → strong continual learning performance
+      protected_index = None → protect the slowest memory (`slowest_memory`)
+      vectorized   = False → HopeCell; True → VectorizedHopeCell (same maths)
+      parallel_scan = True → linearized ParallelHopeLayer trained with a
+                      parallel scan over the sequence (model name: tiny_hope_scan)
+      jit_compile / steps_per_execution → passed to `model.compile`
+      mixed_precision = True → mixed_bfloat16 layers; logits and loss stay float32
     """
 
     if update_rates is None:
         update_rates = [0.6, 0.3, 0.02]  # tuned for retention demo
 
-    inputs = tf.keras.Input(shape=(seq_len,), dtype="int32")
+    with dtype_policy(mixed_precision):
+        inputs = tf.keras.Input(shape=(seq_len,), dtype="int32")
 
-    # Shared embedding
-    x = tf.keras.layers.Embedding(vocab_size, units)(inputs)
+        # Shared embedding
+        x = tf.keras.layers.Embedding(vocab_size, units)(inputs)
 
-    # Continuum Memory System block
-    hope_block = tf.keras.layers.RNN(
-        HopeCell(units, update_rates),
-        return_sequences=True,
-        name="hope_cms"
-    )
-    x = hope_block(x)
+        # Continuum Memory System block
+        if parallel_scan:
+            hope_block = ParallelHopeLayer(units, update_rates, protected_index, name="hope_cms")
+        else:
+            cell_cls = VectorizedHopeCell if vectorized else HopeCell
+            hope_block = tf.keras.layers.RNN(
+                cell_cls(units, update_rates, protected_index),
+                return_sequences=True,
+                name="hope_cms"
+            )
+        x = hope_block(x)
 
-    if dropout_rate > 0:
-        x = tf.keras.layers.Dropout(dropout_rate)(x)
+        if dropout_rate > 0:
+            x = tf.keras.layers.Dropout(dropout_rate)(x)
 
-    # Stabilize output
-    x = tf.keras.layers.LayerNormalization(epsilon=1e-6)(x)
+        # Stabilize output
+        x = tf.keras.layers.LayerNormalization(epsilon=1e-6)(x)
 
-    # Predict next token
-    logits = tf.keras.layers.Dense(vocab_size)(x)
+        # Predict next token (float32 logits, also under mixed precision)
+        logits = tf.keras.layers.Dense(vocab_size, dtype="float32")(x)
 
     # Compile
-    model = tf.keras.Model(inputs, logits, name="tiny_hope")
+    model = tf.keras.Model(inputs, logits, name="tiny_hope_scan" if parallel_scan else "tiny_hope")
     model.compile(
         optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate),
         loss=tf.keras.losses.SparseCategoricalCrossentropy(from_logits=True),
         metrics=["accuracy"],
+        jit_compile=jit_compile,
+        steps_per_execution=steps_per_execution,
     )
     return model
@@ -0,0 +1,22 @@
+"""Dtype-policy helper shared by the tiny model builders."""
+
+import contextlib
+
+import tensorflow as tf
+
+
+@contextlib.contextmanager
+def dtype_policy(mixed_precision: bool):
+    """
+    Layers created inside use "mixed_bfloat16" (bfloat16 compute, float32
+    weights) when `mixed_precision` is set; the global policy is restored
+    afterwards so other models are unaffected. bfloat16 has float32's
+    exponent range, so no loss scaling is needed.
+    """
+    previous = tf.keras.mixed_precision.global_policy()
+    if mixed_precision:
+        tf.keras.mixed_precision.set_global_policy("mixed_bfloat16")
+    try:
+        yield
+    finally:
+        tf.keras.mixed_precision.set_global_policy(previous)
@@ -0,0 +1,106 @@
+"""
+Stateful, O(1)-per-token streaming inference for tiny HOPE models.
+
+`build_tiny_hope` only runs fixed `seq_len` windows, so predicting after every
+new token would rerun the whole prefix. HopeStreamer instead keeps the fast,
+medium and slow memories of each session between calls and advances one
+token per call, at a cost that does not depend on how long the stream is.
+
+  streamer = HopeStreamer(model)
+  a, b = streamer.new_session("a"), streamer.new_session("b")
+  logits = streamer.step([a, b], [token_a, token_b])   # both sessions, one batched step
+  blob = a.to_bytes(); a = HopeSession.from_bytes(blob)
+
+Works with HopeCell, VectorizedHopeCell and ParallelHopeLayer models.
+"""
+
+import dataclasses
+import io
+from typing import List, Sequence
+
+import numpy as np
+import tensorflow as tf
+
+from .hope import HopeCell, ParallelHopeLayer, VectorizedHopeCell, clamped_dynamic_rates
+
+
+@dataclasses.dataclass
+class HopeSession:
+    """Memories of one stream: (num_memories, units), plus how many tokens it has seen"""
+    session_id: str
+    memories: np.ndarray
+    tokens_seen: int = 0
+
+    def to_bytes(self) -> bytes:
+        buffer = io.BytesIO()
+        np.savez(buffer, session_id=self.session_id, memories=self.memories, tokens_seen=self.tokens_seen)
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, blob: bytes) -> "HopeSession":
+        data = np.load(io.BytesIO(blob))
+        return cls(str(data["session_id"]), data["memories"], int(data["tokens_seen"]))
+
+
+class HopeStreamer:
+    """Runs a trained tiny HOPE model one token at a time for many sessions"""
+
+    def __init__(self, model: tf.keras.Model):
+        self.embedding = next(l for l in model.layers if isinstance(l, tf.keras.layers.Embedding))
+        self.block = model.get_layer("hope_cms")
+        self.norm = next(l for l in model.layers if isinstance(l, tf.keras.layers.LayerNormalization))
+        self.head = model.layers[-1]
+
+        core = self.block.cell if isinstance(self.block, tf.keras.layers.RNN) else self.block
+        self.core = core
+        self.num_memories = len(core.update_rates)
+        self.units = core.units
+
+        self._step = tf.function(self._forward_step, input_signature=[
+            tf.TensorSpec([None], tf.int32),
+            tf.TensorSpec([None, self.num_memories, self.units], tf.float32),
+        ])
+
+    def _forward_step(self, token_ids, memories):
+        """(batch,) ids + (batch, M, units) memories → (batch, vocab) logits, new memories"""
+        x = self.embedding(token_ids)
+        memories = tf.cast(memories, self.core.compute_dtype)  # bfloat16 under mixed precision
+
+        if isinstance(self.core, HopeCell):
+            output, states = self.core(x, tf.unstack(memories, axis=1))
+            new_memories = tf.stack(states, axis=1)
+        elif isinstance(self.core, VectorizedHopeCell):
+            output, states = self.core(x, [memories])
+            new_memories = states[0]
+        elif isinstance(self.core, ParallelHopeLayer):
+            proposal = self.core.controller(x)
+            rate = clamped_dynamic_rates(self.core.base_rates, self.core.protected, self.core.rate_adapter(x))
+            rate = tf.expand_dims(rate, -1)
+            new_memories = (1.0 - rate) * memories + rate * tf.expand_dims(proposal, 1)
+            output = tf.reduce_mean(new_memories, axis=1)
+        else:
+            raise TypeError(f"unsupported HOPE block: {type(self.core).__name__}")
+
+        # The norm was built on (batch, seq_len, units), so run the head on a length-1 sequence
+        logits = self.head(self.norm(tf.expand_dims(output, 1)))
+        return logits[:, 0], tf.cast(new_memories, tf.float32)
+
+    def new_session(self, session_id: str) -> HopeSession:
+        return HopeSession(session_id, np.zeros((self.num_memories, self.units), dtype=np.float32))
+
+    def step(self, sessions: Sequence[HopeSession], token_ids: Sequence[int]) -> np.ndarray:
+        """Advances every session by its next token in one batched call; returns (batch, vocab) logits"""
+        memories = np.stack([s.memories for s in sessions])
+        logits, new_memories = self._step(np.asarray(token_ids, dtype=np.int32), memories)
+        new_memories = new_memories.numpy()
+        for session, memory in zip(sessions, new_memories):
+            session.memories = memory
+            session.tokens_seen += 1
+        return logits.numpy()
+
+    def feed(self, session: HopeSession, token_ids: List[int]) -> np.ndarray:
+        """Streams a list of tokens into one session; returns the logits after the last one"""
+        logits = None
+        for token_id in token_ids:
+            logits = self.step([session], [token_id])
+        return logits[0]
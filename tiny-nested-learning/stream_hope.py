@@ -0,0 +1,82 @@
+"""
+Streaming inference demo for the tiny HOPE model.
+
+Trains HOPE on Task_0, then completes each Task_0 sentence token by token
+with HopeStreamer: all sentences run as separate sessions batched into one
+step, and halfway through every session is serialized and restored.
+Finally reports per-token latency at growing stream lengths (it stays flat)
+and tokens/sec for different numbers of batched sessions.
+
+    python stream_hope.py
+    python stream_hope.py --sessions 1 16 256 --stream-len 1024
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from main import TEXT_CURRICULUM, as_dataset, create_curriculum
+from models import HopeSession, HopeStreamer, build_tiny_hope
+
+
+def complete_sentences(streamer, sentences, vocab):
+    index_word = {i: w for w, i in vocab.items()}
+    prompts = [[vocab[w] for w in s.split()[:2]] for s in sentences]
+    sessions = [streamer.new_session(f"user_{i}") for i in range(len(sentences))]
+    outputs = [list(p) for p in prompts]
+
+    # Prompt tokens, then greedy continuation; every step advances all sessions at once
+    logits = None
+    for t in range(2):
+        logits = streamer.step(sessions, [p[t] for p in prompts])
+    for t in range(len(max(sentences, key=len).split())):
+        if t == 3:
+            sessions = [HopeSession.from_bytes(s.to_bytes()) for s in sessions]
+        next_ids = logits.argmax(-1)
+        for out, token_id in zip(outputs, next_ids):
+            out.append(int(token_id))
+        logits = streamer.step(sessions, next_ids)
+
+    for sentence, out in zip(sentences, outputs):
+        words = [index_word[i] for i in out]
+        words = words[:words.index("<eos>")] if "<eos>" in words else words
+        print(f"  target: {sentence}\n  stream: {' '.join(words)}")
+
+
+def benchmark(streamer, vocab_size, session_counts, stream_len):
+    print(f"\n{'sessions':>8} | {'ms/step @16':>11} | {f'ms/step @{stream_len}':>13} | {'tokens/sec':>10}")
+    print("-" * 54)
+    for count in session_counts:
+        sessions = [streamer.new_session(str(i)) for i in range(count)]
+        tokens = np.random.randint(2, vocab_size, size=(stream_len, count))
+        step_ms = []
+        start = time.perf_counter()
+        for t in range(stream_len):
+            step_start = time.perf_counter()
+            streamer.step(sessions, tokens[t])
+            step_ms.append(1000.0 * (time.perf_counter() - step_start))
+        elapsed = time.perf_counter() - start
+        early, late = np.median(step_ms[1:17]), np.median(step_ms[-16:])
+        print(f"{count:>8} | {early:11.3f} | {late:13.3f} | {count * stream_len / elapsed:10,.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--epochs", type=int, default=40)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 16, 256])
+    parser.add_argument("--stream-len", type=int, default=512)
+    args = parser.parse_args()
+
+    tasks, vocab, seq_len = create_curriculum(TEXT_CURRICULUM)
+    model = build_tiny_hope(vocab_size=len(vocab), seq_len=seq_len)
+    model.fit(as_dataset(tasks[0], batch_size=32), epochs=args.epochs, verbose=0)
+
+    streamer = HopeStreamer(model)
+    print("Streaming Task_0 completions (2-word prompts, sessions restored mid-stream):")
+    complete_sentences(streamer, TEXT_CURRICULUM["Task_0"], vocab)
+    benchmark(streamer, len(vocab), args.sessions, args.stream_len)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""
+Process-parallel hyperparameter sweep for the nested-learning experiment.
+
+Every configuration (one builder + its kwargs + epochs) is trained with
+`continual_train` in a fresh worker process (one task per process), so no
+TF graph, allocator or Keras state carries over into the next timing. Each
+run is pinned to a free slice of cores and capped to `--threads-per-worker`
+TensorFlow/OpenMP threads, so N workers share the machine instead of all
+fighting over every core.
+
+Results are appended to a JSONL file as soon as each run finishes. Rerunning
+the same command skips configurations that are already in the file, so an
+interrupted sweep resumes where it stopped.
+
+    python sweep.py                                   # default update-rate schedules, all cores
+    python sweep.py --workers 4 --results sweep.jsonl
+    python sweep.py --grid grid.json                  # custom grid (format below)
+
+Grid file: for each model, lists of values to combine, e.g.
+    {"hope": {"units": [64, 96], "update_rates": [[0.6, 0.3, 0.02], [0.8, 0.1, 0.01]]},
+     "transformer": {"d_model": [32, 64]},
+     "epochs": [3, 5]}
+"""
+
+import argparse
+import contextlib
+import hashlib
+import io
+import itertools
+import json
+import multiprocessing as mp
+import os
+import time
+
+DEFAULT_GRID = {
+    "hope": {
+        "update_rates": [
+            [0.6, 0.3, 0.02],
+            [0.8, 0.3, 0.02],
+            [0.6, 0.1, 0.01],
+            [0.5, 0.2, 0.05],
+            [0.7, 0.4, 0.1, 0.01],
+        ],
+    },
+    "transformer": {"d_model": [32, 64]},
+    "epochs": [3],
+}
+
+
+# ==========================
+# Configurations
+# ==========================
+def expand_grid(grid, batch_size, seed):
+    """
+    Cartesian product of every model's kwargs × epochs → list of run configs.
+    HOPE configs name their protected memory explicitly, so every cell variant
+    runs (and the results file keys) the same setup.
+    """
+    from models.hope import slowest_memory  # pylint: disable=import-outside-toplevel
+
+    configs = []
+    for epochs in grid.get("epochs", [3]):
+        for model in ("transformer", "hope"):
+            if model not in grid:
+                continue
+            names = sorted(grid[model])
+            for values in itertools.product(*(grid[model][n] for n in names)):
+                params = dict(zip(names, values))
+                if model == "hope" and "update_rates" in params:
+                    params.setdefault("protected_index", slowest_memory(params["update_rates"]))
+                configs.append({"model": model, "params": params,
+                                "epochs": epochs, "batch_size": batch_size, "seed": seed})
+    return configs
+
+
+def config_key(config):
+    return hashlib.sha1(json.dumps(config, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def load_records(path):
+    """Every complete record in the results file"""
+    records = []
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue  # partial last line of an interrupted sweep
+    return records
+
+
+def load_done(path):
+    """Keys of configurations that already have a successful result"""
+    return {r["key"] for r in load_records(path) if "error" not in r}
+
+
+# ==========================
+# Worker process
+# ==========================
+# Free core slices, shared by all workers: a run takes one and gives it back
+# when it ends, so replacement processes always find a free slice
+_CORE_SLOTS = None
+_THREADS = 1
+
+
+def init_worker(core_slots, threads):
+    """Caps thread pools before TensorFlow is imported (each process runs one config)"""
+    global _CORE_SLOTS, _THREADS  # pylint: disable=global-statement
+    _CORE_SLOTS, _THREADS = core_slots, threads
+    for var in ("OMP_NUM_THREADS", "TF_NUM_INTRAOP_THREADS"):
+        os.environ[var] = str(threads)
+    os.environ["TF_NUM_INTEROP_THREADS"] = "1"
+    os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "3")
+
+
+def run_config(config):
+    cores = _CORE_SLOTS.get()
+    try:
+        # Pin before TensorFlow starts any thread, so its pools inherit the affinity
+        if hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, cores)
+        return train_config(config)
+    finally:
+        _CORE_SLOTS.put(cores)
+
+
+def train_config(config):
+    import numpy as np  # pylint: disable=import-outside-toplevel
+    import tensorflow as tf  # pylint: disable=import-outside-toplevel
+    tf.config.threading.set_intra_op_parallelism_threads(_THREADS)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+    from main import TEXT_CURRICULUM, continual_train, create_curriculum  # pylint: disable=import-outside-toplevel
+    from models import build_tiny_hope, build_tiny_transformer  # pylint: disable=import-outside-toplevel
+
+    record = {"key": config_key(config), **config, "pid": os.getpid()}
+    try:
+        np.random.seed(config["seed"])
+        tf.random.set_seed(config["seed"])
+        builder = build_tiny_hope if config["model"] == "hope" else build_tiny_transformer
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            tasks, vocab, seq_len = create_curriculum(TEXT_CURRICULUM)
+            model = builder(len(vocab), seq_len, **config["params"])
+            history = continual_train(model, tasks, epochs=config["epochs"], batch_size=config["batch_size"])
+        record["wall_time"] = time.perf_counter() - start
+
+        names = list(history)
+        final = history[names[-1]]
+        record["history"] = history
+        record["final_accuracy"] = sum(final.values()) / len(final)
+        # Accuracy change on each task from right after it was learned to the end
+        record["forgetting"] = {t: final[t] - history[t][t] for t in names}
+        record["mean_forgetting"] = sum(record["forgetting"].values()) / len(names)
+    except Exception as e:  # pylint: disable=broad-except
+        record["error"] = f"{type(e).__name__}: {e}"
+    return record
+
+
+# ==========================
+# Driver
+# ==========================
+def print_results(records):
+    ok = sorted((r for r in records if "error" not in r), key=lambda r: -r["mean_forgetting"])
+    print(f"\n{'model':<11} | {'epochs':>6} | {'params':<80} | {'forgetting':>10} | {'final acc':>9} | {'time':>7}")
+    print("-" * 140)
+    for r in ok:
+        params = json.dumps(r["params"], separators=(",", ":"))
+        print(f"{r['model']:<11} | {r['epochs']:>6} | {params:<80} | {r['mean_forgetting']:10.3f} | "
+              f"{r['final_accuracy']:9.3f} | {r['wall_time']:6.1f}s")
+    for r in records:
+        if "error" in r:
+            print(f"FAILED {r['model']} {r['params']}: {r['error']}")
+
+
+def run_sweep(pending, results_path, workers, threads):
+    """Trains every pending config on a pinned process pool, appending results as they finish"""
+    cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count()))
+    workers = max(1, min(workers or len(cores), len(pending)))
+    threads = threads or max(1, len(cores) // workers)
+
+    # One slice of cores per concurrent run (wrapping around if oversubscribed)
+    ctx = mp.get_context("spawn")
+    core_slots = ctx.Queue()
+    for i in range(workers):
+        core_slots.put({cores[(i * threads + j) % len(cores)] for j in range(threads)})
+    print(f"{workers} workers × {threads} threads on {len(cores)} cores\n")
+
+    start = time.perf_counter()
+    # maxtasksperchild=1: every config starts from a clean process
+    with ctx.Pool(workers, initializer=init_worker, initargs=(core_slots, threads), maxtasksperchild=1) as pool, \
+            open(results_path, "a", encoding="utf-8") as out:
+        for i, record in enumerate(pool.imap_unordered(run_config, pending), 1):
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            status = record.get("error") or f"forgetting {record['mean_forgetting']:+.3f} in {record['wall_time']:.1f}s"
+            print(f"[{i}/{len(pending)}] {record['model']} {record['params']} epochs={record['epochs']}: {status}")
+    print(f"\nSweep wall time: {time.perf_counter() - start:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--grid", help="JSON grid file (default: built-in update-rate schedules)")
+    parser.add_argument("--results", default="sweep_results.jsonl")
+    parser.add_argument("--workers", type=int, default=None, help="default: one per usable core")
+    parser.add_argument("--threads-per-worker", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    grid = DEFAULT_GRID
+    if args.grid:
+        with open(args.grid, encoding="utf-8") as f:
+            grid = json.load(f)
+
+    configs = expand_grid(grid, args.batch_size, args.seed)
+    done = load_done(args.results)
+    pending = [c for c in configs if config_key(c) not in done]
+    print(f"{len(configs)} configurations, {len(configs) - len(pending)} already in {args.results}, "
+          f"{len(pending)} to run")
+
+    if pending:
+        run_sweep(pending, args.results, args.workers, args.threads_per_worker)
+
+    # Latest record per configuration of this grid
+    keys = {config_key(c) for c in configs}
+    latest = {r["key"]: r for r in load_records(args.results) if r["key"] in keys}
+    print_results(list(latest.values()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""
+Round-trip of TaskCheckpointer: weights, Adam slots and the step counter.
+
+    python -m pytest test_checkpointing.py
+"""
+
+import numpy as np
+import tensorflow as tf
+
+from checkpointing import TaskCheckpointer
+
+
+def make_model():
+    model = tf.keras.Sequential([tf.keras.layers.Embedding(20, 4), tf.keras.layers.Dense(3)])
+    model.build((None, 5))
+    model.compile(optimizer="adam", loss="sparse_categorical_crossentropy")
+    return model
+
+
+def test_restore_round_trips_optimizer_slots(tmp_path):
+    rng = np.random.default_rng(0)
+    x = rng.integers(0, 20, (16, 5))
+    y = rng.integers(0, 3, (16, 5))
+
+    model = make_model()
+    checkpointer = TaskCheckpointer(str(tmp_path), model)  # before the first fit, as continual_train does
+    model.fit(x, y, epochs=2, verbose=0)
+    checkpointer.save("task_a", {"task_a": {}})
+    checkpointer.close()
+
+    restored = make_model()
+    assert TaskCheckpointer(str(tmp_path), restored).restore()
+
+    assert len(restored.optimizer.variables) == len(model.optimizer.variables)
+    for saved, loaded in zip(model.optimizer.variables, restored.optimizer.variables):
+        np.testing.assert_array_equal(saved.numpy(), loaded.numpy())
+    for saved, loaded in zip(model.weights, restored.weights):
+        np.testing.assert_array_equal(saved.numpy(), loaded.numpy())
@@ -0,0 +1,31 @@
+"""
+HopeCell and VectorizedHopeCell parity, also for non-default rate schedules.
+
+    python -m pytest test_hope.py
+"""
+
+import numpy as np
+import pytest
+import tensorflow as tf
+
+from models import HopeCell, ParallelHopeLayer, VectorizedHopeCell
+
+
+@pytest.mark.parametrize("update_rates", [[0.6, 0.3, 0.02], [0.7, 0.4, 0.1, 0.01], [0.01, 0.5, 0.2, 0.7]])
+def test_vectorized_cell_matches_hope_cell(update_rates):
+    x = np.random.default_rng(0).normal(size=(4, 12, 8)).astype("float32")
+
+    reference = tf.keras.layers.RNN(HopeCell(16, update_rates), return_sequences=True)
+    vectorized = tf.keras.layers.RNN(VectorizedHopeCell(16, update_rates), return_sequences=True)
+    reference(x[:1])
+    vectorized(x[:1])
+    vectorized.set_weights(reference.get_weights())
+
+    assert vectorized.cell.protected_index == reference.cell.protected_index
+    np.testing.assert_allclose(vectorized(x).numpy(), reference(x).numpy(), atol=1e-5)
+
+
+def test_every_variant_protects_the_slowest_memory():
+    update_rates = [0.7, 0.4, 0.1, 0.01]
+    for layer in (HopeCell(8, update_rates), VectorizedHopeCell(8, update_rates), ParallelHopeLayer(8, update_rates)):
+        assert layer.protected_index == 3
@@ -0,0 +1,5 @@
+"""Array-backed tokenizer shared by basic-rnn, tiny-gpt-model and tiny-moe-based-model."""
+
+from .tokenizer import KERAS_FILTERS, ArrayTokenizer
+
+__all__ = ["ArrayTokenizer", "KERAS_FILTERS"]
@@ -0,0 +1,231 @@
+"""
+ArrayTokenizer: one tokenizer for every tiny model in this repo.
+
+The vocabulary lives in two contiguous arrays: `data`, the UTF-8 bytes of
+every token back to back, and `offsets`, where token i is
+data[offsets[i]:offsets[i + 1]]. Id 0 is the padding id, as in Keras.
+
+  - id → token is an O(1) array slice (no `word_index` scan)
+  - encode_batch / lookup write into caller-provided NumPy buffers, padded
+    and truncated like `pad_sequences`
+  - save() writes the arrays as .npy files; load(mmap=True) maps them instead
+    of reading them, so a large vocabulary costs no start-up time or RSS until
+    it is used
+  - word-level splitting matches the Keras Tokenizer (lowercase, strip
+    KERAS_FILTERS, split on spaces), and fit() assigns the same ids
+
+    tokenizer = ArrayTokenizer.fit(corpus, oov_token="[OOV]")
+    ids = tokenizer.encode_batch(["hello world"], max_len=4)   # (1, 4) int32, left-padded
+    tokenizer.decode(ids[0][ids[0] > 0])                         # "hello world"
+    tokenizer.save("tokenizer"); ArrayTokenizer.load("tokenizer")
+"""
+
+import collections
+import itertools
+import json
+import os
+from typing import Dict, Iterable, List, Sequence
+
+import numpy as np
+
+# Same characters the Keras Tokenizer strips by default
+KERAS_FILTERS = '!"#$%&()*+,-./:;<=>?@[\\]^_`{|}~\t\n'
+
+# Joins the texts of one encode_batch call (never part of a vocabulary)
+SEPARATOR = "\x00"
+
+
+class ArrayTokenizer:
+    """Word- or character-level tokenizer over an array-backed vocabulary (id 0 = padding)"""
+
+    def __init__(self, tokens: Sequence[str] | None = None, *, oov_token: str | None = None, lower: bool = True,
+                 filters: str = KERAS_FILTERS, char_level: bool = False, offsets=None, data=None):
+        if tokens is not None:
+            encoded = [t.encode("utf-8") for t in tokens]
+            offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+            np.cumsum([len(t) for t in encoded], out=offsets[1:])
+            data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        self.offsets = offsets
+        self.data = data
+        self.oov_token = oov_token
+        self.lower = lower
+        self.filters = filters
+        self.char_level = char_level
+        self._filter_table = str.maketrans(filters, " " * len(filters))
+        self._tokens = None      # list cache, built on first batch decode
+        self._table = None       # same tokens as an object array, for lookup()
+        self._index = None       # token → id, built on first encode
+        self._index_word = None  # id → token, built on first access
+        self._batch_index = None  # same + the text separator, for encode_batch
+
+    # ------------------------------------------------------------------
+    # Construction
+    # ------------------------------------------------------------------
+    @classmethod
+    def fit(cls, texts: Iterable[str], *, oov_token=None, lower=True, filters=KERAS_FILTERS, char_level=False):
+        """Same ids as Keras `Tokenizer.fit_on_texts`: [OOV] = 1, then by count, ties by first appearance"""
+        splitter = cls([], oov_token=oov_token, lower=lower, filters=filters, char_level=char_level)
+        counts = collections.Counter(itertools.chain.from_iterable(map(splitter.split, texts)))
+        ranked = [word for word, _ in sorted(counts.items(), key=lambda item: item[1], reverse=True)]
+        tokens = [""] + ([oov_token] if oov_token is not None else []) + ranked
+        return cls(tokens, oov_token=oov_token, lower=lower, filters=filters, char_level=char_level)
+
+    @classmethod
+    def from_keras(cls, tokenizer):
+        """Converts a fitted Keras `Tokenizer` (same ids and splitting rules)"""
+        index_word = {i: w for w, i in tokenizer.word_index.items()}
+        tokens = [""] + [index_word[i] for i in range(1, len(index_word) + 1)]
+        return cls(tokens, oov_token=tokenizer.oov_token, lower=tokenizer.lower,
+                   filters=tokenizer.filters, char_level=tokenizer.char_level)
+
+    @classmethod
+    def from_vocab(cls, vocab: Dict[str, int], **kwargs):
+        """From a token → id dict with ids 0..N-1 (`stoi`, `build_vocab`); a missing id 0 becomes padding"""
+        tokens = [""] * (max(vocab.values()) + 1)
+        for token, index in vocab.items():
+            tokens[index] = token
+        return cls(tokens, **kwargs)
+
+    # ------------------------------------------------------------------
+    # On-disk format
+    # ------------------------------------------------------------------
+    def save(self, path: str):
+        """Writes path/offsets.npy, path/data.npy and path/config.json"""
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "offsets.npy"), np.asarray(self.offsets))
+        np.save(os.path.join(path, "data.npy"), np.asarray(self.data))
+        config = {"oov_token": self.oov_token, "lower": self.lower,
+                  "filters": self.filters, "char_level": self.char_level}
+        with open(os.path.join(path, "config.json"), "w", encoding="utf-8") as f:
+            json.dump(config, f)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True):
+        """Loads a saved tokenizer; with mmap the vocabulary arrays are memory-mapped, not read"""
+        mode = "r" if mmap else None
+        with open(os.path.join(path, "config.json"), encoding="utf-8") as f:
+            config = json.load(f)
+        return cls(offsets=np.load(os.path.join(path, "offsets.npy"), mmap_mode=mode),
+                   data=np.load(os.path.join(path, "data.npy"), mmap_mode=mode), **config)
+
+    # ------------------------------------------------------------------
+    # Vocabulary
+    # ------------------------------------------------------------------
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def token(self, index: int) -> str:
+        """O(1) id → token straight from the arrays"""
+        return bytes(self.data[self.offsets[index]:self.offsets[index + 1]]).decode("utf-8")
+
+    @property
+    def tokens(self) -> List[str]:
+        if self._tokens is None:
+            blob = bytes(self.data)
+            offsets = self.offsets.tolist()
+            self._tokens = [blob[a:b].decode("utf-8") for a, b in zip(offsets[:-1], offsets[1:])]
+        return self._tokens
+
+    @property
+    def word_index(self) -> Dict[str, int]:
+        """Keras-compatible token → id (the empty padding token excluded)"""
+        if self._index is None:
+            self._index = {t: i for i, t in enumerate(self.tokens) if t}
+        return self._index
+
+    @property
+    def index_word(self) -> Dict[int, str]:
+        """Keras-compatible id → token (the empty padding token excluded)"""
+        if self._index_word is None:
+            self._index_word = {i: t for i, t in enumerate(self.tokens) if t}
+        return self._index_word
+
+    # ------------------------------------------------------------------
+    # Encoding
+    # ------------------------------------------------------------------
+    def split(self, text: str) -> List[str]:
+        """Keras `text_to_word_sequence` (or a character list when char_level)"""
+        if self.lower:
+            text = text.lower()
+        if self.char_level:
+            return list(text)
+        return [w for w in text.translate(self._filter_table).split(" ") if w]
+
+    def encode(self, text: str) -> List[int]:
+        """One text → ids; unknown tokens map to the OOV id, or are dropped without one"""
+        index = self.word_index
+        oov = index.get(self.oov_token) if self.oov_token is not None else None
+        ids = (index.get(t, oov) for t in self.split(text))
+        return [i for i in ids if i is not None]
+
+    def texts_to_sequences(self, texts: Iterable[str]) -> List[List[int]]:
+        return [self.encode(text) for text in texts]
+
+    def _lookup_batch(self, texts):
+        """
+        Ids of every known token of every text plus the text (row) each came from.
+        The texts are joined with a separator token, so lower(), translate(),
+        split() and the dict lookups each run once over the whole batch in C.
+        """
+        if self._batch_index is None:
+            self._batch_index = dict(self.word_index, **{SEPARATOR: -2})
+        missing = self.word_index.get(self.oov_token, -1) if self.oov_token is not None else -1
+
+        if self.char_level:
+            joined = SEPARATOR.join(texts) + SEPARATOR
+            tokens = joined.lower() if self.lower else joined
+        else:
+            joined = f" {SEPARATOR} ".join(texts) + f" {SEPARATOR}"
+            joined = joined.lower() if self.lower else joined
+            tokens = filter(None, joined.translate(self._filter_table).split(" "))
+
+        ids = np.fromiter(map(self._batch_index.get, tokens, itertools.repeat(missing)), dtype=np.int64)
+        is_separator = ids == -2
+        rows = np.cumsum(is_separator) - is_separator
+        known = ids >= 0
+        return ids[known], rows[known]
+
+    def encode_batch(self, texts: Sequence[str], max_len: int, out=None,
+                     padding: str = "pre", truncating: str = "pre") -> np.ndarray:
+        """
+        `pad_sequences(texts_to_sequences(texts), maxlen=max_len)` into `out`
+        (a (len(texts), max_len) integer buffer, allocated if not given).
+        All texts are looked up in one pass and scattered into place at once.
+        """
+        if out is None:
+            out = np.empty((len(texts), max_len), dtype=np.int32)
+        out.fill(0)
+
+        ids, rows = self._lookup_batch(texts)
+        lengths = np.bincount(rows, minlength=len(texts))
+
+        # Position of every id inside its own text, then the window of it that fits
+        cols = np.arange(len(ids)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        kept = np.minimum(lengths, max_len)
+        first = lengths - kept if truncating == "pre" else np.zeros_like(lengths)
+        shift = max_len - kept if padding == "pre" else np.zeros_like(lengths)
+        inside = (cols >= first[rows]) & (cols < (first + kept)[rows])
+        out[rows[inside], (cols - first[rows] + shift[rows])[inside]] = ids[inside]
+        return out
+
+    # ------------------------------------------------------------------
+    # Decoding
+    # ------------------------------------------------------------------
+    def lookup(self, ids, out=None) -> np.ndarray:
+        """Vectorized id → token for an id array of any shape, into `out` (object array) if given"""
+        if self._table is None:
+            self._table = np.asarray(self.tokens, dtype=object)
+        return np.take(self._table, np.asarray(ids), out=out)
+
+    def decode(self, ids: Iterable[int]) -> str:
+        tokens = self.tokens
+        return ("" if self.char_level else " ").join(tokens[int(i)] for i in ids)
+
+    def decode_batch(self, ids, skip_padding: bool = True) -> List[str]:
+        """(batch, length) ids → one string per row, optionally dropping padding ids"""
+        separator = "" if self.char_level else " "
+        words = self.lookup(ids)
+        if skip_padding:
+            mask = np.asarray(ids) != 0
+            return [separator.join(row[keep]) for row, keep in zip(words, mask)]
+        return [separator.join(row) for row in words]